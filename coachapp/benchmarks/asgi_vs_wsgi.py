@@ -0,0 +1,167 @@
+"""Compare le débit des pages de lecture des rendez-vous servies sous WSGI (vues synchrones) et sous ASGI (vues asynchrones, booking/async_views.py).
+
+Les deux modes sont exécutés dans le même processus que le gestionnaire Django (WSGIHandler ou ASGIHandler), sans serveur HTTP, sur une base de test remplie pour l'occasion. Les clients lents sont simulés par un délai à chaque morceau de réponse transmis :
+- sous WSGI, le fil d'exécution qui sert la requête est occupé pendant tout l'envoi, et le serveur n'en a que --threads ;
+- sous ASGI, l'envoi est une attente de la boucle d'événements, qui peut servir d'autres clients pendant ce temps.
+
+Chaque mode tourne dans un sous-processus, car le choix des vues se fait au chargement des adresses (réglage BOOKING_ASYNC_VIEWS).
+
+Utilisation, depuis le dossier qui contient manage.py :
+    python benchmarks/asgi_vs_wsgi.py --requests 400 --concurrency 64 --threads 8 --delay 0.25
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import environment
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def setup(mode, appointments):
+    """Prépare Django et une base de test, et renvoie le cookie de session d'un patient et celui d'un médecin."""
+    environment.setup(async_views=mode == 'asgi')
+    from django.conf import settings
+    from django.test import Client
+    from benchmarks import factories
+
+    patients = factories.make_users(1)
+    doctors = factories.make_users(1, role='MEDECIN')
+    factories.make_appointments(appointments, patients, doctors)
+    cookies = {}
+    for user in patients + doctors:
+        client = Client()
+        client.force_login(user)
+        cookies[user.role] = '{}={}'.format(settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value)
+    return cookies
+
+
+def run_wsgi(paths, options):
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    workers = threading.Semaphore(options.threads)
+    latencies, lock = [], threading.Lock()
+    pending = list(range(options.requests))
+
+    def client():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index = pending.pop()
+            path, cookie = paths[index % len(paths)]
+            started = time.perf_counter()
+            with workers:
+                environ = {
+                    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+                    'SERVER_PORT': '80', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(),
+                    'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+                }
+                statuses = []
+                response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+                for chunk in response:
+                    time.sleep(options.delay)
+                response.close()
+                assert statuses[0].startswith('200'), statuses
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for i in range(options.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies
+
+
+def run_asgi(paths, options):
+    from django.core.handlers.asgi import ASGIHandler
+    handler = ASGIHandler()
+    latencies = []
+
+    async def request(path, cookie):
+        started = time.perf_counter()
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            else:
+                await asyncio.sleep(options.delay)
+
+        await handler({
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }, receive, send)
+        assert statuses[0] == 200, statuses
+        latencies.append(time.perf_counter() - started)
+
+    async def main():
+        pending = list(range(options.requests))
+
+        async def client():
+            while pending:
+                path, cookie = paths[pending.pop() % len(paths)]
+                await request(path, cookie)
+
+        await asyncio.gather(*(client() for i in range(options.concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - started, latencies
+
+
+def child(options):
+    cookies = setup(options.mode, options.appointments)
+    paths = [('/consult/', cookies['PATIENT']), ('/manage/', cookies['MEDECIN'])]
+    run = run_asgi if options.mode == 'asgi' else run_wsgi
+    elapsed, latencies = run(paths, options)
+    print(json.dumps({
+        'mode': options.mode,
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=400, help="Nombre total de requêtes par mode.")
+    parser.add_argument('--concurrency', type=int, default=64, help="Nombre de clients simultanés.")
+    parser.add_argument('--threads', type=int, default=8, help="Nombre de fils d'exécution du serveur WSGI.")
+    parser.add_argument('--delay', type=float, default=0.25, help="Délai (en secondes) de réception de chaque morceau de réponse par un client lent.")
+    parser.add_argument('--appointments', type=int, default=50, help="Nombre de rendez-vous enregistrés.")
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        return child(options)
+
+    print('{:<6} {:>10} {:>10} {:>10} {:>10}'.format('mode', 'req/s', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'))
+    for mode in ('wsgi', 'asgi'):
+        arguments = [sys.executable, os.path.abspath(__file__), '--mode', mode] + sys.argv[1:]
+        output = subprocess.run(arguments, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print('{mode:<6} {throughput:>10.1f} {p50:>10.1f} {p95:>10.1f} {p99:>10.1f}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Mesure le temps processeur consommé par une attaque sur les pages de connexion et d'inscription, sans et avec la limitation du débit (coachapp/throttling.py).
+
+L'attaque simulée envoie, depuis quelques adresses IP, des tentatives de connexion à un même compte avec de mauvais mots de passe (attaque par dictionnaire), puis des inscriptions de comptes factices. Les mots de passe sont hachés avec le hacheur de production (PBKDF2) : c'est ce hachage, voulu coûteux, que l'attaquant fait faire au serveur à chaque tentative. Pour chaque mode sont relevés le nombre de réponses 429, le nombre de requêtes SQL et le temps processeur (time.process_time) total et par requête.
+
+Utilisation, depuis le dossier qui contient manage.py :
+    python benchmarks/attack.py --logins 100 --signups 20 --ips 2
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import environment
+
+MODES = (('sans limite', False), ('avec limite', True))
+
+
+def attack(options):
+    """Joue l'attaque et renvoie le triplet (nombre de requêtes, nombre de réponses 429, nombre de requêtes SQL)."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from benchmarks.factories import PASSWORD
+
+    clients = [Client(REMOTE_ADDR='203.0.113.{}'.format(i + 1)) for i in range(options.ips)]
+    requests, rejected = 0, 0
+    with CaptureQueriesContext(connection) as queries:
+        for i in range(options.logins):
+            response = clients[i % options.ips].post(reverse('login'), {'username': 'patient0', 'password': 'essai-{}'.format(i)})
+            requests, rejected = requests + 1, rejected + (response.status_code == 429)
+        for i in range(options.signups):
+            username = 'robot{}-{}'.format(options.run, i)
+            response = clients[i % options.ips].post(reverse('signup'), {
+                'username': username, 'email': '{}@example.com'.format(username), 'first_name': 'Robot', 'last_name': str(i),
+                'password1': PASSWORD, 'password2': PASSWORD,
+            })
+            requests, rejected = requests + 1, rejected + (response.status_code == 429)
+    return requests, rejected, len(queries.captured_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--logins', type=int, default=100, help="Nombre de tentatives de connexion.")
+    parser.add_argument('--signups', type=int, default=20, help="Nombre d'inscriptions.")
+    parser.add_argument('--ips', type=int, default=2, help="Nombre d'adresses IP de l'attaquant.")
+    options = parser.parse_args()
+
+    environment.setup(fast_hasher=False)
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # une ligne par réponse 429 sinon
+    from django.conf import settings
+    from django.core.cache import cache
+    from benchmarks import factories
+
+    factories.make_users(10)
+    print('{:<12} {:>9} {:>7} {:>9} {:>12} {:>12}'.format('mode', 'requêtes', '429', 'req. SQL', 'CPU (s)', 'CPU/req. (ms)'))
+    for options.run, (label, enabled) in enumerate(MODES):
+        settings.THROTTLE_ENABLED = enabled
+        cache.clear()
+        started = time.process_time()
+        requests, rejected, queries = attack(options)
+        cpu = time.process_time() - started
+        print('{:<12} {:>9} {:>7} {:>9} {:>12.2f} {:>12.1f}'.format(label, requests, rejected, queries, cpu, cpu / requests * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Budgets de performance de chaque étape du parcours (benchmarks/workflow.py), vérifiés par benchmarks/tests.py et par run.py --check.
+
+Pour chaque étape : nombre maximal de requêtes SQL (hors gestion des transactions), et durée maximale au 95e percentile en millisecondes (mots de passe hachés en MD5). Les durées dépendent de la machine : elles sont multipliées par la variable d'environnement BENCHMARK_LATENCY_FACTOR (1 par défaut), à augmenter sur une machine d'intégration continue lente. Un budget ne doit être relevé que par un changement qui le justifie, dans le même commit.
+"""
+import os
+
+BUDGETS = {
+    'signup': (6, 150),
+    'login': (5, 100),
+    'booking (GET)': (7, 250),
+    'availability': (2, 50),
+    'booking (POST)': (10, 150),
+    'consult': (4, 100),
+    'manage': (4, 250),
+    'change': (13, 200),
+    'delete': (6, 100),
+}
+
+
+def latency_factor():
+    return float(os.environ.get('BENCHMARK_LATENCY_FACTOR', 1))
+
+
+def check(report):
+    """Renvoie la liste des dépassements de budget du rapport (workflow.Recorder.report), vide si tous sont respectés."""
+    factor = latency_factor()
+    failures = []
+    for step, (max_queries, p95) in BUDGETS.items():
+        if step not in report:
+            failures.append('{} : étape absente du rapport'.format(step))
+            continue
+        measures = report[step]
+        if measures['max_queries'] > max_queries:
+            failures.append('{} : {} requêtes SQL (budget {})'.format(step, measures['max_queries'], max_queries))
+        if measures['p95'] > p95 * factor:
+            failures.append('{} : p95 de {:.1f} ms (budget {:.0f} ms)'.format(step, measures['p95'], p95 * factor))
+    return failures
@@ -0,0 +1,149 @@
+"""Mesure la concurrence entre écritures et lectures SQLite pendant des réservations simultanées, avec le réglage par défaut de Django et avec le profil de production (coachapp/backends/sqlite3/base.py).
+
+Des fils d'écriture réservent des créneaux au hasard (booking.reservations.reserve, y compris les créneaux déjà pris, rejetés par la contrainte d'unicité) pendant que des fils de lecture chargent les rendez-vous à venir d'un patient, comme la page de consultation. Une connexion est fermée ou conservée après chaque opération, comme à la fin d'une requête HTTP (close_old_connections et CONN_MAX_AGE).
+
+Chaque profil tourne dans un sous-processus, sur une base SQLite enregistrée dans un fichier temporaire : une base en mémoire ne connaît ni journal ni verrou de fichier.
+
+Utilisation, depuis le dossier qui contient manage.py :
+    python benchmarks/contention.py --writers 8 --readers 8 --duration 10
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import environment
+
+PROFILES = ('default', 'tuned')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))] if values else 0.0
+
+
+def database_settings(profile, path):
+    """Renvoie la configuration de la base du profil : celle de coachapp/settings.py pour 'tuned', celle par défaut de Django pour 'default'."""
+    if profile == 'default':
+        return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'TEST': {'NAME': path}}
+    from coachapp import settings
+    database = dict(settings.DATABASES['default'], NAME=path)
+    database['TEST'] = {'NAME': path}
+    return database
+
+
+def setup(options, path):
+    environment.setup(database=database_settings(options.mode, path))
+    from benchmarks import factories
+
+    patients = factories.make_users(options.users)
+    doctors = factories.make_users(options.doctors, role='MEDECIN')
+    factories.make_appointments(options.appointments, patients, doctors, days=options.days)
+    return patients, doctors
+
+
+def run(options, patients, doctors):
+    from django.db import OperationalError, close_old_connections
+    from django.utils import timezone
+    from booking.models import Appointment
+    from booking.reservations import SlotUnavailable, reserve
+
+    today = timezone.localdate()
+    slots = [
+        (day.isoformat(), '{:02d}:{:02d}'.format(9 + i // 2, 30 * (i % 2)))
+        for day in (today + datetime.timedelta(days=offset) for offset in range(1, options.days + 1))
+        for i in range(16) if i != 8
+    ]
+    results = {'write': [], 'read': [], 'conflicts': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + options.duration
+
+    def worker(kind, seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            outcome = None
+            try:
+                if kind == 'write':
+                    day, heure = rng.choice(slots)
+                    reserve(Appointment(
+                        user=rng.choice(patients), doctor=rng.choice(doctors), objet='Réservation concurrente',
+                        start=Appointment.slot_start(day, heure)))
+                else:
+                    list(Appointment.objects.for_listing().filter(user=rng.choice(patients)).upcoming())
+            except SlotUnavailable:
+                outcome = 'conflicts'
+            except OperationalError:
+                outcome = 'errors'
+            finally:
+                close_old_connections()
+            duration = time.perf_counter() - started
+            with lock:
+                if outcome:
+                    results[outcome] += 1
+                else:
+                    results[kind].append(duration)
+
+    threads = [threading.Thread(target=worker, args=('write', i)) for i in range(options.writers)]
+    threads += [threading.Thread(target=worker, args=('read', 1000 + i)) for i in range(options.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def child(options):
+    with tempfile.TemporaryDirectory() as directory:
+        patients, doctors = setup(options, os.path.join(directory, 'contention.sqlite3'))
+        results = run(options, patients, doctors)
+        from django.db import connections
+        connections.close_all()
+    print(json.dumps({
+        'mode': options.mode,
+        'writes': len(results['write']) / options.duration,
+        'reads': len(results['read']) / options.duration,
+        'write_p50': statistics.median(results['write'] or [0]) * 1000,
+        'write_p95': percentile(results['write'], 0.95) * 1000,
+        'read_p50': statistics.median(results['read'] or [0]) * 1000,
+        'read_p95': percentile(results['read'], 0.95) * 1000,
+        'conflicts': results['conflicts'],
+        'errors': results['errors'],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--writers', type=int, default=8, help="Nombre de fils qui réservent des créneaux.")
+    parser.add_argument('--readers', type=int, default=8, help="Nombre de fils qui lisent les rendez-vous.")
+    parser.add_argument('--duration', type=float, default=10, help="Durée de la mesure, en secondes.")
+    parser.add_argument('--users', type=int, default=200, help="Nombre de patients.")
+    parser.add_argument('--doctors', type=int, default=3, help="Nombre de médecins.")
+    parser.add_argument('--appointments', type=int, default=1000, help="Nombre de rendez-vous enregistrés avant la mesure.")
+    parser.add_argument('--days', type=int, default=60, help="Nombre de jours de l'agenda, dans le passé comme dans le futur.")
+    parser.add_argument('--mode', choices=PROFILES, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.mode:
+        return child(options)
+
+    print('{:<8} {:>9} {:>9} {:>10} {:>10} {:>10} {:>10} {:>9} {:>8}'.format(
+        'profil', 'écr./s', 'lect./s', 'écr. p50', 'écr. p95', 'lect. p50', 'lect. p95', 'conflits', 'erreurs'))
+    for mode in PROFILES:
+        arguments = [sys.executable, os.path.abspath(__file__), '--mode', mode] + sys.argv[1:]
+        output = subprocess.run(arguments, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print('{mode:<8} {writes:>9.1f} {reads:>9.1f} {write_p50:>10.1f} {write_p95:>10.1f} {read_p50:>10.1f} {read_p95:>10.1f} {conflicts:>9} {errors:>8}'.format(**result))
+    print('(durées en millisecondes)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Préparation d'un processus de mesure : configuration de Django et base de test jetable."""
+import os
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def setup(async_views=False, fast_hasher=True, database=None):
+    """Configure Django, puis crée et active une base de test, comme le fait manage.py test.
+
+    Avec fast_hasher, les mots de passe sont hachés en MD5 : le hachage PBKDF2 (plusieurs centaines de millisecondes, et voulu) masquerait sinon les autres coûts des pages d'inscription et de connexion.
+
+    database remplace, s'il est donné, la configuration de la base 'default' (même forme qu'une entrée de DATABASES) ; il est appliqué avant django.setup(), qui lit la configuration des bases.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coachapp.settings')
+    os.environ['BOOKING_ASYNC_VIEWS'] = '1' if async_views else '0'
+    import django
+    from django.conf import settings
+    if database is not None:
+        settings.DATABASES['default'] = database
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['testserver']
+    if fast_hasher:
+        settings.PASSWORD_HASHERS = FAST_HASHERS
+    connection.creation.create_test_db(verbosity=0)
@@ -0,0 +1,55 @@
+"""Fabriques de données pour les mesures de performance : utilisateurs et rendez-vous créés en masse.
+
+Les insertions passent par bulk_create, et le mot de passe n'est haché qu'une fois pour tous les utilisateurs : la préparation d'une base de plusieurs milliers de rendez-vous ne prend que quelques secondes. bulk_create n'envoyant aucun signal, le cache est vidé à la fin de make_appointments, afin que l'index de disponibilité et les fragments soient recalculés à partir de la base.
+"""
+import datetime
+import random
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.utils import timezone
+from authentification.models import User
+from booking.models import Appointment, Note
+
+PASSWORD = 'Mesure-2023!'
+
+
+def make_users(count, role='PATIENT', prefix=None):
+    """Crée count utilisateurs du rôle donné, tous avec le mot de passe PASSWORD, et les renvoie."""
+    prefix = prefix or role.lower()
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username='{}{}'.format(prefix, i), password=password, role=role, first_name=prefix.capitalize(), last_name=str(i))
+        for i in range(count)
+    ], batch_size=500)
+    return list(User.objects.filter(username__startswith=prefix, role=role).order_by('id'))
+
+
+def make_appointments(count, patients, doctors, days=60, seed=0):
+    """Crée count rendez-vous répartis entre les patients et dans les agendas des médecins, de days jours dans le passé à days jours dans le futur.
+
+    Les créneaux suivent la grille par défaut (un toutes les 30 minutes de 9h à 17h, sauf à 13h) et ne se chevauchent pas dans l'agenda d'un médecin. Renvoie le nombre de rendez-vous créés, qui peut être inférieur à count si les agendas sont pleins.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    slots = [
+        timezone.make_aware(datetime.datetime.combine(today + datetime.timedelta(days=offset), datetime.time(9)) + datetime.timedelta(minutes=30 * i))
+        for offset in range(-days, days + 1)
+        for i in range(16) if i != 8  # pas de créneau à 13h
+    ]
+    capacity = len(slots) * len(doctors)
+    chosen = rng.sample(range(capacity), min(count, capacity))
+    Appointment.objects.bulk_create([
+        Appointment(
+            user=rng.choice(patients), doctor=doctors[index % len(doctors)], start=slots[index // len(doctors)],
+            objet='Séance {}'.format(index),
+        )
+        for index in chosen
+    ], batch_size=1000)
+    cache.clear()
+    return len(chosen)
+
+
+def make_notes(count, patients, seed=0):
+    rng = random.Random(seed)
+    Note.objects.bulk_create([Note(user=rng.choice(patients), text='Note {}'.format(i)) for i in range(count)], batch_size=1000)
+    cache.clear()
@@ -0,0 +1,78 @@
+"""Mesure le parcours complet de prise de rendez-vous (benchmarks/workflow.py) sur une base de test remplie par les fabriques.
+
+Affiche pour chaque étape les percentiles de durée, le nombre de requêtes SQL et le débit. Les résultats peuvent être enregistrés (--output) puis comparés à ceux d'une autre version du code (--compare), et confrontés aux budgets de benchmarks/budgets.py (--check, code de sortie 1 en cas de dépassement).
+
+Utilisation, depuis le dossier qui contient manage.py :
+    python benchmarks/run.py --users 200 --appointments 5000 --iterations 30 --output avant.json
+    python benchmarks/run.py --users 200 --appointments 5000 --iterations 30 --compare avant.json --check
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import environment
+
+COLUMNS = ('p50', 'p95', 'p99', 'queries', 'throughput')
+
+
+def print_report(report, previous=None):
+    header = '{:<16} {:>6} {:>9} {:>9} {:>9} {:>8} {:>8}'.format('étape', 'n', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'SQL', 'req/s')
+    print(header)
+    for step, measures in report.items():
+        print('{:<16} {count:>6} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {queries:>8.1f} {throughput:>8.1f}'.format(step, **measures))
+        if previous and step in previous:
+            deltas = [measures[column] - previous[step][column] for column in COLUMNS]
+            print('{:<16} {:>6} {:>+9.1f} {:>+9.1f} {:>+9.1f} {:>+8.1f} {:>+8.1f}'.format('  écart', '', *deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=100, help="Nombre de patients créés avant la mesure.")
+    parser.add_argument('--doctors', type=int, default=3, help="Nombre de médecins.")
+    parser.add_argument('--appointments', type=int, default=2000, help="Nombre de rendez-vous créés avant la mesure.")
+    parser.add_argument('--iterations', type=int, default=20, help="Nombre de parcours joués.")
+    parser.add_argument('--seed', type=int, default=0, help="Graine du générateur aléatoire, pour des mesures reproductibles.")
+    parser.add_argument('--slow-hasher', action='store_true', help="Garde le hachage des mots de passe configuré (PBKDF2) au lieu de MD5.")
+    parser.add_argument('--output', help="Enregistre les résultats dans ce fichier JSON.")
+    parser.add_argument('--compare', help="Affiche l'écart avec les résultats enregistrés dans ce fichier JSON.")
+    parser.add_argument('--check', action='store_true', help="Vérifie les budgets de benchmarks/budgets.py.")
+    options = parser.parse_args()
+
+    environment.setup(fast_hasher=not options.slow_hasher)
+    from benchmarks import budgets, factories, workflow
+
+    patients = factories.make_users(options.users)
+    doctors = factories.make_users(options.doctors, role='MEDECIN')
+    factories.make_appointments(options.appointments, patients, doctors, seed=options.seed)
+    factories.make_notes(options.users * 2, patients, seed=options.seed)
+
+    started = time.perf_counter()
+    recorder = workflow.run(options.iterations, doctors, seed=options.seed)
+    elapsed = time.perf_counter() - started
+    report = recorder.report()
+
+    previous = None
+    if options.compare:
+        with open(options.compare) as stream:
+            previous = json.load(stream)['steps']
+    print_report(report, previous)
+    requests = sum(measures['count'] for measures in report.values())
+    print('\n{} requêtes en {:.1f} s, soit {:.1f} requêtes par seconde sur l\'ensemble du parcours.'.format(requests, elapsed, requests / elapsed))
+
+    if options.output:
+        with open(options.output, 'w') as stream:
+            json.dump({'options': vars(options), 'steps': report}, stream, indent=2)
+    if options.check:
+        failures = budgets.check(report)
+        for failure in failures:
+            print('Budget dépassé : ' + failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from . import budgets, factories, workflow
+from .environment import FAST_HASHERS
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class WorkflowBudgetTests(TestCase):
+    """Garde-fou de performance : joue le parcours de prise de rendez-vous et échoue si une étape dépasse son budget de requêtes SQL ou de durée (benchmarks/budgets.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = factories.make_users(30)
+        cls.doctors = factories.make_users(2, role='MEDECIN')
+        factories.make_appointments(600, cls.patients, cls.doctors)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_budgets(self):
+        report = workflow.run(8, self.doctors).report()
+        self.assertEqual(budgets.check(report), [])
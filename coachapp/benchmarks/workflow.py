@@ -0,0 +1,102 @@
+"""Parcours complet de prise de rendez-vous, joué avec le client de test de Django, et mesure de chaque requête.
+
+Chaque itération du parcours inscrit un nouveau patient, le déconnecte et le reconnecte, lui fait prendre un rendez-vous (page de réservation, API de disponibilité, envoi du formulaire), consulter ses rendez-vous, modifier puis annuler le rendez-vous ; un médecin consulte son tableau de bord entre-temps. Pour chaque étape sont relevés la durée de la requête et le nombre de requêtes SQL.
+"""
+import random
+import statistics
+import time
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from booking.models import Appointment
+from .factories import PASSWORD
+
+
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+
+def count_queries(queries):
+    """Compte les requêtes SQL, hors instructions de gestion des transactions : dans un TestCase, chaque bloc atomic ajoute des points de sauvegarde qui n'existent pas en production."""
+    return sum(1 for query in queries if not query['sql'].upper().startswith(TRANSACTION_STATEMENTS))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Recorder:
+    """Accumule les mesures des requêtes, par étape du parcours."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def request(self, client, step, method, path, data=None, expected=(200, 302)):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data or {})
+            duration = time.perf_counter() - started
+        if response.status_code not in expected:
+            raise AssertionError('{} {} : statut {}'.format(method.upper(), path, response.status_code))
+        self.samples.setdefault(step, []).append((duration, count_queries(queries.captured_queries)))
+        return response
+
+    def report(self):
+        """Renvoie, pour chaque étape, le nombre de requêtes, les percentiles de durée (en millisecondes), le nombre de requêtes SQL (moyen et maximal) et le débit (requêtes par seconde d'un seul client)."""
+        report = {}
+        for step, samples in self.samples.items():
+            durations = [duration for duration, queries in samples]
+            counts = [queries for duration, queries in samples]
+            report[step] = {
+                'count': len(samples),
+                'p50': percentile(durations, 0.5) * 1000,
+                'p95': percentile(durations, 0.95) * 1000,
+                'p99': percentile(durations, 0.99) * 1000,
+                'queries': statistics.mean(counts),
+                'max_queries': max(counts),
+                'throughput': len(samples) / sum(durations),
+            }
+        return report
+
+
+def _free_slot(recorder, client, doctor, rng):
+    data = recorder.request(client, 'availability', 'get', reverse('booking-availability'), {'doctor': doctor.pk}).json()
+    day = rng.choice(data['days'])
+    return day['date'], rng.choice(day['slots'])['value']
+
+
+def run(iterations, doctors, seed=0):
+    """Joue iterations fois le parcours et renvoie le Recorder qui contient les mesures."""
+    rng = random.Random(seed)
+    recorder = Recorder()
+    for iteration in range(iterations):
+        # Une adresse par patient, comme en production : les limites par adresse IP (THROTTLE_RULES) restent actives.
+        client = Client(REMOTE_ADDR='10.{}.{}.{}'.format(iteration // 65536 % 256, iteration // 256 % 256, iteration % 256))
+        doctor = doctors[iteration % len(doctors)]
+        username = 'inscrit{}-{}'.format(seed, iteration)
+
+        recorder.request(client, 'signup', 'post', reverse('signup'), {
+            'username': username, 'email': '{}@example.com'.format(username), 'first_name': 'Patient', 'last_name': str(iteration),
+            'password1': PASSWORD, 'password2': PASSWORD,
+        }, expected=(302,))
+        client.logout()
+        recorder.request(client, 'login', 'post', reverse('login'), {'username': username, 'password': PASSWORD}, expected=(302,))
+
+        recorder.request(client, 'booking (GET)', 'get', reverse('booking'), {'doctor': doctor.pk})
+        day, heure = _free_slot(recorder, client, doctor, rng)
+        recorder.request(client, 'booking (POST)', 'post', reverse('booking'), {
+            'doctor': doctor.pk, 'date': day, 'heure': heure, 'objet': 'Première séance'}, expected=(302,))
+        appointment = Appointment.objects.filter(user__username=username).latest('id')
+
+        recorder.request(client, 'consult', 'get', reverse('consult'))
+
+        doctor_client = Client()
+        doctor_client.force_login(doctor)
+        recorder.request(doctor_client, 'manage', 'get', reverse('manage'))
+
+        day, heure = _free_slot(recorder, client, doctor, rng)
+        recorder.request(client, 'change', 'post', reverse('appointment-change', args=[appointment.pk]), {
+            'doctor': doctor.pk, 'date': day, 'heure': heure, 'objet': 'Séance déplacée'}, expected=(302,))
+        recorder.request(client, 'delete', 'post', reverse('appointment-delete', args=[appointment.pk]), expected=(302,))
+    return recorder
@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import ContactMessage
 
-# Register your models here.
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'email', 'name', 'ip', 'delivered_at')
+    list_filter = ('delivered_at',)
+    search_fields = ('email', 'name', 'message')
+    readonly_fields = ('ip', 'created_at', 'delivery_token', 'delivered_at')
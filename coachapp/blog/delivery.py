@@ -0,0 +1,57 @@
+"""Remise des messages de contact, en tâche de fond (application tasks).
+
+L'enregistrement d'un message par la vue contact ne coûte qu'une insertion : la table blog_contactmessage sert de boîte d'envoi. La vue programme ensuite la tâche de remise, dans CONTACT_DELIVERY_DELAY secondes, sauf si une remise est déjà programmée (marque dans le cache, posée par cache.add, sans requête) : lors d'un afflux de messages, une seule tâche les remet tous, par une seule connexion au serveur de courriel.
+
+La tâche retire la marque, puis prend tous les messages en attente en les marquant de son identifiant (une mise à jour conditionnelle : deux tâches simultanées ne remettent jamais le même message ; une tâche reprise après l'arrêt de son processus retrouve les messages qu'elle avait pris), envoie au coach chaque message et à son expéditeur un accusé de réception, et enregistre la date de remise. Un message arrivé après la prise des messages programme une nouvelle tâche. En cas d'échec de l'envoi, les messages sont rendus à la boîte d'envoi et la tâche est réessayée (voir tasks/worker.py) ; la marque expire au bout de CONTACT_DELIVERY_TIMEOUT secondes, au cas où aucun processus d'exécution ne tournerait.
+"""
+import datetime
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from tasks.registry import enqueue, task
+from .models import ContactMessage
+
+SCHEDULED_KEY = 'blog:contact:delivery-scheduled'
+
+
+def schedule():
+    """Programme la remise des messages en attente, si elle ne l'est pas déjà."""
+    if cache.add(SCHEDULED_KEY, True, settings.CONTACT_DELIVERY_TIMEOUT):
+        enqueue(deliver_messages, {'token': uuid.uuid4().hex},
+                run_at=timezone.now() + datetime.timedelta(seconds=settings.CONTACT_DELIVERY_DELAY))
+
+
+def _emails(message):
+    context = {'message': message}
+    return [
+        EmailMessage(
+            'Nouveau message de {}'.format(message.name or message.email),
+            render_to_string('blog/emails/contact_message.txt', context),
+            to=settings.CONTACT_RECIPIENTS, reply_to=[message.email],
+        ),
+        EmailMessage(
+            'Votre message a bien été reçu',
+            render_to_string('blog/emails/contact_receipt.txt', context),
+            to=[message.email],
+        ),
+    ]
+
+
+@task(name='blog.deliver_contact_messages')
+def deliver_messages(payload):
+    cache.delete(SCHEDULED_KEY)
+    token = payload['token']
+    pending = ContactMessage.objects.filter(Q(delivery_token='') | Q(delivery_token=token), delivered_at=None)
+    if not pending.update(delivery_token=token):
+        return
+    claimed = ContactMessage.objects.filter(delivery_token=token)
+    try:
+        get_connection().send_messages([email for message in claimed.order_by('created_at') for email in _emails(message)])
+    except Exception:
+        claimed.update(delivery_token='')
+        raise
+    claimed.update(delivered_at=timezone.now(), delivery_token='')
@@ -1,7 +1,11 @@
 from django import forms
+from blog.models import ContactMessage
 
-class ContactUsForm(forms.Form):
-   name = forms.CharField(required=False)
-   email = forms.EmailField()
-   message = forms.CharField(max_length=1000)
-   
\ No newline at end of file
+
+class ContactUsForm(forms.ModelForm):
+    """Formulaire de la page de contact, enregistré tel quel dans un ContactMessage."""
+
+    class Meta:
+        model = ContactMessage
+        fields = ['name', 'email', 'message']
+        widgets = {'message': forms.Textarea}
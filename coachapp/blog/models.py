@@ -1,3 +1,33 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ContactMessage(models.Model):
+    """Message envoyé depuis la page de contact.
+
+    Le message est enregistré en une seule insertion, puis remis au coach (avec un accusé de réception à l'expéditeur) par une tâche de fond (voir blog/delivery.py) : la table sert de boîte d'envoi, et un message dont l'envoi a échoué reste en base jusqu'au prochain essai.
+
+    Attributs:
+    - name, email, message: nom (facultatif), adresse et texte de l'expéditeur.
+    - ip: adresse IP de l'expéditeur, utilisée par la limitation du nombre de messages.
+    - created_at: date d'envoi du formulaire.
+    - delivery_token: identifiant de la tâche qui remet le message, tant qu'elle est en cours.
+    - delivered_at: date de remise du message, ou None s'il est en attente.
+
+    Meta.indexes: un index (delivered_at, created_at), parcouru par la tâche de remise pour trouver les messages en attente.
+    """
+    name = models.CharField(max_length=100, blank=True, verbose_name='Nom')
+    email = models.EmailField(verbose_name='Adresse électronique')
+    message = models.TextField(max_length=1000)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    delivery_token = models.CharField(max_length=32, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivered_at', 'created_at'], name='blog_contact_pending_idx'),
+        ]
+
+    def __str__(self):
+        return '{} ({:%d/%m/%Y %H:%M})'.format(self.email, self.created_at)
@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from tasks import worker
+from tasks.models import Task
+from .models import ContactMessage
 
-# Create your tests here.
+
+@override_settings(CONTACT_RECIPIENTS=['coach@example.com'], CONTACT_RATE_LIMITS={'ip': (3, 3600), 'email': (2, 3600)})
+class ContactTests(TestCase):
+    """Vérifie l'enregistrement des messages de contact, leur remise groupée en tâche de fond et la limitation de leur nombre."""
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, email, ip='192.0.2.1'):
+        return self.client.post(reverse('contact'), {'name': 'Alice', 'email': email, 'message': 'Bonjour'}, REMOTE_ADDR=ip)
+
+    def test_messages_are_stored_then_delivered_together(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.post('alice@example.com').status_code, 302)
+        with self.assertNumQueries(1):
+            self.post('bob@example.com')
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Task.objects.count(), 1)
+
+        Task.objects.update(run_at=Task.objects.get().created_at)
+        worker.run_pending()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         ['alice@example.com', 'bob@example.com', 'coach@example.com', 'coach@example.com'])
+        self.assertFalse(ContactMessage.objects.filter(delivered_at=None).exists())
+
+    def test_rate_limits(self):
+        self.assertEqual(self.post('alice@example.com').status_code, 302)
+        self.assertEqual(self.post('alice@example.com').status_code, 302)
+        self.assertEqual(self.post('alice@example.com').status_code, 429)
+        # Le message refusé n'est pas compté pour l'adresse IP.
+        self.assertEqual(self.post('bob@example.com').status_code, 302)
+        self.assertEqual(self.post('bob@example.com').status_code, 429)
+        self.assertEqual(self.post('bob@example.com', ip='192.0.2.2').status_code, 302)
+        self.assertEqual(ContactMessage.objects.count(), 4)
+
+    @override_settings(THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_rate_limits_behind_proxy(self):
+        def post(email, forwarded):
+            return self.client.post(reverse('contact'), {'name': 'Alice', 'email': email, 'message': 'Bonjour'},
+                                    REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=forwarded)
+        for i in range(3):
+            self.assertEqual(post('client{}@example.com'.format(i), '198.51.100.1').status_code, 302)
+        self.assertEqual(post('client3@example.com', '198.51.100.1').status_code, 429)
+        # Un autre client derrière le même serveur mandataire garde son propre quota.
+        self.assertEqual(post('client4@example.com', '10.0.0.1, 198.51.100.2').status_code, 302)
+        self.assertEqual(sorted(ContactMessage.objects.values_list('ip', flat=True).distinct()), ['198.51.100.1', '198.51.100.2'])
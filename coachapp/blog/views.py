@@ -1,7 +1,11 @@
+import ipaddress
+from django.conf import settings
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from blog.forms import ContactUsForm
-from django.core.mail import send_mail
+from blog import delivery
+from coachapp import throttling
 
 @login_required
 def home(request):
@@ -10,21 +14,51 @@ def home(request):
 def contact(request):
     """Cette fonction gère la vue de la page de contact du système.
 
-    Elle utilise le formulaire ContactUsForm pour collecter les informations de l'utilisateur et les envoyer au serveur pour traitement.
+    Elle utilise le formulaire ContactUsForm pour collecter les informations de l'utilisateur. Un message valide est enregistré en une seule insertion, puis remis au coach par une tâche de fond (voir blog/delivery.py) : aucune connexion au serveur de courriel n'est ouverte pendant la requête. Le nombre de messages est limité par adresse IP et par adresse électronique, sur une fenêtre glissante (réglage CONTACT_RATE_LIMITS) ; l'adresse IP est celle du client, lue comme pour la limitation du débit (throttling.client_ip, qui tient compte de THROTTLE_IP_HEADER derrière un serveur mandataire). Au-delà, le formulaire est affiché à nouveau avec le statut 429.
 
     Paramètres :
     - request (HttpRequest) : L'objet de requête HTTP envoyé par le client.
     """
+    status = 200
     if request.method == 'POST':
         form = ContactUsForm(request.POST)
-
+        if form.is_valid():
+            ip = throttling.client_ip(request)
+            if _rate_limited(ip, form.cleaned_data['email']):
+                form.add_error(None, "Vous avez envoyé trop de messages. Merci de réessayer plus tard.")
+                status = 429
+            else:
+                message = form.save(commit=False)
+                message.ip = _valid_ip(ip)
+                message.save()
+                delivery.schedule()
+                return redirect(reverse('contact') + '?envoye=1')
     else:
         form = ContactUsForm()
 
     return render(request,
                 'blog/contact.html',
-                {'form': form})
-    
+                {'form': form, 'sent': 'envoye' in request.GET},
+                status=status)
+
+
+def _rate_limited(ip, email):
+    """Compte un message pour l'adresse IP et pour l'adresse électronique, et renvoie True si l'une d'elles a atteint sa limite (CONTACT_RATE_LIMITS : nombre de messages par fenêtre glissante de temps en secondes).
+
+    Les compteurs sont tenus dans le cache (voir coachapp/throttling.py), sans requête en base de données ; un message refusé n'est pas compté.
+    """
+    return throttling.hit([
+        (throttling.make_key('contact', scope, value), *settings.CONTACT_RATE_LIMITS[scope])
+        for scope, value in (('ip', ip), ('email', email.lower()))
+    ]) is not None
+
+def _valid_ip(value):
+    """Renvoie l'adresse IP si elle est valide, sinon None : un en-tête transmis par le serveur mandataire peut contenir n'importe quoi."""
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
 def about(request):
     return render(request, 'blog/about.html')
 
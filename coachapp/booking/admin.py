@@ -3,4 +3,22 @@ from .models import *
 
 admin.site.register(Appointment)
 
-admin.site.register(Note)
\ No newline at end of file
+admin.site.register(Note)
+
+
+class ScheduleBreakInline(admin.TabularInline):
+    model = ScheduleBreak
+    extra = 0
+
+
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekday', 'start_time', 'end_time', 'slot_length', 'slot_interval')
+    list_filter = ('doctor', 'weekday')
+    inlines = [ScheduleBreakInline]
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'doctor', 'label')
+    list_filter = ('doctor',)
@@ -0,0 +1,101 @@
+"""Versions asynchrones des vues de lecture des rendez-vous, pour un déploiement ASGI (voir coachapp/asgi.py).
+
+Servies par un serveur ASGI, ces vues libèrent la boucle d'événements pendant les accès à la base de données (méthodes asynchrones de l'ORM) et l'envoi des réponses, au lieu d'occuper un fil d'exécution par client : un grand nombre de clients lents peut être servi simultanément. Sous WSGI, chaque appel demanderait au contraire une boucle d'événements : les adresses ne pointent donc vers ces vues que si le réglage BOOKING_ASYNC_VIEWS est actif, ce que fait coachapp/asgi.py.
+
+Le rendu des gabarits et les accès au cache restent synchrones ; les gabarits ne font aucune requête, les rendez-vous et leurs patients étant chargés avant le rendu.
+"""
+import functools
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from .models import Appointment
+from .pagination import get_page_size, akeyset_page, page_query
+from .views import _availability_query, _feed_url
+from . import availability, fragments
+
+
+def async_login_required(view):
+    """Équivalent de login_required pour les vues asynchrones, que le décorateur de Django 4.1 ne prend pas en charge.
+
+    La session et l'utilisateur sont chargés dans un fil d'exécution séparé (sync_to_async) : ensuite, request.user peut être lu sans requête.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@async_login_required
+async def consult_appointment(request):
+    """Version asynchrone de views.consult_appointment : même page, mêmes fragments en cache."""
+    appointments = Appointment.objects.for_listing().filter(user=request.user)
+    scope = fragments.user_scope(request.user.pk)
+
+    async def upcoming():
+        return {'appointments': [appointment async for appointment in appointments.upcoming()]}
+
+    async def past():
+        return {'appointments': [appointment async for appointment in appointments.past()]}
+
+    return render(request, 'booking/consult_appointment.html', {
+        'upcoming': await fragments.arender_fragment(scope, 'upcoming', 'booking/fragments/consult_upcoming.html', upcoming),
+        'past': await fragments.arender_fragment(scope, 'past', 'booking/fragments/consult_past.html', past),
+        'feed_url': _feed_url(request),
+    })
+
+
+@async_login_required
+async def manage_appointment(request):
+    """Version asynchrone de views.manage_appointment : même pagination par curseur, même fragment en cache."""
+    page_size = get_page_size(request)
+
+    async def get_context():
+        appointments = Appointment.objects.for_listing().for_doctor(request.user)
+        upcoming = await akeyset_page(appointments.upcoming(), request.GET.get('upcoming'), page_size)
+        past = await akeyset_page(appointments.past(), request.GET.get('past'), page_size, descending=True)
+        return {
+            'upcoming': upcoming,
+            'past': past,
+            'next_upcoming': upcoming.next_cursor and page_query(request, 'upcoming', upcoming.next_cursor),
+            'next_past': past.next_cursor and page_query(request, 'past', past.next_cursor),
+            'paginated': bool(request.GET.get('upcoming') or request.GET.get('past')),
+        }
+
+    variant = '{}:{}:{}'.format(page_size, request.GET.get('upcoming', ''), request.GET.get('past', ''))
+    return render(request, 'booking/manage_appointment.html', {
+        'appointments': await fragments.arender_fragment(
+            fragments.manage_scope(request.user.pk), 'list', 'booking/fragments/manage_list.html', get_context, variant),
+        'feed_url': _feed_url(request),
+    })
+
+
+@async_login_required
+async def availability_api(request):
+    """Version asynchrone de views.availability_api.
+
+    Le décorateur condition de Django 4.1 ne prend pas en charge les vues asynchrones : la réponse 304 est produite par get_conditional_response. L'index de disponibilité et la grille de créneaux ne sont lus en base qu'en cas d'échec du cache ; ces lectures passent par sync_to_async.
+    """
+    query = _availability_query(request)
+    if not query:
+        return HttpResponseBadRequest("Paramètres invalides.")
+    doctor_id, day_choices = query
+    days = [value for value, label in day_choices]
+    etag = quote_etag(await sync_to_async(availability.get_etag)(doctor_id, days))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        free = await sync_to_async(availability.free_slots_by_day)(doctor_id, days)
+        response = JsonResponse({
+            'doctor': doctor_id,
+            'days': [
+                {'date': value, 'label': label, 'slots': [{'value': slot, 'label': slot_label} for slot, slot_label in free[value]]}
+                for value, label in day_choices if free[value]
+            ],
+        })
+    response.headers['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
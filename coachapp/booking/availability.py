@@ -0,0 +1,116 @@
+"""Index de disponibilité des créneaux de rendez-vous.
+
+Pour chaque médecin et chaque jour, les créneaux déjà réservés sont représentés par un masque de bits (un bit par minute de la journée, toutes les minutes occupées par un rendez-vous, de son début inclus à sa fin exclue) conservé dans le cache Django. Tester un créneau revient donc à un simple ET binaire entre le masque du jour et celui des minutes du créneau : un créneau qui chevauche un rendez-vous, même s'il ne commence pas à la même heure (plages de durées différentes), est refusé. La liste des créneaux libres de plusieurs jours est obtenue en une seule lecture du cache.
+
+Les créneaux proposés eux-mêmes sont produits par booking/slots.py à partir des horaires de travail du médecin.
+
+Le masque d'un jour est recalculé à partir de la base de données lorsqu'il est absent du cache ou a expiré (BOOKING_AVAILABILITY_TIMEOUT secondes), ainsi qu'à chaque création, modification ou suppression d'un rendez-vous (voir booking/signals.py).
+
+Avec plusieurs processus serveurs et un cache propre à chaque processus (LocMemCache), les signaux ne mettent à jour que le cache du processus qui a enregistré le rendez-vous : l'index des autres processus peut être périmé jusqu'à son expiration. Il n'est donc qu'une indication. Un créneau que l'index marque comme libre est vérifié en base lors de l'enregistrement (booking/reservations.py) ; un créneau qu'il marque comme pris est vérifié par is_free, qui recalcule l'index du jour avant de refuser le créneau. Seule la liste des créneaux proposés peut omettre, jusqu'à l'expiration de l'index, un créneau libéré dans un autre processus : un cache partagé (voir CACHES) supprime ce décalage.
+"""
+import datetime
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from .models import Appointment
+from . import slots
+
+CACHE_KEY = 'booking:occupancy:minutes:{}:{}'
+
+
+def slot_bits(heure):
+    """Renvoie le masque des minutes du créneau 'HH:MM - HH:MM', de son début inclus à sa fin exclue (au moins une minute)."""
+    start = int(heure[0:2]) * 60 + int(heure[3:5])
+    end = int(heure[8:10]) * 60 + int(heure[11:13])
+    return ((1 << max(end - start, 1)) - 1) << start
+
+
+def _cache_key(doctor_id, day):
+    return CACHE_KEY.format(doctor_id, day)
+
+
+def _compute(doctor_id, days):
+    """Calcule en une seule requête (sur l'index (doctor, start)) le masque d'occupation des jours donnés dans l'agenda du médecin, et le stocke dans le cache."""
+    occupancy = dict.fromkeys(days, 0)
+    first, last = min(days), max(days)
+    appointments = Appointment.objects.filter(
+        doctor_id=doctor_id,
+        start__gte=Appointment.slot_start(first, '00:00'),
+        start__lt=Appointment.slot_start(last, '00:00') + datetime.timedelta(days=1),
+    ).only('start', 'duration')
+    for appointment in appointments:
+        if appointment.date in occupancy:
+            occupancy[appointment.date] |= slot_bits(appointment.heure)
+    cache.set_many({_cache_key(doctor_id, day): mask for day, mask in occupancy.items()}, settings.BOOKING_AVAILABILITY_TIMEOUT)
+    return occupancy
+
+
+def get_occupancy(doctor_id, days):
+    """Renvoie un dictionnaire {jour: masque de bits des créneaux réservés} pour les jours donnés dans l'agenda du médecin.
+
+    Les jours absents du cache sont recalculés ensemble, en une seule requête. doctor_id vaut None pour l'agenda des rendez-vous sans médecin.
+    """
+    keys = {_cache_key(doctor_id, day): day for day in days}
+    occupancy = {keys[key]: mask for key, mask in cache.get_many(keys).items()}
+    missing = [day for day in keys.values() if day not in occupancy]
+    if missing:
+        occupancy.update(_compute(doctor_id, missing))
+    return occupancy
+
+
+def refresh(doctor_id, *days):
+    """Recalcule l'index des jours donnés dans l'agenda du médecin. Appelée par les signaux du modèle Appointment."""
+    days = [day for day in set(days) if day]
+    if days:
+        _compute(doctor_id, days)
+
+
+def forget(doctor_id, *days):
+    """Retire du cache l'index des jours donnés dans l'agenda du médecin, qui sera recalculé à la prochaine lecture.
+
+    Utilisée après un import en masse (bulk_create n'envoie pas de signal), où recalculer chaque jour touché tout de suite serait inutilement coûteux.
+    """
+    cache.delete_many([_cache_key(doctor_id, day) for day in set(days) if day])
+
+
+def _mask(occupancy, doctor_id, day, ignore):
+    """Renvoie le masque d'occupation du jour, sans les minutes du créneau ignore (médecin, jour, heure) s'il est dans le même agenda."""
+    mask = occupancy[day]
+    if ignore and tuple(ignore[:2]) == (doctor_id, day):
+        mask &= ~slot_bits(ignore[2])
+    return mask
+
+
+def is_free(doctor_id, day, heure, ignore=None):
+    """Indique si le créneau (day, heure) ne chevauche aucun rendez-vous de l'agenda du médecin.
+
+    ignore: créneau (médecin, jour, heure) à considérer comme libre, typiquement celui du rendez-vous en cours de modification.
+
+    Un créneau libre d'après l'index est accepté sans requête ; un créneau pris d'après l'index n'est refusé qu'après le recalcul de l'index du jour à partir de la base de données, qui peut l'avoir libéré dans un autre processus.
+    """
+    bits = slot_bits(heure)
+    if not _mask(get_occupancy(doctor_id, [day]), doctor_id, day, ignore) & bits:
+        return True
+    return not _mask(_compute(doctor_id, [day]), doctor_id, day, ignore) & bits
+
+
+def free_slots_by_day(doctor_id, days, ignore=None):
+    """Renvoie un dictionnaire {jour: liste des choix (valeur, libellé) libres} pour les jours donnés dans l'agenda du médecin."""
+    occupancy = get_occupancy(doctor_id, days)
+    grid = slots.get_slots(doctor_id, days)
+    free = {}
+    for day in days:
+        mask = _mask(occupancy, doctor_id, day, ignore)
+        free[day] = [(value, label) for value, label in grid[day] if not mask & slot_bits(value)]
+    return free
+
+
+def get_etag(doctor_id, days):
+    """Renvoie un ETag des créneaux libres des jours donnés dans l'agenda du médecin.
+
+    Il est calculé à partir des masques d'occupation et des numéros de version de la grille de créneaux (booking/slots.py), c'est-à-dire en trois lectures du cache, sans construire la liste des créneaux.
+    """
+    occupancy = get_occupancy(doctor_id, days)
+    state = (doctor_id, slots.get_version(slots.doctor_scope(doctor_id)), slots.get_version(slots.HOLIDAYS),
+             [(day, occupancy[day]) for day in days])
+    return hashlib.md5(repr(state).encode()).hexdigest()
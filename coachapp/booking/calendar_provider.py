@@ -0,0 +1,34 @@
+"""Fournisseur des jours proposés à la réservation.
+
+La liste est calculée à la demande (et non plus à l'import du modèle), puis conservée en mémoire jusqu'au changement de date : un processus qui tourne plusieurs jours propose donc toujours la bonne fenêtre de jours, sans recalcul à chaque requête.
+"""
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from .formatting import format_day
+
+_cached = (None, [])
+
+
+def _compute(today):
+    choices = []
+    for i in range(1, settings.BOOKING_DAYS_AHEAD + 1):  # commencer à partir du lendemain
+        day = today + datetime.timedelta(days=i)
+        choices.append((day.isoformat(), format_day(day)))
+    return choices
+
+
+def get_day_choices():
+    """Renvoie les BOOKING_DAYS_AHEAD prochains jours, sous la forme de choix ('AAAA-MM-JJ', 'jeudi 16 février 2023').
+
+    Tous les jours sont renvoyés : ceux où le médecin ne consulte pas n'ont aucun créneau dans sa grille (booking/slots.py) et sont écartés par le formulaire.
+
+    Le résultat est mis en cache jusqu'à minuit (heure locale). Cette fonction peut être passée directement comme choices d'un champ de formulaire : elle est alors évaluée à chaque instanciation du formulaire.
+    """
+    global _cached
+    today = timezone.localdate()
+    day, choices = _cached
+    if day != today:
+        choices = _compute(today)
+        _cached = (today, choices)
+    return list(choices)
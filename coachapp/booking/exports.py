@@ -0,0 +1,61 @@
+"""Export de l'agenda d'un médecin aux formats CSV et iCalendar, en flux.
+
+Les rendez-vous sont lus par paquets de CHUNK_SIZE lignes (QuerySet.iterator, sans instancier de modèles) et chaque ligne est envoyée au client dès qu'elle est produite : la mémoire utilisée ne dépend pas de la taille de l'export, et le premier octet part sans attendre la fin de la lecture.
+"""
+import csv
+import datetime
+from django.utils import timezone
+from .formatting import format_day, format_slot
+from .models import Appointment
+from . import ical
+
+CHUNK_SIZE = 500
+
+FIELDS = ('id', 'start', 'duration', 'user__username', 'user__first_name', 'user__last_name', 'client', 'objet')
+
+CSV_HEADER = ('Date', 'Heure', 'Patient', 'Client', 'Objet')
+
+
+class Echo:
+    """Pseudo-fichier dont write() renvoie la valeur écrite, pour récupérer une à une les lignes produites par csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def agenda_rows(doctor, first_day, last_day):
+    """Renvoie un itérateur sur les rendez-vous de l'agenda du médecin du jour first_day au jour last_day inclus (dates locales), triés par début."""
+    start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time()))
+    end = timezone.make_aware(datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time()))
+    queryset = (Appointment.objects.for_doctor(doctor)
+                .filter(start__gte=start, start__lt=end)
+                .order_by('start', 'id')
+                .values_list(*FIELDS))
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(FIELDS, row))
+
+
+def _patient(row):
+    name = '{} {}'.format(row['user__first_name'] or '', row['user__last_name'] or '').strip()
+    return name or row['user__username'] or ''
+
+
+def csv_lines(rows):
+    """Produit l'en-tête puis une ligne CSV par rendez-vous."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        start = timezone.localtime(row['start'])
+        heure = '{:%H:%M} - {:%H:%M}'.format(start, start + row['duration'])
+        yield writer.writerow((format_day(start.date()), format_slot(heure), _patient(row), row['client'] or '', row['objet'] or ''))
+
+
+def ics_lines(rows, name):
+    """Produit un calendrier iCalendar, un événement par rendez-vous."""
+    stamp = timezone.now()
+    yield ical.header(name)
+    for row in rows:
+        yield ical.event(
+            ical.appointment_uid(row['id']), row['start'], row['duration'],
+            row['objet'] or 'Rendez-vous', _patient(row) or row['client'] or '', stamp)
+    yield ical.footer()
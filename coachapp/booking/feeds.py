@@ -0,0 +1,83 @@
+"""Flux d'abonnement iCalendar des rendez-vous de chaque utilisateur.
+
+Les agendas abonnés interrogent le flux très souvent, sans session : l'utilisateur est désigné par un jeton signé (django.core.signing) contenu dans l'URL, vérifié sans requête en base de données.
+
+Le validateur ETag est formé des numéros de version des fragments de l'utilisateur (booking/fragments.py), que les signaux incrémentent à chaque modification de ses rendez-vous, et du jour courant (la fenêtre du flux en dépend). Une requête conditionnelle dont l'ETag n'a pas changé reçoit donc une réponse 304 après deux lectures du cache, sans aucune requête SQL. Le corps du flux est lui-même conservé dans le cache pour chaque ETag, avec sa date de production, qui sert d'en-tête Last-Modified.
+"""
+import datetime
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from .models import Appointment
+from . import fragments, ical
+
+SALT = 'booking.feed'
+FEED_KEY = 'booking:feed:{}:{}'
+FEED_TIMEOUT = 60 * 60 * 24
+HISTORY = datetime.timedelta(days=365)
+
+FIELDS = ('id', 'user_id', 'doctor_id', 'start', 'duration', 'objet', 'client',
+          'user__username', 'user__first_name', 'user__last_name',
+          'doctor__username', 'doctor__first_name', 'doctor__last_name')
+
+
+def make_token(user):
+    """Renvoie le jeton du flux de l'utilisateur.
+
+    Le jeton ne dépend que de l'identifiant de l'utilisateur et de SECRET_KEY : il ne peut pas être révoqué individuellement, mais sa vérification ne coûte aucune requête.
+    """
+    return signing.Signer(salt=SALT).sign(str(user.pk))
+
+
+def read_token(token):
+    """Renvoie l'identifiant de l'utilisateur du jeton, ou None si le jeton est invalide."""
+    try:
+        return int(signing.Signer(salt=SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def get_etag(user_id):
+    """Renvoie l'ETag courant du flux de l'utilisateur, calculé sans requête SQL."""
+    return '{}-{}-{}'.format(
+        fragments.get_version(fragments.user_scope(user_id)),
+        fragments.get_version(fragments.manage_scope(user_id)),
+        timezone.localdate().isoformat(),
+    )
+
+
+def get_cached(user_id, etag):
+    """Renvoie le couple (date de production, corps) du flux en cache pour cet ETag, ou None."""
+    return fragments.get_cache().get(FEED_KEY.format(user_id, etag))
+
+
+def _name(row, prefix):
+    name = '{} {}'.format(row[prefix + '__first_name'] or '', row[prefix + '__last_name'] or '').strip()
+    return name or row[prefix + '__username'] or ''
+
+
+def _events(user_id, stamp):
+    since = timezone.now() - HISTORY
+    rows = (Appointment.objects
+            .filter(Q(user_id=user_id) | Q(doctor_id=user_id), start__gte=since)
+            .order_by('start', 'id')
+            .values_list(*FIELDS))
+    for row in rows.iterator():
+        row = dict(zip(FIELDS, row))
+        if row['doctor_id'] == user_id:
+            summary = 'Rendez-vous avec {}'.format(_name(row, 'user') or row['client'] or 'un patient')
+        elif row['doctor_id']:
+            summary = 'Rendez-vous avec {}'.format(_name(row, 'doctor'))
+        else:
+            summary = 'Rendez-vous'
+        yield ical.event(ical.appointment_uid(row['id']), row['start'], row['duration'],
+                         summary, row['objet'] or '', stamp)
+
+
+def build(user_id, etag):
+    """Produit le flux de l'utilisateur, le met en cache pour cet ETag et renvoie le couple (date de production, corps)."""
+    generated = timezone.now().replace(microsecond=0)
+    body = ical.header('Mes rendez-vous') + ''.join(_events(user_id, generated)) + ical.footer()
+    entry = (generated, body)
+    fragments.get_cache().set(FEED_KEY.format(user_id, etag), entry, FEED_TIMEOUT)
+    return entry
@@ -0,0 +1,29 @@
+"""Mise en forme des dates en français.
+
+Les libellés sont produits par Babel, qui embarque ses propres données de langue : le locale du processus n'est jamais modifié (locale.setlocale n'est pas sûr entre plusieurs threads et échoue si fr_FR n'est pas installé sur le serveur). Chaque jour n'est mis en forme qu'une fois, les appels suivants étant servis par un cache LRU.
+"""
+import datetime
+from functools import lru_cache
+from babel.dates import format_date
+
+LOCALE = 'fr_FR'
+
+
+@lru_cache(maxsize=2048)
+def format_day(day):
+    """Renvoie le libellé complet d'un jour (datetime.date), par exemple "jeudi 16 février 2023"."""
+    return format_date(day, format='full', locale=LOCALE)
+
+
+def format_time(value):
+    """Renvoie le libellé d'une heure (datetime.time), par exemple "9h" ou "9h30"."""
+    if value.minute:
+        return '{}h{:02d}'.format(value.hour, value.minute)
+    return '{}h'.format(value.hour)
+
+
+@lru_cache(maxsize=512)
+def format_slot(heure):
+    """Renvoie le libellé d'un créneau 'HH:MM - HH:MM', par exemple "9h30 - 9h50"."""
+    start, end = heure.split(' - ')
+    return '{} - {}'.format(format_time(datetime.time.fromisoformat(start)), format_time(datetime.time.fromisoformat(end)))
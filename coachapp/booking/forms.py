@@ -1,10 +1,60 @@
 from django import forms
 from .models import Appointment, Note
+from . import availability, slots
+from .calendar_provider import get_day_choices
 
 class AppointmentForm(forms.ModelForm):
+    """Formulaire de prise et de modification de rendez-vous.
+
+    Les jours proposés sont fournis par get_day_choices() à chaque instanciation du formulaire, et ils sont limités grâce à l'index de disponibilité de l'agenda du médecin choisi (attribut selected_doctor : celui des données envoyées, celui des valeurs initiales, celui passé en argument ou du rendez-vous modifié, ou à défaut le premier médecin) : seuls les jours qui ont encore au moins un créneau libre, et les horaires libres pour au moins un de ces jours, sont affichés. Les horaires eux-mêmes viennent des horaires de travail du médecin (booking/slots.py). Les champs date et heure ne sont pas des champs du modèle : clean() vérifie que l'horaire fait partie de la grille du jour choisi, puis les convertit en début (start) et durée (duration) du créneau. Le détail des créneaux libres par jour est disponible dans l'attribut free_slots, sous la forme d'une liste de couples (libellé du jour, liste des horaires libres).
+    """
+    date = forms.ChoiceField(choices=get_day_choices, label="Date")
+    heure = forms.ChoiceField(label="Heure")
+
     class Meta:
         model = Appointment
-        fields = ['client', 'date', 'heure', 'objet']
+        fields = ['client', 'doctor', 'date', 'heure', 'objet']
+
+    def __init__(self, *args, doctor=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if doctor is not None:
+            self.instance.doctor = doctor
+        if self.instance.pk:
+            self.initial.setdefault('date', self.instance.date)
+            self.initial.setdefault('heure', self.instance.heure)
+        self.doctors = list(self.fields['doctor'].queryset)
+        self.fields['doctor'].required = bool(self.doctors)
+        self.selected_doctor = self._select_doctor()
+        if self.selected_doctor:
+            self.initial['doctor'] = self.selected_doctor.pk
+        doctor_id = self.selected_doctor.pk if self.selected_doctor else None
+        day_choices = [(value, label) for value, label in self.fields['date'].choices if value]
+        free = availability.free_slots_by_day(doctor_id, [value for value, label in day_choices], ignore=self.instance.loaded_slot)
+        free_hours = dict(choice for day_slots in free.values() for choice in day_slots)
+        self.free_slots = [(label, free[value]) for value, label in day_choices if free[value]]
+        self.fields['date'].choices = [(value, label) for value, label in day_choices if free[value]]
+        self.fields['heure'].choices = sorted(free_hours.items())
+
+    def _select_doctor(self):
+        doctors = {str(doctor.pk): doctor for doctor in self.doctors}
+        if self.is_bound and self.add_prefix('doctor') in self.data:
+            return doctors.get(self.data[self.add_prefix('doctor')])
+        for doctor_id in (self.initial.get('doctor'), self.instance.doctor_id):
+            if str(doctor_id) in doctors:
+                return doctors[str(doctor_id)]
+        if self.instance.doctor_id:
+            return self.instance.doctor
+        return self.doctors[0] if self.doctors else None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('date') and cleaned_data.get('heure'):
+            doctor = cleaned_data.get('doctor', self.instance.doctor)
+            if not slots.is_offered(doctor.pk if doctor else None, cleaned_data['date'], cleaned_data['heure']):
+                raise forms.ValidationError("Ce créneau n'est pas proposé ce jour-là.")
+            self.instance.start = Appointment.slot_start(cleaned_data['date'], cleaned_data['heure'])
+            self.instance.duration = Appointment.slot_end(cleaned_data['date'], cleaned_data['heure']) - self.instance.start
+        return cleaned_data
 
 class NoteForm(forms.ModelForm):
     text = forms.CharField(label="Ajouter une note")
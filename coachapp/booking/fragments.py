@@ -0,0 +1,117 @@
+"""Cache des fragments HTML des listes de rendez-vous.
+
+Chaque fragment est rangé sous une clé qui contient le numéro de version de sa portée (les rendez-vous d'un patient, ou le tableau de bord d'un médecin). Les signaux post_save et post_delete des modèles Appointment et Note incrémentent ce numéro (voir booking/signals.py) : les anciens fragments ne sont plus jamais lus et expirent d'eux-mêmes, sans avoir à les rechercher pour les supprimer.
+
+La séparation entre rendez-vous à venir et passés dépend de l'heure courante : la clé contient donc aussi une tranche de temps de BOOKING_FRAGMENT_TIMEOUT secondes, et un fragment n'est jamais servi au-delà de sa tranche.
+
+Le cache utilisé est celui désigné par le réglage BOOKING_FRAGMENT_CACHE ; les compteurs de succès et d'échecs y sont conservés, afin d'être partagés par tous les processus lorsque le cache l'est (cache fichier par exemple).
+"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+VERSION_KEY = 'booking:fragments:version:{}'
+FRAGMENT_KEY = 'booking:fragments:{}:{}:{}:{}'
+HITS_KEY = 'booking:fragments:hits'
+MISSES_KEY = 'booking:fragments:misses'
+
+
+def get_cache():
+    return caches[settings.BOOKING_FRAGMENT_CACHE]
+
+
+def user_scope(user_id):
+    return 'user:{}'.format(user_id)
+
+
+def manage_scope(doctor_id):
+    return 'manage:{}'.format(doctor_id)
+
+
+def get_version(scope):
+    """Renvoie le numéro de version courant de la portée.
+
+    Le numéro initial est tiré de l'horloge, et non fixé à 1 : si la version est évincée du cache, la nouvelle ne peut pas retomber sur celle de fragments encore présents.
+    """
+    cache = get_cache()
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Invalide tous les fragments des portées données."""
+    cache = get_cache()
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def render_fragment(scope, name, template_name, get_context, variant=''):
+    """Renvoie le fragment HTML demandé, depuis le cache si possible.
+
+    Args:
+        scope: portée du fragment, dont la version fait partie de la clé (voir user_scope et manage_scope).
+        name: nom du fragment dans sa portée.
+        template_name: gabarit utilisé pour produire le fragment.
+        get_context: fonction sans argument qui renvoie le contexte du gabarit. Elle n'est appelée qu'en cas d'échec du cache, de sorte que les requêtes qu'elle fait sont évitées lorsque le fragment est déjà en cache.
+        variant: chaîne qui distingue plusieurs versions d'un même fragment, par exemple la page affichée.
+    """
+    key, html = _lookup(scope, name, variant)
+    if html is None:
+        html = _store(key, render_to_string(template_name, get_context()))
+    return mark_safe(html)
+
+
+async def arender_fragment(scope, name, template_name, get_context, variant=''):
+    """Variante de render_fragment pour les vues asynchrones : get_context est une coroutine, qui peut utiliser les méthodes asynchrones de l'ORM."""
+    key, html = _lookup(scope, name, variant)
+    if html is None:
+        html = _store(key, render_to_string(template_name, await get_context()))
+    return mark_safe(html)
+
+
+def _lookup(scope, name, variant):
+    """Renvoie la clé du fragment et son contenu en cache (None en cas d'échec), en comptant le succès ou l'échec."""
+    key = FRAGMENT_KEY.format(scope, get_version(scope), name, int(time.time() // settings.BOOKING_FRAGMENT_TIMEOUT))
+    if variant:
+        key += ':' + variant
+    html = get_cache().get(key)
+    _count(MISSES_KEY if html is None else HITS_KEY)
+    return key, html
+
+
+def _store(key, html):
+    get_cache().set(key, html, settings.BOOKING_FRAGMENT_TIMEOUT)
+    return html
+
+
+def get_stats():
+    """Renvoie les compteurs du cache de fragments : {'hits': ..., 'misses': ..., 'hit_ratio': ...}."""
+    counters = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
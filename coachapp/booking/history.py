@@ -0,0 +1,86 @@
+"""Historique d'un patient : ses rendez-vous passés et les notes écrites à son sujet, en un seul fil chronologique, du plus récent au plus ancien.
+
+Le fil est calculé par la base de données, en une requête par page : une union (UNION ALL) des rendez-vous passés et des notes, triée par date puis par type et identifiant, ce qui ordonne totalement les entrées. Chaque branche de l'union parcourt l'index (user, start) des rendez-vous ou (user, created_date) des notes.
+
+La pagination se fait par curseur, comme pour les listes de rendez-vous (booking/pagination.py) : la page suivante reprend juste après la dernière entrée affichée, identifiée par son triplet (date, type, id), sans OFFSET.
+"""
+import datetime
+from django.db.models import CharField, F, Q, Value
+from django.utils import timezone
+from .formatting import format_day, format_time
+from .models import Appointment, Note
+from .pagination import EPOCH, KeysetPage
+
+APPOINTMENT = 'appointment'
+NOTE = 'note'
+
+
+class Entry:
+    """Une entrée du fil : un rendez-vous passé (kind vaut APPOINTMENT, text est l'objet de la séance) ou une note (kind vaut NOTE)."""
+
+    def __init__(self, kind, id, at, text):
+        self.kind = kind
+        self.id = id
+        self.at = at
+        self.text = text
+
+    @property
+    def is_note(self):
+        return self.kind == NOTE
+
+    @property
+    def label(self):
+        """Renvoie le libellé de la date de l'entrée, par exemple "jeudi 16 février 2023 à 9h30"."""
+        at = timezone.localtime(self.at)
+        return '{} à {}'.format(format_day(at.date()), format_time(at.time()))
+
+    def as_json(self):
+        return {'kind': self.kind, 'id': self.id, 'at': self.at.isoformat(), 'label': self.label, 'text': self.text or ''}
+
+
+def encode_cursor(entry):
+    return '{}_{}_{}'.format((entry.at - EPOCH) // datetime.timedelta(microseconds=1), entry.kind, entry.id)
+
+
+def decode_cursor(cursor):
+    """Renvoie le triplet (date, type, id) codé dans le curseur, ou None si le curseur est absent ou invalide."""
+    try:
+        microseconds, kind, pk = cursor.split('_')
+        if kind not in (APPOINTMENT, NOTE):
+            return None
+        return EPOCH + datetime.timedelta(microseconds=int(microseconds)), kind, int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _before(kind, position):
+    """Renvoie le filtre des entrées du type donné situées après le curseur dans l'ordre décroissant (date, type, id)."""
+    at, cursor_kind, pk = position
+    if kind < cursor_kind:
+        return Q(at__lte=at)
+    if kind == cursor_kind:
+        return Q(at__lt=at) | Q(at=at, id__lt=pk)
+    return Q(at__lt=at)
+
+
+def _branch(queryset, kind, date_field, text_field, position):
+    rows = queryset.annotate(
+        kind=Value(kind, output_field=CharField()), at=F(date_field), body=F(text_field),
+    ).values_list('kind', 'id', 'at', 'body')
+    return rows.filter(_before(kind, position)) if position else rows
+
+
+def timeline(user, cursor=None, page_size=20, now=None):
+    """Renvoie la page (KeysetPage d'Entry) du fil de l'utilisateur qui suit le curseur.
+
+    Une entrée de plus que la taille de page est lue pour savoir s'il existe une page suivante. Sans utilisateur (rendez-vous sans patient), le fil est vide : aucune requête n'est faite, qui renverrait tous les rendez-vous et toutes les notes sans utilisateur.
+    """
+    if user is None:
+        return KeysetPage([], None)
+    position = decode_cursor(cursor)
+    appointments = _branch(Appointment.objects.filter(user=user).past(now).order_by(), APPOINTMENT, 'start', 'objet', position)
+    notes = _branch(Note.objects.filter(user=user), NOTE, 'created_date', 'text', position)
+    rows = appointments.union(notes, all=True).order_by('-at', '-kind', '-id')[:page_size + 1]
+    entries = [Entry(*row) for row in rows]
+    next_cursor = encode_cursor(entries[page_size - 1]) if len(entries) > page_size else None
+    return KeysetPage(entries[:page_size], next_cursor)
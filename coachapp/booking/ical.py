@@ -0,0 +1,80 @@
+"""Mise en forme des rendez-vous au format iCalendar (RFC 5545).
+
+Les fonctions renvoient des lignes déjà terminées par CRLF et repliées à 75 octets, de sorte qu'un calendrier peut être produit morceau par morceau (réponse en flux) ou assemblé d'un bloc (flux d'abonnement mis en cache).
+"""
+import datetime
+
+PRODID = '-//coachapp//booking//FR'
+UID = 'appointment-{}@coachapp'
+
+
+def escape(text):
+    """Protège les caractères spéciaux d'une valeur de texte iCalendar."""
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Replie une ligne de contenu en segments de 75 octets au plus, les suivants commençant par une espace."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # ne pas couper au milieu d'un caractère UTF-8
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    """Renvoie la date et l'heure en UTC au format iCalendar, par exemple 20230216T083000Z."""
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def appointment_uid(appointment_id):
+    """Renvoie l'identifiant iCalendar d'un rendez-vous, le même dans l'export de l'agenda et dans les flux d'abonnement."""
+    return UID.format(appointment_id)
+
+
+def header(name):
+    return ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:' + PRODID,
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:' + escape(name),
+    ))
+
+
+def footer():
+    return 'END:VCALENDAR\r\n'
+
+
+def event(uid, start, duration, summary, description='', stamp=None):
+    """Renvoie un événement VEVENT.
+
+    Args:
+        uid: identifiant stable de l'événement, qui permet aux agendas de reconnaître un rendez-vous modifié.
+        start, duration: début (datetime avec fuseau) et durée du rendez-vous.
+        summary, description: titre et description de l'événement.
+        stamp: date de production de l'événement (l'heure courante par défaut).
+    """
+    lines = [
+        'BEGIN:VEVENT',
+        'UID:' + uid,
+        'DTSTAMP:' + format_datetime(stamp or datetime.datetime.now(datetime.timezone.utc)),
+        'DTSTART:' + format_datetime(start),
+        'DTEND:' + format_datetime(start + duration),
+        'SUMMARY:' + escape(summary),
+    ]
+    if description:
+        lines.append('DESCRIPTION:' + escape(description))
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from booking.models import Appointment, Note
+from booking import transfer
+
+
+class Command(BaseCommand):
+    help = "Exporte les rendez-vous (ou les notes) au format CSV ou JSONL, en flux et à mémoire constante."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="Fichier de destination ('-' pour la sortie standard).")
+        parser.add_argument('--format', choices=transfer.FORMATS, help="Format du fichier. Par défaut, il est déduit de l'extension (csv sinon).")
+        parser.add_argument('--notes', action='store_true', help="Exporte les notes au lieu des rendez-vous.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Nombre de lignes lues à la fois dans la base.")
+
+    def handle(self, *args, **options):
+        model = Note if options['notes'] else Appointment
+        path = options['output']
+        fmt = options['format'] or transfer.guess_format(path)
+        if path == '-':
+            count = transfer.export_objects(model, self.stdout, fmt, options['chunk_size'])
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count = transfer.export_objects(model, stream, fmt, options['chunk_size'])
+        self.stderr.write('{} ligne(s) exportée(s).'.format(count))
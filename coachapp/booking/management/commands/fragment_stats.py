@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from booking import fragments
+
+
+class Command(BaseCommand):
+    help = "Affiche les compteurs de succès et d'échecs du cache des fragments de rendez-vous."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Remet les compteurs à zéro après les avoir affichés.")
+
+    def handle(self, *args, **options):
+        stats = fragments.get_stats()
+        self.stdout.write('hits: {hits}\nmisses: {misses}\nhit ratio: {hit_ratio:.1%}'.format(**stats))
+        if options['reset']:
+            fragments.reset_stats()
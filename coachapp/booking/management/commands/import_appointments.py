@@ -0,0 +1,30 @@
+import sys
+from django.core.management.base import BaseCommand
+from booking.models import Appointment, Note
+from booking import transfer
+
+
+class Command(BaseCommand):
+    help = ("Importe des rendez-vous (ou des notes) depuis un fichier CSV ou JSONL, par lots insérés avec bulk_create. "
+            "Les rendez-vous dont le créneau est déjà pris dans l'agenda du médecin sont écartés.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="Fichier à importer ('-' pour l'entrée standard).")
+        parser.add_argument('--format', choices=transfer.FORMATS, help="Format du fichier. Par défaut, il est déduit de l'extension (csv sinon).")
+        parser.add_argument('--notes', action='store_true', help="Importe des notes au lieu de rendez-vous.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Nombre de lignes insérées à la fois.")
+
+    def handle(self, *args, **options):
+        model = Note if options['notes'] else Appointment
+        path = options['input']
+        fmt = options['format'] or transfer.guess_format(path)
+
+        def on_skip(line_num, reason):
+            self.stderr.write('Ligne {} écartée : {}'.format(line_num, reason))
+
+        if path == '-':
+            report = transfer.import_objects(model, sys.stdin, fmt, options['batch_size'], on_skip)
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                report = transfer.import_objects(model, stream, fmt, options['batch_size'], on_skip)
+        self.stdout.write('{} ligne(s) importée(s), {} conflit(s), {} erreur(s).'.format(report.created, report.conflicts, report.errors))
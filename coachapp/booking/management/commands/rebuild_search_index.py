@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from booking import search
+
+
+class Command(BaseCommand):
+    help = ("Reconstruit l'index de la recherche plein texte (SQLite FTS5) à partir de toutes les notes et de tous les rendez-vous, "
+            "par exemple après des insertions qui n'envoient pas de signaux. Sans effet sous PostgreSQL, dont les index suivent les tables.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Nombre d'objets lus et indexés à la fois.")
+
+    def handle(self, *args, **options):
+        self.stdout.write('{} objet(s) indexé(s).'.format(search.rebuild(options['chunk_size'])))
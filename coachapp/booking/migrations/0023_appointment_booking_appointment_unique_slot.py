@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0022_remove_note_appointment_alter_note_text'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('date', 'heure'), name='booking_appointment_unique_slot'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.1.6 on 2026-10-18 10:05
+
+import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_start(apps, schema_editor):
+    """Convertit les anciens champs texte date ('AAAA-MM-JJ') et heure ('HH:MM - HH:MM') en début de créneau.
+
+    Les lignes dont le texte n'est pas interprétable (valeurs par défaut d'anciennes migrations) reprennent leur date d'enregistrement.
+    """
+    Appointment = apps.get_model('booking', 'Appointment')
+    for appointment in Appointment.objects.all().iterator():
+        try:
+            start = datetime.datetime.combine(
+                datetime.date.fromisoformat(appointment.date),
+                datetime.time.fromisoformat(appointment.heure[0:5]),
+            )
+            appointment.start = timezone.make_aware(start)
+        except ValueError:
+            appointment.start = appointment.time_ordered
+        appointment.save(update_fields=['start'])
+
+
+def fill_date_heure(apps, schema_editor):
+    Appointment = apps.get_model('booking', 'Appointment')
+    for appointment in Appointment.objects.all().iterator():
+        start = timezone.localtime(appointment.start)
+        appointment.date = start.date().isoformat()
+        appointment.heure = '{:%H:%M} - {:%H:%M}'.format(start, start + appointment.duration)
+        appointment.save(update_fields=['date', 'heure'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0024_alter_appointment_date_alter_appointment_heure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='duration',
+            field=models.DurationField(default=datetime.timedelta(seconds=1200)),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='start',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='date',
+            field=models.CharField(max_length=30, null=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='heure',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.RunPython(fill_start, fill_date_heure),
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='booking_appointment_unique_slot',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='date',
+        ),
+        migrations.RemoveField(
+            model_name='appointment',
+            name='heure',
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='start',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'start'], name='booking_appt_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start'], name='booking_appt_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('start',), name='booking_appointment_unique_slot'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.6 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_single_doctor(apps, schema_editor):
+    """Rattache les rendez-vous existants au médecin du site, lorsqu'il n'y en a qu'un."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Appointment = apps.get_model('booking', 'Appointment')
+    doctors = list(User.objects.filter(role='MEDECIN').values_list('pk', flat=True)[:2])
+    if len(doctors) == 1:
+        Appointment.objects.filter(doctor__isnull=True).update(doctor_id=doctors[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0025_appointment_start_duration'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='appointment',
+            name='booking_appointment_unique_slot',
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='doctor',
+            field=models.ForeignKey(blank=True, limit_choices_to={'role': 'MEDECIN'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='consultations', to=settings.AUTH_USER_MODEL, verbose_name='Praticien'),
+        ),
+        migrations.RunPython(assign_single_doctor, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'start'), name='booking_appointment_unique_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('doctor__isnull', True)), fields=('start',), name='booking_appointment_unique_unassigned_slot'),
+        ),
+    ]
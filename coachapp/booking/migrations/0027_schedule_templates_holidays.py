@@ -0,0 +1,55 @@
+# Generated by Django 4.1.6 on 2026-10-18 11:39
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0026_appointment_doctor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Lundi'), (1, 'Mardi'), (2, 'Mercredi'), (3, 'Jeudi'), (4, 'Vendredi'), (5, 'Samedi'), (6, 'Dimanche')], verbose_name='Jour')),
+                ('start_time', models.TimeField(verbose_name='Début')),
+                ('end_time', models.TimeField(verbose_name='Fin')),
+                ('slot_length', models.DurationField(default=datetime.timedelta(seconds=1200), verbose_name="Durée d'un créneau")),
+                ('slot_interval', models.DurationField(default=datetime.timedelta(seconds=1800), verbose_name='Écart entre deux créneaux')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(limit_choices_to={'role': 'MEDECIN'}, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to=settings.AUTH_USER_MODEL, verbose_name='Praticien')),
+            ],
+            options={
+                'ordering': ['doctor', 'weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleBreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField(verbose_name='Début')),
+                ('end_time', models.TimeField(verbose_name='Fin')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breaks', to='booking.scheduletemplate')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('label', models.CharField(blank=True, max_length=100)),
+                ('doctor', models.ForeignKey(blank=True, limit_choices_to={'role': 'MEDECIN'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to=settings.AUTH_USER_MODEL, verbose_name='Praticien')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='holiday',
+            index=models.Index(fields=['date'], name='booking_holiday_date_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:20
+
+from django.db import migrations
+
+# Index et contraintes propres à PostgreSQL, sans équivalent sous SQLite :
+# - booking_appt_doctor_agenda_idx : index couvrant (doctor_id, start) qui inclut duration et id, les seules colonnes lues par le calcul de l'index de disponibilité (booking/availability.py) : la requête est servie par un parcours d'index seul, sans lecture de la table ;
+# - booking_appointment_no_overlap : contrainte d'exclusion qui empêche deux rendez-vous du même médecin de se chevaucher, même s'ils ne commencent pas au même moment (créneaux de durées différentes, voir ScheduleTemplate). Comme la contrainte d'unicité, elle est vérifiée par la base lors des réservations simultanées, et sa violation lève une IntegrityError (booking/reservations.py). Les bornes sont calculées en UTC, pour que l'expression soit immuable. Elle demande l'extension btree_gist, qu'un propriétaire de base peut installer depuis PostgreSQL 13.
+FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    'CREATE INDEX IF NOT EXISTS booking_appt_doctor_agenda_idx ON booking_appointment (doctor_id, start) INCLUDE (duration, id)',
+    "ALTER TABLE booking_appointment ADD CONSTRAINT booking_appointment_no_overlap EXCLUDE USING gist ("
+    "doctor_id WITH =, tsrange(start AT TIME ZONE 'UTC', (start AT TIME ZONE 'UTC') + duration) WITH &&"
+    ") WHERE (doctor_id IS NOT NULL)",
+]
+
+BACKWARD = [
+    'ALTER TABLE booking_appointment DROP CONSTRAINT IF EXISTS booking_appointment_no_overlap',
+    'DROP INDEX IF EXISTS booking_appt_doctor_agenda_idx',
+]
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0027_schedule_templates_holidays'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(FORWARD), run_on_postgresql(BACKWARD)),
+    ]
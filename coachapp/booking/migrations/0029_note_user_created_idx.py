@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0028_postgresql_agenda_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'created_date'], name='booking_note_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.1.6 on 2026-10-18 16:05
+
+import re
+import unicodedata
+from django.db import migrations
+
+# Index de la recherche plein texte (booking/search.py).
+# SQLite : table virtuelle FTS5, remplie ici à partir des notes et des rendez-vous existants, puis tenue à jour par les signaux.
+# La racinisation est copiée ici telle qu'elle était à la création de la migration, et non importée de booking/search.py : une modification ultérieure de stem() ne change pas ce qu'écrit la migration. Après une telle modification, l'index est reconstruit par la commande rebuild_search_index.
+# PostgreSQL : configuration french_unaccent (racinisation française, accents retirés) et index GIN sur les vecteurs de texte des deux colonnes, qui suivent les lignes sans autre mise à jour.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE booking_search USING fts5(terms, tokenize = 'unicode61 remove_diacritics 2')",
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS booking_search',
+]
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    'CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french)',
+    'ALTER TEXT SEARCH CONFIGURATION french_unaccent ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem',
+    "CREATE INDEX booking_note_text_search_idx ON booking_note USING gin (to_tsvector('french_unaccent'::regconfig, COALESCE((text)::text, ''::text)))",
+    "CREATE INDEX booking_appt_objet_search_idx ON booking_appointment USING gin (to_tsvector('french_unaccent'::regconfig, COALESCE((objet)::text, ''::text)))",
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS booking_appt_objet_search_idx',
+    'DROP INDEX IF EXISTS booking_note_text_search_idx',
+    'DROP TEXT SEARCH CONFIGURATION IF EXISTS french_unaccent',
+]
+
+WORD = re.compile(r'\w+')
+SUFFIXES = (
+    'issements', 'issement', 'ements', 'ations', 'ateurs', 'atrices', 'ement', 'ation', 'ateur', 'atrice',
+    'ances', 'ences', 'ismes', 'istes', 'ables', 'ibles', 'euses', 'ance', 'ence', 'isme', 'iste', 'able',
+    'ible', 'euse', 'eux', 'ites', 'ite', 'ives', 'ive', 'ifs', 'if', 'ees', 'ee', 'es', 'er', 'ez', 'e', 's', 'x',
+)
+MIN_STEM = 3
+
+
+def stem(word):
+    decomposed = unicodedata.normalize('NFKD', word.lower())
+    word = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def index_terms(text):
+    return ' '.join(stem(word) for word in WORD.findall(text or ''))
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+        for model_name, field, kind in (('Note', 'text', 0), ('Appointment', 'objet', 1)):
+            rows = apps.get_model('booking', model_name).objects.exclude(**{field: None}).values_list('pk', field)
+            with schema_editor.connection.cursor() as cursor:
+                terms = ((pk * 2 + kind, index_terms(text)) for pk, text in rows.iterator())
+                cursor.executemany('INSERT INTO booking_search (rowid, terms) VALUES (%s, %s)', [
+                    (rowid, value) for rowid, value in terms if value])
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def backwards(apps, schema_editor):
+    statements = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0029_note_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,72 +1,132 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 import datetime
-from babel.dates import format_date
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-import pandas as pd
-import locale
+from .formatting import format_day, format_slot
 
 User = get_user_model()
-        
+
+SLOT_DURATION = datetime.timedelta(minutes=20)
+
+
+class AppointmentQuerySet(models.QuerySet):
+    """QuerySet des rendez-vous, qui permet de séparer en SQL les rendez-vous à venir des rendez-vous passés.
+
+    Méthodes:
+    - for_doctor: rendez-vous de l'agenda d'un médecin (index (doctor, start)).
+    - upcoming: rendez-vous dont le début n'est pas encore passé, du plus proche au plus lointain.
+    - past: rendez-vous déjà commencés, du plus récent au plus ancien.
+    - for_listing: projection utilisée par les pages qui affichent des rendez-vous. Le patient est chargé par jointure, ce qui évite une requête par ligne, et seules les colonnes affichées sont lues.
+    """
+    LISTING_FIELDS = (
+        'id', 'client', 'doctor', 'start', 'duration', 'objet', 'time_ordered',
+        'user__id', 'user__username', 'user__first_name', 'user__last_name',
+    )
+
+    def for_doctor(self, doctor):
+        return self.filter(doctor=doctor)
+
+    def upcoming(self, now=None):
+        return self.filter(start__gte=now or timezone.now()).order_by('start')
+
+    def past(self, now=None):
+        return self.filter(start__lt=now or timezone.now()).order_by('-start')
+
+    def for_listing(self):
+        return self.select_related('user').only(*self.LISTING_FIELDS)
+
 
 class Appointment(models.Model):
     """La classe Appointment représente un modèle de rendez-vous.
+    Le créneau est enregistré sous la forme d'un début (start, indexé) et d'une durée (duration). Chaque médecin (doctor) a son propre agenda : deux rendez-vous ne peuvent pas commencer au même moment chez le même médecin, mais peuvent avoir lieu en parallèle chez deux médecins différents. Les jours proposés à la réservation ne sont pas fixés dans le modèle : ils sont fournis au formulaire par booking/calendar_provider.py.
     La classe a également les méthodes suivantes :
 
-    clean: méthode qui vérifie que l'horaire du rendez-vous n'est pas déjà pris par un autre rendez-vous pour la même date et lève une exception ValidationError si c'est le cas
+    Meta.constraints: une contrainte d'unicité en base de données sur le couple (médecin, début du créneau), qui empêche toute double réservation même lorsque plusieurs requêtes sont traitées en parallèle. Les anciens rendez-vous sans médecin restent soumis à une contrainte sur le seul début du créneau.
+    slot_start: méthode de classe qui convertit un créneau ('AAAA-MM-JJ', 'HH:MM - HH:MM') en date et heure de début; slot_end en renvoie la fin.
+    date, heure: propriétés qui renvoient le jour ('AAAA-MM-JJ') et l'horaire ('HH:MM - HH:MM') du créneau. Les horaires proposés à la réservation sont produits à partir des modèles d'horaires (ScheduleTemplate) par booking/slots.py.
+    clean: méthode qui vérifie, grâce à l'index de disponibilité (booking/availability.py), que l'horaire du rendez-vous ne chevauche pas un autre rendez-vous du même médecin pour la même date et lève une exception ValidationError si c'est le cas ; booking/reservations.py refait la vérification en base lors de l'enregistrement
     is_past_due: une propriété booléenne qui renvoie True si le rendez-vous est passé, sinon False
-    get_date_display: méthode qui renvoie une chaîne de caractères qui représente la date de rendez-vous au format "jour_semaine jour_mois année" en utilisant la langue française.
+    get_date_display: méthode qui renvoie une chaîne de caractères qui représente la date de rendez-vous au format "jour_semaine jour_mois année" en utilisant la langue française, sans modifier le locale du processus (voir booking/formatting.py).
+    get_heure_display: méthode qui renvoie le libellé de l'horaire du rendez-vous, par exemple "9h30 - 9h50".
     """
     
-    TIME_CHOICES = (
-    ("09:00 - 09:20", "9h - 9h20"),
-    ("09:30 - 09:50", "9h30 - 9h50"),
-    ("10:00 - 10:20", "10h - 10h20"),
-    ("10:30 - 10:50", "10h30 - 10h50"),
-    ("11:00 - 11:20", "11h - 11h20"),
-    ("11:30 - 11:50", "11h30 - 11h50"),
-    ("12:00 - 12:20", "12h - 12h20"),
-    ("12:30 - 12:50", "12h30 - 12h50"),
-    ("13:30 - 13:50", "13h30 - 13h50"),
-    ("14:00 - 14:20", "14h - 14h20"),
-    ("14:30 - 14:50", "14h30 - 14h50"),
-    ("15:00 - 15:20", "15h - 15h20"),
-    ("15:30 - 15:50", "15h30 - 15h50"),
-    ("16:00 - 16:20", "16h - 16h20"),
-    ("16:30 - 16:50", "16h30 - 16h50"),
-)
-
-    today = pd.Timestamp.now().floor('D') + pd.Timedelta(days=1)  # commencer à partir du lendemain
-    DAY_CHOICES = []
-    for i in range(12):
-        day = today + pd.Timedelta(days=i)
-        if day.dayofweek < 5:  # 0 = Lundi, 4 = Vendredi
-            formatted_date = format_date(day.to_pydatetime(), format='full', locale='fr_FR')
-            DAY_CHOICES.append((day.strftime("%Y-%m-%d"), formatted_date))
-        
     client = models.CharField(max_length=20,null=True, blank=True)   
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    date = models.CharField(max_length=30, choices=DAY_CHOICES, default=DAY_CHOICES[0][0])
-    heure = models.CharField(max_length=50, choices=TIME_CHOICES, default=TIME_CHOICES[0][0])
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='consultations',
+                               limit_choices_to={'role': 'MEDECIN'}, verbose_name='Praticien')
+    start = models.DateTimeField()
+    duration = models.DurationField(default=SLOT_DURATION)
     objet = models.CharField(max_length=255,null=True, blank=True)
     time_ordered = models.DateTimeField(default=timezone.now, blank=True)
+
+    objects = AppointmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start'], name='booking_appt_user_start_idx'),
+            models.Index(fields=['start'], name='booking_appt_start_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'start'], name='booking_appointment_unique_slot'),
+            models.UniqueConstraint(fields=['start'], condition=models.Q(doctor__isnull=True),
+                                    name='booking_appointment_unique_unassigned_slot'),
+        ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'start' in instance.__dict__:
+            instance._loaded_slot = (instance.__dict__.get('doctor_id'),) + instance.slot
+        return instance
+
+    @classmethod
+    def slot_start(cls, day, heure):
+        start = datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time.fromisoformat(heure[0:5]))
+        return timezone.make_aware(start)
+
+    @classmethod
+    def slot_end(cls, day, heure):
+        end = datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time.fromisoformat(heure[8:13]))
+        return timezone.make_aware(end)
+
+    @property
+    def date(self):
+        return timezone.localtime(self.start).date().isoformat()
+
+    @property
+    def heure(self):
+        start = timezone.localtime(self.start)
+        return '{:%H:%M} - {:%H:%M}'.format(start, start + self.duration)
+
+    @property
+    def slot(self):
+        return (self.date, self.heure)
+
+    @property
+    def loaded_slot(self):
+        """Créneau (médecin, date, heure) tel qu'enregistré en base, ou None pour un rendez-vous qui n'a pas encore été enregistré."""
+        return getattr(self, '_loaded_slot', None)
+
     def clean(self):
-        appointments = Appointment.objects.filter(date=self.date, heure=self.heure)
-        if appointments.exists():
+        from .availability import is_free
+        if not is_free(self.doctor_id, self.date, self.heure, ignore=self.loaded_slot):
             raise ValidationError("Cet horaire est déjà pris.")
+
+    def validate_constraints(self, exclude=None):
+        # L'unicité du créneau est vérifiée par clean() grâce à l'index, puis garantie par la base de données lors de l'enregistrement (voir booking/reservations.py) : inutile de la tester une seconde fois par une requête.
+        exclude = set(exclude or ()) | {'doctor', 'start'}
+        super().validate_constraints(exclude=exclude)
         
     @property
     def is_past_due(self):
-        date_rdv=self.date.split("-")
-        heure_rdv=self.heure[0:2]
-        date_rdv=datetime.datetime(int(date_rdv[0]),int(date_rdv[1]),(int(date_rdv[2])),(int(heure_rdv)))
-        return datetime.datetime.today() > date_rdv
+        return timezone.now() > self.start
     
     def get_date_display(self):
-        locale.setlocale(locale.LC_TIME, 'fr_FR.utf8')
-        return datetime.datetime.strptime(self.date, '%Y-%m-%d').strftime('%A %d %B %Y')
+        return format_day(timezone.localtime(self.start).date())
+
+    def get_heure_display(self):
+        return format_slot(self.heure)
     
 
 
@@ -78,6 +138,8 @@ class Note(models.Model):
     - text: texte de la note. Chaîne de caractères pouvant contenir jusqu'à 255 caractères. 
     - created_date: date de création de la note. Date et heure stockées sous forme d'un objet DateTime. Par défaut, la date et l'heure actuelles sont enregistrées.
 
+    Meta.indexes: un index (user, created_date), parcouru par l'historique d'un patient (booking/history.py) pour lire ses notes de la plus récente à la plus ancienne.
+
     Méthodes:
     - __str__ : Retourne une représentation sous forme de chaîne de caractères de la note, correspondant à son texte.
     """
@@ -85,5 +147,105 @@ class Note(models.Model):
     text = models.CharField(max_length=255,null=True, blank=True)
     created_date = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_date'], name='booking_note_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class ScheduleTemplate(models.Model):
+    """Modèle représentant une plage de travail hebdomadaire d'un médecin, découpée en créneaux par booking/slots.py.
+
+    Attributs:
+    - doctor: ForeignKey vers le médecin concerné.
+    - weekday: jour de la semaine (0 = lundi, 6 = dimanche).
+    - start_time, end_time: heures de début et de fin de la plage. Un créneau doit se terminer au plus tard à end_time. Deux plages d'un même médecin et d'un même jour ne peuvent pas se chevaucher (clean).
+    - slot_length: durée d'un créneau.
+    - slot_interval: écart entre les débuts de deux créneaux consécutifs (égal à slot_length pour des créneaux contigus).
+    - updated_at: date de dernière modification.
+
+    Les pauses de la plage sont représentées par le modèle ScheduleBreak. Un médecin sans aucune plage suit l'horaire par défaut du site (slots.DEFAULT_SCHEDULE).
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Lundi'),
+        (1, 'Mardi'),
+        (2, 'Mercredi'),
+        (3, 'Jeudi'),
+        (4, 'Vendredi'),
+        (5, 'Samedi'),
+        (6, 'Dimanche'),
+    )
+
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_templates',
+                               limit_choices_to={'role': 'MEDECIN'}, verbose_name='Praticien')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, verbose_name='Jour')
+    start_time = models.TimeField(verbose_name='Début')
+    end_time = models.TimeField(verbose_name='Fin')
+    slot_length = models.DurationField(default=SLOT_DURATION, verbose_name='Durée d\'un créneau')
+    slot_interval = models.DurationField(default=datetime.timedelta(minutes=30), verbose_name='Écart entre deux créneaux')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+
+    def __str__(self):
+        return '{} : {} de {:%H:%M} à {:%H:%M}'.format(self.doctor, self.get_weekday_display(), self.start_time, self.end_time)
+
+    def clean(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("L'heure de fin doit être postérieure à l'heure de début.")
+        if self.slot_length is not None and self.slot_length <= datetime.timedelta(0):
+            raise ValidationError("La durée d'un créneau doit être positive.")
+        if self.slot_interval is not None and self.slot_length is not None and self.slot_interval < self.slot_length:
+            raise ValidationError("L'écart entre deux créneaux ne peut pas être inférieur à leur durée.")
+        if self.doctor_id and self.weekday is not None and self.start_time and self.end_time:
+            overlapping = ScheduleTemplate.objects.filter(
+                doctor_id=self.doctor_id, weekday=self.weekday, start_time__lt=self.end_time, end_time__gt=self.start_time,
+            ).exclude(pk=self.pk).first()
+            if overlapping:
+                raise ValidationError("Cette plage chevauche la plage {:%H:%M} - {:%H:%M} du même jour.".format(
+                    overlapping.start_time, overlapping.end_time))
+
+
+class ScheduleBreak(models.Model):
+    """Modèle représentant une pause dans une plage de travail : aucun créneau ne peut la chevaucher.
+
+    Attributs:
+    - template: ForeignKey vers la plage de travail concernée.
+    - start_time, end_time: heures de début et de fin de la pause.
+    """
+    template = models.ForeignKey(ScheduleTemplate, on_delete=models.CASCADE, related_name='breaks')
+    start_time = models.TimeField(verbose_name='Début')
+    end_time = models.TimeField(verbose_name='Fin')
+
+    def __str__(self):
+        return 'Pause de {:%H:%M} à {:%H:%M}'.format(self.start_time, self.end_time)
+
+    def clean(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("L'heure de fin doit être postérieure à l'heure de début.")
+
+
+class Holiday(models.Model):
+    """Modèle représentant un jour sans consultation.
+
+    Attributs:
+    - doctor: ForeignKey vers le médecin absent. Si elle est vide, le jour est fermé pour tous les médecins (jour férié).
+    - date: le jour concerné.
+    - label: libellé facultatif (par exemple "Congés" ou "1er mai").
+    """
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='holidays',
+                               limit_choices_to={'role': 'MEDECIN'}, verbose_name='Praticien')
+    date = models.DateField()
+    label = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='booking_holiday_date_idx'),
+        ]
+
     def __str__(self):
-        return self.text
\ No newline at end of file
+        return '{} {}'.format(self.date, self.label).strip()
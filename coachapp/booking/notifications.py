@@ -0,0 +1,57 @@
+"""Courriels de confirmation et de rappel des rendez-vous, envoyés en tâche de fond (application tasks).
+
+À l'enregistrement d'un rendez-vous nouveau ou déplacé, schedule met en file, en une seule requête, la confirmation (immédiate) et le rappel (BOOKING_REMINDER_DELAY avant le rendez-vous, s'il reste assez de temps). Aucune connexion au serveur de courriel n'est ouverte pendant la requête HTTP.
+
+Les deux tâches sont déclarées par lots : les rendez-vous d'un lot sont relus en une requête, et leurs courriels partent par une seule connexion. Les tâches ne transportent que l'identifiant du rendez-vous et, pour le rappel, le début prévu : un rappel dont le rendez-vous a été supprimé ou déplacé depuis (un nouveau rappel a alors été programmé) n'est pas envoyé.
+"""
+import datetime
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+from tasks.registry import enqueue_many, task
+from .models import Appointment
+
+
+def _messages(kind, appointments):
+    return [
+        EmailMessage(
+            render_to_string('booking/emails/{}_subject.txt'.format(kind), {'appointment': appointment}).strip(),
+            render_to_string('booking/emails/{}.txt'.format(kind), {'appointment': appointment}),
+            to=[appointment.user.email],
+        )
+        for appointment in appointments if appointment.user and appointment.user.email
+    ]
+
+
+def _load(payloads):
+    return Appointment.objects.select_related('user', 'doctor').in_bulk([payload['appointment'] for payload in payloads])
+
+
+@task(name='booking.send_confirmations', batch=True)
+def send_confirmations(payloads):
+    appointments = _load(payloads)
+    get_connection().send_messages(_messages('confirmation', [
+        appointments[payload['appointment']] for payload in payloads if payload['appointment'] in appointments]))
+
+
+@task(name='booking.send_reminders', batch=True)
+def send_reminders(payloads):
+    appointments = _load(payloads)
+    now = timezone.now()
+    due = [
+        appointments[payload['appointment']] for payload in payloads
+        if payload['appointment'] in appointments
+        and appointments[payload['appointment']].start == datetime.datetime.fromisoformat(payload['start'])
+        and appointments[payload['appointment']].start > now
+    ]
+    get_connection().send_messages(_messages('reminder', due))
+
+
+def schedule(appointment):
+    """Met en file la confirmation et le rappel du rendez-vous, en une seule requête."""
+    calls = [(send_confirmations, {'appointment': appointment.pk}, None)]
+    remind_at = appointment.start - settings.BOOKING_REMINDER_DELAY
+    if remind_at > timezone.now():
+        calls.append((send_reminders, {'appointment': appointment.pk, 'start': appointment.start.isoformat()}, remind_at))
+    enqueue_many(calls)
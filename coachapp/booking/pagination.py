@@ -0,0 +1,87 @@
+"""Pagination par curseur (keyset) des listes de rendez-vous.
+
+Plutôt que de sauter N lignes avec OFFSET, chaque page reprend juste après le dernier rendez-vous affiché, identifié par son couple (start, id). La requête parcourt ainsi l'index de la colonne start à partir du curseur et le coût d'une page ne dépend pas du nombre de rendez-vous enregistrés.
+"""
+import datetime
+from django.conf import settings
+from django.db.models import Q
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class KeysetPage:
+    """Une page de résultats.
+
+    Attributs:
+    - items: la liste des objets de la page.
+    - next_cursor: le curseur de la page suivante, ou None s'il s'agit de la dernière page.
+    """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(obj):
+    return '{}_{}'.format((obj.start - EPOCH) // datetime.timedelta(microseconds=1), obj.pk)
+
+
+def decode_cursor(cursor):
+    """Renvoie le couple (start, id) codé dans le curseur, ou None si le curseur est absent ou invalide."""
+    try:
+        microseconds, pk = cursor.split('_')
+        return EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_page_size(request, param='size'):
+    """Lit la taille de page demandée dans la requête, bornée par BOOKING_MAX_PAGE_SIZE."""
+    try:
+        page_size = int(request.GET.get(param, settings.BOOKING_PAGE_SIZE))
+    except ValueError:
+        page_size = settings.BOOKING_PAGE_SIZE
+    return max(1, min(page_size, settings.BOOKING_MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor, page_size, descending=False):
+    """Renvoie la page de queryset qui suit le curseur, triée par (start, id), croissant ou décroissant.
+
+    Une ligne de plus que la taille de page est lue pour savoir s'il existe une page suivante.
+    """
+    return _make_page(list(_page_queryset(queryset, cursor, page_size, descending)), page_size)
+
+
+async def akeyset_page(queryset, cursor, page_size, descending=False):
+    """Variante asynchrone de keyset_page, qui lit la page avec l'itération asynchrone de l'ORM."""
+    return _make_page([item async for item in _page_queryset(queryset, cursor, page_size, descending)], page_size)
+
+
+def _page_queryset(queryset, cursor, page_size, descending):
+    position = decode_cursor(cursor)
+    if position:
+        start, pk = position
+        if descending:
+            queryset = queryset.filter(Q(start__lte=start) & ~Q(start=start, id__gte=pk))
+        else:
+            queryset = queryset.filter(Q(start__gte=start) & ~Q(start=start, id__lte=pk))
+    ordering = ('-start', '-id') if descending else ('start', 'id')
+    return queryset.order_by(*ordering)[:page_size + 1]
+
+
+def _make_page(items, page_size):
+    next_cursor = encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+    return KeysetPage(items[:page_size], next_cursor)
+
+
+def page_query(request, param, cursor):
+    """Renvoie la chaîne de requête de la page courante dans laquelle le curseur param est remplacé."""
+    query = request.GET.copy()
+    query[param] = cursor
+    return query.urlencode()
@@ -0,0 +1,80 @@
+"""Réservation atomique des créneaux de rendez-vous.
+
+La vérification faite par Appointment.clean() repose sur l'index de disponibilité et ne protège pas contre deux requêtes simultanées qui visent le même créneau. reserve() vérifie donc à nouveau, dans la même transaction que l'enregistrement, qu'aucun rendez-vous du médecin ne chevauche l'intervalle [début, fin) du créneau : des plages de durées différentes, ou qui se recouvrent, peuvent proposer des créneaux qui se chevauchent sans commencer à la même heure. La contrainte d'unicité (médecin, début), et sous PostgreSQL la contrainte d'exclusion sur les intervalles (migration 0028), tranchent entre deux requêtes simultanées : leur violation est convertie, comme un chevauchement, en SlotUnavailable, qui indique le prochain créneau libre.
+"""
+import datetime
+from django.db import IntegrityError, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F
+from .models import Appointment
+from .formatting import format_slot
+from . import availability
+from .calendar_provider import get_day_choices
+
+# Durée maximale d'un rendez-vous : borne inférieure du parcours de l'index par overlapping().
+MAX_DURATION = datetime.timedelta(days=1)
+
+
+class SlotUnavailable(Exception):
+    """Exception levée lorsque le créneau demandé a été réservé entre-temps par une autre requête.
+
+    Attributs:
+    - next_slot: le prochain créneau libre (date, heure) après le créneau demandé, ou None s'il n'en reste aucun.
+    """
+
+    def __init__(self, next_slot):
+        self.next_slot = next_slot
+        message = "Cet horaire est déjà pris."
+        if next_slot:
+            day, heure = next_slot
+            message += " Prochain créneau libre : {} à {}.".format(
+                dict(get_day_choices()).get(day, day), format_slot(heure))
+        super().__init__(message)
+
+
+def next_free_slot(doctor_id, day, heure):
+    """Renvoie le premier créneau (date, heure) libre situé après le créneau donné dans l'agenda du médecin, ou None.
+
+    L'index du jour demandé est d'abord recalculé : s'il a laissé passer le créneau, c'est qu'il n'était plus à jour.
+    """
+    days = [value for value, label in get_day_choices() if value >= day]
+    availability.refresh(doctor_id, day)
+    free = availability.free_slots_by_day(doctor_id, days)
+    for free_day in days:
+        for value, label in free[free_day]:
+            if free_day > day or value > heure:
+                return free_day, value
+    return None
+
+
+def overlapping(appointment):
+    """Renvoie les rendez-vous de l'agenda du médecin qui chevauchent le créneau du rendez-vous (lui-même exclu).
+
+    La requête parcourt l'index (doctor, start) entre le début du créneau moins MAX_DURATION et sa fin.
+    """
+    end = appointment.start + appointment.duration
+    queryset = Appointment.objects.filter(
+        doctor_id=appointment.doctor_id, start__lt=end, start__gt=appointment.start - MAX_DURATION,
+    ).annotate(
+        end=ExpressionWrapper(F('start') + F('duration'), output_field=DateTimeField()),
+    ).filter(end__gt=appointment.start)
+    return queryset.exclude(pk=appointment.pk) if appointment.pk else queryset
+
+
+def reserve(appointment):
+    """Enregistre le rendez-vous (création ou modification), dans une transaction qui vérifie d'abord qu'aucun rendez-vous ne chevauche son créneau.
+
+    La vérification est une seule requête sur l'index (doctor, start) ; aucune table n'est verrouillée explicitement. Sous SQLite, le profil de production (transactions IMMEDIATE, voir coachapp/backends/sqlite3/base.py) sérialise la vérification et l'enregistrement de deux requêtes simultanées ; sous PostgreSQL, la contrainte d'exclusion rejette le second enregistrement. Dans tous les cas, la contrainte booking_appointment_unique_slot rejette un début déjà pris dans l'agenda du médecin, et seul le point de sauvegarde ouvert ici est annulé.
+
+    Raises:
+        SlotUnavailable: si le créneau chevauche un rendez-vous existant.
+    """
+    try:
+        with transaction.atomic():
+            conflict = overlapping(appointment).exists()
+            if not conflict:
+                appointment.save()
+    except IntegrityError:
+        conflict = True
+    if conflict:
+        raise SlotUnavailable(next_free_slot(appointment.doctor_id, appointment.date, appointment.heure))
+    return appointment
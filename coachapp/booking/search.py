@@ -0,0 +1,165 @@
+"""Recherche plein texte dans les notes (Note.text) et les objets des rendez-vous (Appointment.objet).
+
+Sous SQLite, le texte est indexé dans la table virtuelle FTS5 booking_search (migration 0030), tenue à jour par les signaux (booking/signals.py) et par l'import de rendez-vous (booking/transfer.py) ; la commande rebuild_search_index la reconstruit entièrement. Chaque ligne de la table a pour rowid l'identifiant de l'objet indexé, multiplié par 2 et augmenté de son type (0 pour une note, 1 pour un rendez-vous) : la mise à jour d'un objet est une seule instruction INSERT OR REPLACE par rowid, sans parcours de la table.
+
+Le texte indexé et les mots recherchés passent par la même racinisation légère du français (stem) : minuscules, accents retirés, et suffixes courants de flexion et de dérivation supprimés, de sorte que « fatiguée », « fatigues » et « fatigue » aient la même racine. Chaque mot recherché est ensuite cherché comme préfixe de racine. Le tokenizer unicode61 de FTS5 (remove_diacritics 2) replie aussi les accents qui resteraient. Les résultats sont classés par pertinence (bm25), la recherche n'exigeant que le nombre de résultats demandés.
+
+Sous PostgreSQL, la recherche utilise les vecteurs de texte de la configuration french_unaccent (racinisation française du moteur et accents retirés par l'extension unaccent, voir la migration 0030), servis par des index GIN sur les deux colonnes ; aucun index n'est à tenir à jour.
+"""
+import re
+import unicodedata
+from django.db import connection
+from django.db.models import F
+from .models import Appointment, Note
+
+TABLE = 'booking_search'
+NOTE = 0
+APPOINTMENT = 1
+KINDS = {Note: NOTE, Appointment: APPOINTMENT}
+TEXT_FIELDS = {Note: 'text', Appointment: 'objet'}
+POSTGRESQL_CONFIG = 'french_unaccent'
+
+WORD = re.compile(r'\w+')
+# Suffixes retirés, du plus long au plus court ; une racine garde au moins MIN_STEM lettres.
+# Après toute modification de la racinisation, l'index SQLite doit être reconstruit (commande rebuild_search_index) : la migration 0030 garde sa propre copie, figée, de ces règles.
+SUFFIXES = (
+    'issements', 'issement', 'ements', 'ations', 'ateurs', 'atrices', 'ement', 'ation', 'ateur', 'atrice',
+    'ances', 'ences', 'ismes', 'istes', 'ables', 'ibles', 'euses', 'ance', 'ence', 'isme', 'iste', 'able',
+    'ible', 'euse', 'eux', 'ites', 'ite', 'ives', 'ive', 'ifs', 'if', 'ees', 'ee', 'es', 'er', 'ez', 'e', 's', 'x',
+)
+MIN_STEM = 3
+
+
+def fold(text):
+    """Renvoie le texte en minuscules et sans accents."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(word):
+    """Renvoie la racine d'un mot (en minuscules, sans accents), par exemple "fatigu" pour "Fatiguée"."""
+    word = fold(word)
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def index_terms(text):
+    """Renvoie le texte à indexer : les racines des mots du texte, séparées par des espaces."""
+    return ' '.join(stem(word) for word in WORD.findall(text or ''))
+
+
+def match_expression(query):
+    """Renvoie l'expression MATCH de FTS5 qui exige chacun des mots de la recherche, comme préfixe de racine, ou None si la recherche ne contient aucun mot."""
+    stems = [stem(word) for word in WORD.findall(query)]
+    return ' '.join('"{}"*'.format(value) for value in stems) or None
+
+
+def is_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * 2 + kind
+
+
+def index(*objects):
+    """Indexe (ou réindexe) les notes et les rendez-vous donnés."""
+    if not is_fts() or not objects:
+        return
+    rows = [(_rowid(KINDS[type(obj)], obj.pk), index_terms(getattr(obj, TEXT_FIELDS[type(obj)]))) for obj in objects]
+    indexed = [row for row in rows if row[1]]
+    emptied = [(rowid,) for rowid, terms in rows if not terms]
+    with connection.cursor() as cursor:
+        if indexed:
+            cursor.executemany('INSERT OR REPLACE INTO {} (rowid, terms) VALUES (%s, %s)'.format(TABLE), indexed)
+        if emptied:
+            cursor.executemany('DELETE FROM {} WHERE rowid = %s'.format(TABLE), emptied)
+
+
+def remove(obj):
+    if is_fts():
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE), [_rowid(KINDS[type(obj)], obj.pk)])
+
+
+def rebuild(chunk_size=2000):
+    """Vide puis remplit l'index avec toutes les notes et tous les rendez-vous, et renvoie le nombre d'objets indexés."""
+    if not is_fts():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(TABLE))
+    count = 0
+    for model, field in TEXT_FIELDS.items():
+        batch = []
+        for obj in model.objects.exclude(**{field: None}).only(field).iterator(chunk_size=chunk_size):
+            batch.append(obj)
+            if len(batch) == chunk_size:
+                index(*batch)
+                count += len(batch)
+                batch = []
+        index(*batch)
+        count += len(batch)
+    return count
+
+
+class Result:
+    """Un résultat de recherche : la note ou le rendez-vous trouvé (obj), son type (kind : 'note' ou 'appointment') et son patient (user)."""
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.kind = 'note' if isinstance(obj, Note) else 'appointment'
+        self.user = obj.user
+
+    @property
+    def text(self):
+        return getattr(self.obj, TEXT_FIELDS[type(self.obj)])
+
+    @property
+    def date(self):
+        return self.obj.created_date if isinstance(self.obj, Note) else self.obj.start
+
+
+def search(query, limit=50):
+    """Renvoie les résultats (liste de Result) de la recherche, du plus pertinent au moins pertinent."""
+    if is_fts():
+        ranked = _search_fts(query, limit)
+    elif connection.vendor == 'postgresql':
+        ranked = _search_postgresql(query, limit)
+    else:
+        ranked = []
+    ids = {NOTE: [pk for kind, pk in ranked if kind == NOTE], APPOINTMENT: [pk for kind, pk in ranked if kind == APPOINTMENT]}
+    objects = {
+        (NOTE, note.pk): note for note in Note.objects.filter(pk__in=ids[NOTE]).select_related('user')
+    } if ids[NOTE] else {}
+    if ids[APPOINTMENT]:
+        objects.update({
+            (APPOINTMENT, appointment.pk): appointment
+            for appointment in Appointment.objects.for_listing().filter(pk__in=ids[APPOINTMENT])
+        })
+    return [Result(objects[key]) for key in ranked if key in objects]
+
+
+def _search_fts(query, limit):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT rowid FROM {0} WHERE {0} MATCH %s ORDER BY rank LIMIT %s'.format(TABLE), [expression, limit])
+        return [(rowid % 2, rowid // 2) for rowid, in cursor.fetchall()]
+
+
+def _search_postgresql(query, limit):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    search_query = SearchQuery(query, config=POSTGRESQL_CONFIG)
+    ranked = []
+    for kind, model in ((NOTE, Note), (APPOINTMENT, Appointment)):
+        rows = model.objects.annotate(
+            vector=SearchVector(TEXT_FIELDS[model], config=POSTGRESQL_CONFIG),
+        ).filter(vector=search_query).annotate(
+            rank=SearchRank(F('vector'), search_query),
+        ).order_by('-rank').values_list('pk', 'rank')[:limit]
+        ranked += [(rank, kind, pk) for pk, rank in rows]
+    return [(kind, pk) for rank, kind, pk in sorted(ranked, reverse=True)[:limit]]
@@ -0,0 +1,90 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Appointment, Note, ScheduleTemplate, ScheduleBreak, Holiday
+from . import availability, fragments, notifications, search, slots
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_fragments(sender, instance, **kwargs):
+    """Invalide les fragments HTML mis en cache pour le patient et pour le tableau de bord du médecin concernés.
+
+    Ce récepteur est connecté avant refresh_availability_on_save, qui remplace loaded_slot par le nouveau créneau.
+    """
+    scopes = [fragments.user_scope(instance.user_id), fragments.manage_scope(instance.doctor_id)]
+    if instance.loaded_slot and instance.loaded_slot[0] != instance.doctor_id:
+        scopes.append(fragments.manage_scope(instance.loaded_slot[0]))
+    fragments.bump_version(*scopes)
+
+
+@receiver(post_save, sender=Appointment)
+def schedule_notifications(sender, instance, created, **kwargs):
+    """Met en file les courriels de confirmation et de rappel d'un rendez-vous nouveau ou déplacé (booking/notifications.py).
+
+    Ce récepteur est connecté avant refresh_availability_on_save, qui remplace loaded_slot par le nouveau créneau.
+    """
+    if created or not instance.loaded_slot or instance.loaded_slot[1:] != instance.slot:
+        notifications.schedule(instance)
+
+
+@receiver(post_save, sender=Appointment)
+def refresh_availability_on_save(sender, instance, **kwargs):
+    """Met à jour l'index de disponibilité pour le nouveau créneau du rendez-vous et, en cas de modification, pour l'ancien."""
+    availability.refresh(instance.doctor_id, instance.date)
+    if instance.loaded_slot:
+        doctor_id, day, heure = instance.loaded_slot
+        availability.refresh(doctor_id, day)
+    instance._loaded_slot = (instance.doctor_id,) + instance.slot
+
+
+@receiver(post_delete, sender=Appointment)
+def refresh_availability_on_delete(sender, instance, **kwargs):
+    """Libère le créneau du rendez-vous supprimé dans l'index de disponibilité."""
+    availability.refresh(instance.doctor_id, instance.date)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_note_fragments(sender, instance, **kwargs):
+    """Invalide les fragments HTML mis en cache pour le patient concerné par la note."""
+    fragments.bump_version(fragments.user_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=Note)
+def index_search_text(sender, instance, **kwargs):
+    """Met à jour l'index de recherche plein texte (booking/search.py) pour la note ou l'objet du rendez-vous enregistré."""
+    search.index(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=Note)
+def remove_search_text(sender, instance, **kwargs):
+    """Retire la note ou le rendez-vous supprimé de l'index de recherche plein texte."""
+    search.remove(instance)
+
+
+@receiver(post_save, sender=ScheduleTemplate)
+@receiver(post_delete, sender=ScheduleTemplate)
+def invalidate_schedule_slots(sender, instance, **kwargs):
+    """Invalide les grilles de créneaux du médecin dont les horaires de travail ont changé."""
+    slots.bump_version(slots.doctor_scope(instance.doctor_id))
+
+
+@receiver(post_save, sender=ScheduleBreak)
+@receiver(post_delete, sender=ScheduleBreak)
+def invalidate_break_slots(sender, instance, **kwargs):
+    """Invalide les grilles de créneaux du médecin dont une pause a changé."""
+    doctor_id = ScheduleTemplate.objects.filter(pk=instance.template_id).values_list('doctor_id', flat=True).first()
+    if doctor_id is not None:
+        slots.bump_version(slots.doctor_scope(doctor_id))
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def invalidate_holiday_slots(sender, instance, **kwargs):
+    """Invalide les grilles de créneaux du médecin absent, ou de tous les médecins pour un jour férié."""
+    if instance.doctor_id is None:
+        slots.bump_version(slots.HOLIDAYS)
+    else:
+        slots.bump_version(slots.doctor_scope(instance.doctor_id))
@@ -0,0 +1,128 @@
+"""Génération des créneaux proposés à la réservation à partir des horaires de travail.
+
+Chaque médecin définit ses plages de travail hebdomadaires (ScheduleTemplate) et leurs pauses (ScheduleBreak) ; les jours fermés sont enregistrés dans Holiday, pour un médecin ou pour tous. Un médecin sans aucune plage suit l'horaire par défaut (DEFAULT_SCHEDULE), qui reproduit l'ancienne grille fixe : du lundi au vendredi, un créneau de 20 minutes toutes les 30 minutes de 9h à 17h, sauf de 13h à 13h30.
+
+Les créneaux d'une semaine (du lundi au dimanche) sont calculés une fois, puis conservés dans le cache Django sous une clé qui contient le numéro de version des horaires du médecin et celui des jours fériés. Les signaux des trois modèles incrémentent ces numéros (voir booking/signals.py) : les grilles périmées ne sont plus jamais lues et expirent d'elles-mêmes.
+"""
+import datetime
+import time
+from django.core.cache import cache
+from django.db.models import Q
+from .formatting import format_slot
+from .models import ScheduleTemplate, Holiday
+
+CACHE_KEY = 'booking:slots:{}:{}:{}'
+VERSION_KEY = 'booking:slots:version:{}'
+CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+HOLIDAYS = 'holidays'
+
+# (jour de la semaine, début, fin, durée d'un créneau, écart entre deux créneaux, pauses)
+DEFAULT_SCHEDULE = [
+    (weekday, datetime.time(9), datetime.time(17), datetime.timedelta(minutes=20), datetime.timedelta(minutes=30),
+     [(datetime.time(13), datetime.time(13, 30))])
+    for weekday in range(5)
+]
+
+
+def doctor_scope(doctor_id):
+    return 'doctor:{}'.format(doctor_id)
+
+
+def get_version(scope):
+    """Renvoie le numéro de version courant des horaires de la portée (un médecin, ou les jours fériés)."""
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Invalide toutes les grilles de créneaux calculées pour les portées données."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def _to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _slot_value(start, end):
+    return '{:02d}:{:02d} - {:02d}:{:02d}'.format(start // 60, start % 60, end // 60, end % 60)
+
+
+def _day_slots(periods):
+    """Découpe les plages d'un jour en créneaux (valeur 'HH:MM - HH:MM', libellé), triés par heure de début."""
+    values = set()
+    for start, end, length, interval, breaks in periods:
+        length, interval = length // datetime.timedelta(minutes=1), interval // datetime.timedelta(minutes=1)
+        if length <= 0 or interval <= 0:
+            continue
+        breaks = [(_to_minutes(break_start), _to_minutes(break_end)) for break_start, break_end in breaks]
+        slot, end = _to_minutes(start), _to_minutes(end)
+        while slot + length <= end:
+            if not any(slot < break_end and break_start < slot + length for break_start, break_end in breaks):
+                values.add(_slot_value(slot, slot + length))
+            slot += interval
+    return [(value, format_slot(value)) for value in sorted(values)]
+
+
+def _compute_weeks(doctor_id, mondays):
+    """Calcule les créneaux des semaines données, avec une requête pour les plages, une pour leurs pauses et une pour les jours fermés."""
+    schedule = {}
+    if doctor_id is not None:
+        for template in ScheduleTemplate.objects.filter(doctor_id=doctor_id).prefetch_related('breaks'):
+            schedule.setdefault(template.weekday, []).append((
+                template.start_time, template.end_time, template.slot_length, template.slot_interval,
+                [(pause.start_time, pause.end_time) for pause in template.breaks.all()],
+            ))
+    if not schedule:
+        for weekday, start, end, length, interval, breaks in DEFAULT_SCHEDULE:
+            schedule.setdefault(weekday, []).append((start, end, length, interval, breaks))
+    first, last = min(mondays), max(mondays) + datetime.timedelta(days=6)
+    closed = set(Holiday.objects.filter(
+        Q(doctor__isnull=True) | Q(doctor_id=doctor_id), date__range=(first, last),
+    ).values_list('date', flat=True))
+    by_weekday = {weekday: _day_slots(periods) for weekday, periods in schedule.items()}
+    weeks = {}
+    for monday in mondays:
+        weeks[monday] = {}
+        for offset in range(7):
+            day = monday + datetime.timedelta(days=offset)
+            weeks[monday][day.isoformat()] = [] if day in closed else by_weekday.get(day.weekday(), [])
+    return weeks
+
+
+def get_slots(doctor_id, days):
+    """Renvoie un dictionnaire {jour: liste des créneaux (valeur 'HH:MM - HH:MM', libellé)} pour les jours donnés ('AAAA-MM-JJ') dans l'agenda du médecin.
+
+    Les semaines absentes du cache sont calculées ensemble. doctor_id vaut None pour l'agenda des rendez-vous sans médecin, qui suit l'horaire par défaut.
+    """
+    versions = '{}:{}'.format(get_version(doctor_scope(doctor_id)), get_version(HOLIDAYS))
+    mondays = set()
+    for day in days:
+        day = datetime.date.fromisoformat(day)
+        mondays.add(day - datetime.timedelta(days=day.weekday()))
+    keys = {CACHE_KEY.format(doctor_id, versions, monday.isoformat()): monday for monday in mondays}
+    weeks = {keys[key]: week for key, week in cache.get_many(keys).items()}
+    missing = [monday for monday in mondays if monday not in weeks]
+    if missing:
+        computed = _compute_weeks(doctor_id, missing)
+        cache.set_many({key: computed[monday] for key, monday in keys.items() if monday in computed}, CACHE_TIMEOUT)
+        weeks.update(computed)
+    slots = {}
+    for day in days:
+        date = datetime.date.fromisoformat(day)
+        slots[day] = weeks[date - datetime.timedelta(days=date.weekday())][day]
+    return slots
+
+
+def is_offered(doctor_id, day, heure):
+    """Indique si le créneau heure fait partie de la grille du jour day dans l'agenda du médecin."""
+    return any(value == heure for value, label in get_slots(doctor_id, [day])[day])
@@ -1,3 +1,692 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from authentification.models import User
+from tasks import worker
+from tasks.models import Task
+from .formatting import format_day, format_slot, format_time
+from .forms import AppointmentForm
+from .models import Appointment, Note, ScheduleTemplate, ScheduleBreak, Holiday
+from .pagination import decode_cursor, keyset_page
+from .reservations import SlotUnavailable, reserve
+from . import async_views, availability, feeds, fragments, history, reservations, search, slots, transfer
 
-# Create your tests here.
+
+class ListingQueryBudgetTests(TestCase):
+    """Vérifie que les pages qui listent des rendez-vous font un nombre de requêtes constant, quel que soit le nombre de lignes affichées.
+
+    Chaque page compte 2 requêtes pour la session et l'utilisateur connecté, plus celles de la vue.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patients = [User.objects.create_user('patient{}'.format(i), password='motdepasse') for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_appointments(self, count):
+        now = timezone.now()
+        Appointment.objects.bulk_create([
+            Appointment(user=self.patients[i % 3], doctor=self.doctor, start=now + datetime.timedelta(hours=i - count // 2), objet='Séance {}'.format(i))
+            for i in range(count)
+        ])
+
+    def assertQueryBudget(self, url, user, queries):
+        self.client.force_login(user)
+        for count in (2, 10):
+            Appointment.objects.all().delete()
+            self.create_appointments(count)
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_manage_appointment(self):
+        self.assertQueryBudget(reverse('manage'), self.doctor, 4)
+
+    def test_consult_appointment(self):
+        self.assertQueryBudget(reverse('consult'), self.patients[0], 4)
+
+    def test_appointment_detail(self):
+        appointment = Appointment.objects.create(user=self.patients[0], start=timezone.now())
+        Note.objects.bulk_create([Note(user=self.patients[0], text='Note {}'.format(i)) for i in range(5)])
+        self.client.force_login(self.doctor)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('appointment-detail', args=[appointment.id]))
+        self.assertContains(response, 'Note 4')
+
+
+class FormattingTests(SimpleTestCase):
+    """Vérifie les libellés français des jours et des créneaux (booking/formatting.py)."""
+
+    def test_labels(self):
+        self.assertEqual(format_day(datetime.date(2023, 2, 16)), 'jeudi 16 février 2023')
+        self.assertEqual(format_day(datetime.date(2023, 8, 1)), 'mardi 1 août 2023')
+        self.assertEqual(format_time(datetime.time(9)), '9h')
+        self.assertEqual(format_slot('09:30 - 09:50'), '9h30 - 9h50')
+        self.assertEqual(format_slot('12:00 - 12:45'), '12h - 12h45')
+
+
+class KeysetPaginationTests(TestCase):
+    """Vérifie la pagination par curseur (booking/pagination.py) lorsque plusieurs rendez-vous commencent au même moment."""
+
+    @classmethod
+    def setUpTestData(cls):
+        doctors = [User.objects.create_user('coach{}'.format(i), password='motdepasse', role='MEDECIN') for i in range(3)]
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        # Trois rendez-vous au même début, puis trois autres, puis un seul : les pages de 2 coupent les groupes.
+        Appointment.objects.bulk_create([
+            Appointment(doctor=doctor, start=start + datetime.timedelta(hours=hour))
+            for hour, count in ((0, 3), (1, 3), (2, 1)) for doctor in doctors[:count]
+        ])
+
+    def walk(self, descending):
+        ids, cursor = [], None
+        while True:
+            page = keyset_page(Appointment.objects.all(), cursor, 2, descending=descending)
+            ids += [appointment.pk for appointment in page]
+            cursor = page.next_cursor
+            if not cursor:
+                return ids
+
+    def test_pages_without_duplicates_or_gaps(self):
+        expected = list(Appointment.objects.order_by('start', 'id').values_list('id', flat=True))
+        self.assertEqual(len(expected), 7)
+        self.assertEqual(self.walk(descending=False), expected)
+        self.assertEqual(self.walk(descending=True), expected[::-1])
+
+    def test_invalid_cursor_returns_first_page(self):
+        first = [appointment.pk for appointment in keyset_page(Appointment.objects.all(), None, 2)]
+        for cursor in ('', 'abc', '12_x', '1_2_3', '9' * 30 + '_1'):
+            self.assertIsNone(decode_cursor(cursor))
+            self.assertEqual([appointment.pk for appointment in keyset_page(Appointment.objects.all(), cursor, 2)], first)
+
+
+class FragmentCacheTests(TestCase):
+    """Vérifie le cache des fragments de la page de consultation et son invalidation par les signaux."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.patient)
+
+    def check_cache(self):
+        Appointment.objects.create(user=self.patient, start=timezone.now() + datetime.timedelta(days=1), objet='Première séance')
+        fragments.reset_stats()
+        self.assertContains(self.client.get(reverse('consult')), 'Première séance')
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(reverse('consult')), 'Première séance')
+        self.assertEqual(fragments.get_stats(), {'hits': 2, 'misses': 2, 'hit_ratio': 0.5})
+
+        Appointment.objects.create(user=self.patient, start=timezone.now() + datetime.timedelta(days=2), objet='Deuxième séance')
+        self.assertContains(self.client.get(reverse('consult')), 'Deuxième séance')
+        self.assertEqual(fragments.get_stats()['misses'], 4)
+
+    def test_locmem_cache(self):
+        self.check_cache()
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'fragments': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+            }, BOOKING_FRAGMENT_CACHE='fragments'):
+                self.check_cache()
+
+
+class SlotGenerationTests(TestCase):
+    """Vérifie la génération des créneaux à partir des horaires de travail et l'invalidation de leur cache."""
+
+    MONDAY = '2030-01-07'
+    TUESDAY = '2030-01-08'
+    SATURDAY = '2030-01-12'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_default_schedule(self):
+        grid = slots.get_slots(self.doctor.pk, [self.MONDAY, self.SATURDAY])
+        self.assertEqual(grid[self.SATURDAY], [])
+        self.assertEqual(len(grid[self.MONDAY]), 15)
+        self.assertEqual(grid[self.MONDAY][0], ('09:00 - 09:20', '9h - 9h20'))
+        self.assertNotIn('13:00 - 13:20', dict(grid[self.MONDAY]))
+        self.assertEqual(grid[self.MONDAY][-1], ('16:30 - 16:50', '16h30 - 16h50'))
+
+    def test_template_breaks_and_holidays(self):
+        template = ScheduleTemplate.objects.create(
+            doctor=self.doctor, weekday=0, start_time=datetime.time(8), end_time=datetime.time(10),
+            slot_length=datetime.timedelta(minutes=45), slot_interval=datetime.timedelta(minutes=45))
+        self.assertEqual(dict(slots.get_slots(self.doctor.pk, [self.MONDAY])[self.MONDAY]), {
+            '08:00 - 08:45': '8h - 8h45', '08:45 - 09:30': '8h45 - 9h30'})
+        self.assertEqual(slots.get_slots(self.doctor.pk, [self.TUESDAY])[self.TUESDAY], [])
+
+        ScheduleBreak.objects.create(template=template, start_time=datetime.time(9), end_time=datetime.time(9, 15))
+        self.assertEqual(dict(slots.get_slots(self.doctor.pk, [self.MONDAY])[self.MONDAY]), {'08:00 - 08:45': '8h - 8h45'})
+
+        Holiday.objects.create(date=datetime.date(2030, 1, 7), label='Fermeture')
+        with self.assertNumQueries(3):
+            self.assertEqual(slots.get_slots(self.doctor.pk, [self.MONDAY])[self.MONDAY], [])
+        with self.assertNumQueries(0):
+            slots.get_slots(self.doctor.pk, [self.MONDAY])
+
+    def test_form_rejects_slot_outside_schedule(self):
+        tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+        ScheduleTemplate.objects.create(doctor=self.doctor, weekday=tomorrow.weekday(), start_time=datetime.time(9), end_time=datetime.time(12))
+        day = tomorrow.isoformat()
+        form = AppointmentForm({'doctor': self.doctor.pk, 'date': day, 'heure': '09:30 - 09:50'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.instance.duration, datetime.timedelta(minutes=20))
+        form = AppointmentForm({'doctor': self.doctor.pk, 'date': day, 'heure': '14:00 - 14:20'})
+        self.assertFalse(form.is_valid())
+
+
+class ReservationTests(TestCase):
+    """Vérifie la réservation des créneaux (booking/reservations.py) et l'index de disponibilité (booking/availability.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        cls.day = (timezone.localdate() + datetime.timedelta(days=1)).isoformat()
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, heure, doctor=None):
+        return Appointment(user=self.patient, doctor=doctor or self.doctor, start=Appointment.slot_start(self.day, heure),
+                           duration=Appointment.slot_end(self.day, heure) - Appointment.slot_start(self.day, heure))
+
+    def test_overlapping_slots_of_different_lengths(self):
+        weekday = datetime.date.fromisoformat(self.day).weekday()
+        ScheduleTemplate.objects.create(doctor=self.doctor, weekday=weekday, start_time=datetime.time(9), end_time=datetime.time(12))
+        # Plage qui chevauche la précédente, enregistrée sans passer par clean() (données antérieures à la vérification).
+        overlapping = ScheduleTemplate.objects.create(
+            doctor=self.doctor, weekday=weekday, start_time=datetime.time(8), end_time=datetime.time(10),
+            slot_length=datetime.timedelta(minutes=45), slot_interval=datetime.timedelta(minutes=45))
+        with self.assertRaises(ValidationError):
+            overlapping.full_clean()
+        reserve(self.book('09:00 - 09:20'))
+
+        self.assertFalse(availability.is_free(self.doctor.pk, self.day, '08:45 - 09:30'))
+        self.assertTrue(availability.is_free(self.doctor.pk, self.day, '08:00 - 08:45'))
+        free = dict(availability.free_slots_by_day(self.doctor.pk, [self.day])[self.day])
+        self.assertNotIn('08:45 - 09:30', free)
+        self.assertIn('09:30 - 09:50', free)
+        form = AppointmentForm({'doctor': self.doctor.pk, 'date': self.day, 'heure': '08:45 - 09:30'})
+        self.assertFalse(form.is_valid())
+        with self.assertRaises(SlotUnavailable):
+            reserve(self.book('08:45 - 09:30'))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_conflict_suggests_next_free_slot(self):
+        day = datetime.date.fromisoformat(self.day)
+        ScheduleTemplate.objects.create(doctor=self.doctor, weekday=day.weekday(), start_time=datetime.time(9), end_time=datetime.time(10))
+        next_week = (day + datetime.timedelta(days=7)).isoformat()
+        self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+        # Rendez-vous enregistré par une autre requête, sans signal : l'index de disponibilité est périmé.
+        Appointment.objects.bulk_create([self.book('09:00 - 09:20')])
+
+        with self.assertRaises(SlotUnavailable) as raised:
+            reserve(self.book('09:00 - 09:20'))
+        self.assertEqual(raised.exception.next_slot, (self.day, '09:30 - 09:50'))
+        self.assertIn('Prochain créneau libre', str(raised.exception))
+
+        # Requête concurrente enregistrée entre la vérification et l'enregistrement : c'est la contrainte d'unicité qui tranche.
+        Appointment.objects.bulk_create([self.book('09:30 - 09:50')])
+        with mock.patch.object(reservations, 'overlapping', return_value=Appointment.objects.none()):
+            with self.assertRaises(SlotUnavailable) as raised:
+                reserve(self.book('09:30 - 09:50'))
+        self.assertEqual(raised.exception.next_slot, (next_week, '09:00 - 09:20'))
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertFalse(availability.is_free(self.doctor.pk, self.day, '09:30 - 09:50'))
+
+    def test_refresh_and_forget(self):
+        self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+        # bulk_create et update n'envoient pas de signal : l'index reste celui d'avant.
+        Appointment.objects.bulk_create([self.book('09:00 - 09:20')])
+        with self.assertNumQueries(0):
+            self.assertEqual(availability.get_occupancy(self.doctor.pk, [self.day])[self.day], 0)
+        availability.forget(self.doctor.pk, self.day)
+        self.assertFalse(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+
+        Appointment.objects.update(start=Appointment.slot_start(self.day, '10:00 - 10:20'))
+        availability.refresh(self.doctor.pk, self.day)
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+        # Un créneau pris n'est refusé qu'après vérification en base.
+        with self.assertNumQueries(1):
+            self.assertFalse(availability.is_free(self.doctor.pk, self.day, '10:10 - 10:30'))
+
+    def test_ignored_slot(self):
+        reserve(self.book('09:00 - 09:20'))
+        self.assertFalse(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+        self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20', ignore=(self.doctor.pk, self.day, '09:00 - 09:20')))
+        self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:10 - 09:30', ignore=(self.doctor.pk, self.day, '09:00 - 09:20')))
+        self.assertFalse(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20', ignore=(None, self.day, '09:00 - 09:20')))
+
+    def test_stale_taken_slot_is_checked_in_database(self):
+        # Index périmé d'un autre processus : le créneau y est encore marqué comme pris.
+        cache.set(availability._cache_key(self.doctor.pk, self.day), availability.slot_bits('09:00 - 09:20'))
+        with self.assertNumQueries(1):
+            self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.is_free(self.doctor.pk, self.day, '09:00 - 09:20'))
+
+
+class DoctorAgendaTests(TestCase):
+    """Vérifie que chaque médecin a son propre agenda : réservations indépendantes, tableau de bord et invalidation de son cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctors = [User.objects.create_user('coach{}'.format(i), password='motdepasse', role='MEDECIN') for i in range(2)]
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        cls.start = Appointment.slot_start((timezone.localdate() + datetime.timedelta(days=1)).isoformat(), '09:00 - 09:20')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_start_in_two_agendas(self):
+        for doctor in self.doctors:
+            reserve(Appointment(user=self.patient, doctor=doctor, start=self.start, objet='Séance chez {}'.format(doctor)))
+        with self.assertRaises(SlotUnavailable):
+            reserve(Appointment(user=self.patient, doctor=self.doctors[0], start=self.start))
+        self.assertEqual(Appointment.objects.filter(start=self.start).count(), 2)
+
+    def test_manage_lists_and_invalidates_own_agenda(self):
+        for doctor in self.doctors:
+            Appointment.objects.create(user=self.patient, doctor=doctor, start=self.start, objet='Séance chez {}'.format(doctor))
+        self.client.force_login(self.doctors[0])
+        response = self.client.get(reverse('manage'))
+        self.assertContains(response, 'Séance chez coach0')
+        self.assertNotContains(response, 'Séance chez coach1')
+
+        versions = [fragments.get_version(fragments.manage_scope(doctor.pk)) for doctor in self.doctors]
+        Appointment.objects.create(user=self.patient, doctor=self.doctors[1], start=self.start + datetime.timedelta(hours=1))
+        self.assertEqual(fragments.get_version(fragments.manage_scope(self.doctors[0].pk)), versions[0])
+        self.assertNotEqual(fragments.get_version(fragments.manage_scope(self.doctors[1].pk)), versions[1])
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(reverse('manage')), 'Séance chez coach0')
+
+
+class TransferCommandTests(TestCase):
+    """Vérifie l'aller-retour export puis import des rendez-vous et des notes, et la détection des créneaux déjà pris."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self, fmt, *args):
+        output = io.StringIO()
+        call_command('export_appointments', '--format', fmt, *args, stdout=output, stderr=io.StringIO())
+        return output.getvalue()
+
+    def load(self, content, fmt, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.' + fmt)
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(content)
+            output = io.StringIO()
+            call_command('import_appointments', path, '--batch-size', '2', *args, stdout=output, stderr=io.StringIO())
+        return output.getvalue()
+
+    def test_round_trip(self):
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        for i in range(5):
+            Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start + datetime.timedelta(hours=i), objet='Séance {}'.format(i))
+        Note.objects.create(user=self.patient, text='Bilan')
+        for fmt in ('csv', 'jsonl'):
+            appointments, notes = self.export(fmt), self.export(fmt, '--notes')
+            Appointment.objects.all().delete()
+            Note.objects.all().delete()
+            self.assertIn('5 ligne(s) importée(s), 0 conflit(s)', self.load(appointments, fmt))
+            self.assertIn('1 ligne(s) importée(s)', self.load(notes, fmt, '--notes'))
+            self.assertEqual(
+                list(Appointment.objects.order_by('start').values_list('doctor', 'user', 'start', 'objet')),
+                [(self.doctor.pk, self.patient.pk, start + datetime.timedelta(hours=i), 'Séance {}'.format(i)) for i in range(5)])
+            self.assertEqual(Note.objects.get().text, 'Bilan')
+
+    def test_conflicts_are_skipped(self):
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start)
+        content = self.export('jsonl')
+        other = content.replace(start.isoformat(), (start + datetime.timedelta(hours=1)).isoformat())
+        self.assertIn('1 ligne(s) importée(s), 2 conflit(s), 4 erreur(s)',
+                      self.load(content + other + other + content.replace('coach', 'inconnu') + '[1, 2]\n"x"\n{\n', 'jsonl'))
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertFalse(availability.is_free(self.doctor.pk, Appointment.objects.latest('start').date, Appointment.objects.latest('start').heure))
+
+    def test_overlapping_rows_are_skipped(self):
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start, duration=datetime.timedelta(minutes=40))
+
+        def row(minutes, duration='00:20:00'):
+            return '{{"start": "{}", "duration": "{}", "doctor": "coach", "user": "patient"}}\n'.format(
+                (start + datetime.timedelta(minutes=minutes)).isoformat(), duration)
+        # Lots de deux lignes : chevauche le rendez-vous enregistré, acceptée ; acceptée, chevauche la ligne précédente du même lot ; chevauche une ligne du lot précédent, durée nulle.
+        content = row(20) + row(40) + row(60, '01:00:00') + row(90) + row(110) + row(200, '00:00:00')
+        self.assertIn('2 ligne(s) importée(s), 3 conflit(s), 1 erreur(s)', self.load(content, 'jsonl'))
+        self.assertEqual(list(Appointment.objects.order_by('start').values_list('start', flat=True)),
+                         [start, start + datetime.timedelta(minutes=40), start + datetime.timedelta(minutes=60)])
+
+    def test_values_of_wrong_type_are_errors(self):
+        start = (timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)).isoformat()
+        rows = [{'start': 123, 'doctor': 'coach'}, {'start': start, 'duration': [], 'doctor': 'coach'},
+                {'start': start, 'doctor': ['coach']}, {'start': start, 'doctor': 'coach', 'user': {'username': 'patient'}},
+                {'start': start, 'doctor': 'coach', 'objet': 5}, {'start': start, 'doctor': 'coach'}]
+        content = ''.join(json.dumps(row) + '\n' for row in rows)
+        self.assertIn('1 ligne(s) importée(s), 0 conflit(s), 5 erreur(s)', self.load(content, 'jsonl'))
+        self.assertIn('0 ligne(s) importée(s), 0 conflit(s), 1 erreur(s)', self.load('{"text": ["Bilan"]}\n', 'jsonl', '--notes'))
+
+    def test_integrity_error_skips_batch(self):
+        start = timezone.now().replace(microsecond=0) + datetime.timedelta(days=1)
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start)
+        content = self.export('jsonl')
+        Appointment.objects.all().delete()
+        with mock.patch.object(transfer, '_taken_intervals', side_effect=lambda appointments: {}):
+            Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start)
+            self.assertIn('0 ligne(s) importée(s), 1 conflit(s), 0 erreur(s)', self.load(content, 'jsonl'))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+class AgendaExportTests(TestCase):
+    """Vérifie l'export en flux de l'agenda du médecin."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse', first_name='Marie', last_name='Curie')
+        cls.day = timezone.localdate() + datetime.timedelta(days=1)
+        start = Appointment.slot_start(cls.day.isoformat(), '09:30 - 09:50')
+        Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=start, objet='Bilan, suivi')
+        Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=start + datetime.timedelta(days=40))
+
+    def export(self, **params):
+        self.client.force_login(self.doctor)
+        response = self.client.get(reverse('manage-export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        content = self.export()
+        self.assertEqual(content.splitlines(), [
+            'Date,Heure,Patient,Client,Objet',
+            '{},9h30 - 9h50,Marie Curie,,"Bilan, suivi"'.format(format_day(self.day)),
+        ])
+
+    def test_ics(self):
+        last_day = self.day + datetime.timedelta(days=40)
+        content = self.export(format='ics', to=last_day.isoformat())
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VEVENT'), 2)
+        self.assertIn('SUMMARY:Bilan\\, suivi\r\n', content)
+
+    def test_rows_without_patient_name(self):
+        start = Appointment.slot_start(self.day.isoformat(), '10:00 - 10:20')
+        Appointment.objects.create(doctor=self.doctor, start=start, client='Jean')
+        Appointment.objects.create(user=User.objects.create_user('anonyme'), doctor=self.doctor, start=start + datetime.timedelta(hours=1))
+        lines = self.export().splitlines()
+        self.assertEqual(lines[2:], [
+            '{},10h - 10h20,,Jean,'.format(format_day(self.day)),
+            '{},11h - 11h20,anonyme,,'.format(format_day(self.day)),
+        ])
+        content = self.export(format='ics')
+        self.assertNotIn('None', content)
+        self.assertIn('DESCRIPTION:Jean\r\n', content)
+
+    def test_patients_and_invalid_dates_are_rejected(self):
+        self.client.force_login(self.patient)
+        self.assertEqual(self.client.get(reverse('manage-export')).status_code, 403)
+        self.client.force_login(self.doctor)
+        self.assertEqual(self.client.get(reverse('manage-export'), {'from': 'demain'}).status_code, 400)
+
+
+class AppointmentFeedTests(TestCase):
+    """Vérifie le flux d'abonnement iCalendar et ses réponses conditionnelles."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('appointment-feed', args=[feeds.make_token(self.patient)])
+
+    def test_conditional_get(self):
+        start = timezone.now() + datetime.timedelta(days=1)
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start, objet='Bilan')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'SUMMARY:Rendez-vous avec coach')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start + datetime.timedelta(days=1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b'BEGIN:VEVENT'), 2)
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get(reverse('appointment-feed', args=['1:faux'])).status_code, 404)
+
+
+class AvailabilityApiTests(TestCase):
+    """Vérifie l'API JSON des créneaux libres et ses réponses conditionnelles."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        cls.day = timezone.localdate() + datetime.timedelta(days=1)
+        ScheduleTemplate.objects.create(doctor=cls.doctor, weekday=cls.day.weekday(), start_time=datetime.time(9), end_time=datetime.time(10))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.patient)
+        self.params = {'doctor': self.doctor.pk, 'to': self.day.isoformat()}
+
+    def test_free_slots_and_etag(self):
+        response = self.client.get(reverse('booking-availability'), self.params)
+        self.assertEqual(response.json()['days'][0]['slots'], [
+            {'value': '09:00 - 09:20', 'label': '9h - 9h20'}, {'value': '09:30 - 09:50', 'label': '9h30 - 9h50'}])
+        etag = response['ETag']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('booking-availability'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Appointment.objects.create(user=self.patient, doctor=self.doctor, start=Appointment.slot_start(self.day.isoformat(), '09:00 - 09:20'))
+        response = self.client.get(reverse('booking-availability'), self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['value'] for slot in response.json()['days'][0]['slots']], ['09:30 - 09:50'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('booking-availability')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('booking-availability'), {'doctor': self.doctor.pk, 'from': 'demain'}).status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    """Vérifie les versions asynchrones des vues de lecture (booking/async_views.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        start = timezone.now() + datetime.timedelta(days=1)
+        Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=start, objet='Séance à venir')
+        Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=start - datetime.timedelta(days=3), objet='Séance passée')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, path, data=None, **meta):
+        request = AsyncRequestFactory().get(path, data)
+        request.META.update(meta)
+        request.user = user
+        return request
+
+    async def test_consult_appointment(self):
+        response = await async_views.consult_appointment(self.get(self.patient, '/consult/'))
+        self.assertContains(response, 'Séance à venir')
+        self.assertContains(response, 'Séance passée')
+
+    async def test_manage_appointment(self):
+        response = await async_views.manage_appointment(self.get(self.doctor, '/manage/', {'size': 1}))
+        self.assertContains(response, 'Séance à venir')
+        self.assertContains(response, 'Séance passée')
+
+    async def test_availability_api(self):
+        response = await async_views.availability_api(self.get(self.patient, '/booking/availability/', {'doctor': self.doctor.pk}))
+        self.assertEqual(response.status_code, 200)
+        request = self.get(self.patient, '/booking/availability/', {'doctor': self.doctor.pk}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((await async_views.availability_api(request)).status_code, 304)
+
+
+class HistoryTimelineTests(TestCase):
+    """Vérifie le fil de l'historique d'un patient (booking/history.py) et son API de pagination."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        now = timezone.now()
+        for i in range(4):
+            at = now - datetime.timedelta(days=i + 1)
+            Note.objects.create(user=cls.patient, text='Note {}'.format(i), created_date=at)
+            Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=at, objet='Séance {}'.format(i))
+        cls.upcoming = Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=now + datetime.timedelta(days=1), objet='À venir')
+
+    def test_pages_merge_notes_and_past_appointments(self):
+        texts, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = history.timeline(self.patient, cursor, page_size=3)
+            texts += [entry.text for entry in page]
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        self.assertEqual(texts, [text for i in range(4) for text in ('Note {}'.format(i), 'Séance {}'.format(i))])
+
+    def test_load_more_endpoint(self):
+        self.client.force_login(self.doctor)
+        response = self.client.get(reverse('appointment-detail', args=[self.upcoming.id]), {'size': 5})
+        self.assertNotContains(response, 'À venir')
+        next_url = response.context['next_url']
+        data = self.client.get(next_url).json()
+        self.assertEqual([entry['text'] for entry in data['entries']], ['Séance 2', 'Note 3', 'Séance 3'])
+        self.assertEqual(data['entries'][0]['kind'], 'appointment')
+        self.assertIsNone(data['next'])
+
+    def test_timeline_only_for_rendered_page_with_patient(self):
+        self.client.force_login(self.doctor)
+        with mock.patch.object(history, 'timeline', wraps=history.timeline) as timeline:
+            response = self.client.post(reverse('appointment-detail', args=[self.upcoming.id]), {'text': 'Bilan'})
+            self.assertRedirects(response, reverse('manage'), fetch_redirect_response=False)
+            timeline.assert_not_called()
+            without_patient = Appointment.objects.create(doctor=self.doctor, start=self.upcoming.start + datetime.timedelta(hours=1), client='Jean')
+            response = self.client.get(reverse('appointment-detail', args=[without_patient.id]))
+            self.assertIsNone(response.context['entries'])
+            timeline.assert_not_called()
+        Note.objects.create(text='Note sans patient')
+        self.assertEqual(list(history.timeline(None)), [])
+
+    def test_restricted_to_doctors(self):
+        other = User.objects.create_user('autre', password='motdepasse')
+        self.client.force_login(other)
+        for name in ('appointment-detail', 'appointment-history'):
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get(reverse(name, args=[self.upcoming.id])).status_code, 403)
+        self.assertEqual(self.client.post(reverse('appointment-detail', args=[self.upcoming.id]), {'text': 'Intrusion'}).status_code, 403)
+        self.assertFalse(Note.objects.filter(text='Intrusion').exists())
+
+
+class SearchTests(TestCase):
+    """Vérifie la recherche plein texte (booking/search.py) : racinisation, accents, mise à jour de l'index par les signaux et accès réservé aux médecins."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN')
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        cls.appointment = Appointment.objects.create(user=cls.patient, doctor=cls.doctor, start=timezone.now(), objet='Séances de relaxation')
+        cls.note = Note.objects.create(user=cls.patient, text='Patiente très fatiguée après le travail')
+
+    def test_stemming_and_accent_folding(self):
+        self.assertEqual(search.stem('Fatiguée'), search.stem('fatigues'))
+        self.assertEqual([result.obj for result in search.search('FATIGUE')], [self.note])
+        self.assertEqual([result.obj for result in search.search('seance relax')], [self.appointment])
+        self.assertEqual(search.search('"); DROP TABLE booking_note; --'), [])
+
+    def test_index_follows_changes(self):
+        self.note.text = 'Sommeil agité'
+        self.note.save()
+        self.assertEqual(search.search('fatigue'), [])
+        self.assertEqual([result.obj for result in search.search('agite')], [self.note])
+        self.note.delete()
+        self.assertEqual(search.search('sommeil'), [])
+        self.assertEqual(search.rebuild(), 1)
+
+    def test_view_restricted_to_doctors(self):
+        self.client.force_login(self.patient)
+        self.assertEqual(self.client.get(reverse('manage-search'), {'q': 'fatigue'}).status_code, 403)
+        self.client.force_login(self.doctor)
+        response = self.client.get(reverse('manage-search'), {'q': 'fatigue'})
+        self.assertContains(response, 'Patiente très fatiguée')
+        self.assertContains(response, reverse('appointment-detail', args=[self.appointment.id]))
+
+
+class NotificationTests(TestCase):
+    """Vérifie que les courriels de confirmation et de rappel sont mis en file à l'enregistrement d'un rendez-vous et envoyés par le processus d'exécution des tâches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user('coach', password='motdepasse', role='MEDECIN', first_name='Édouard', last_name='Baert')
+        cls.patient = User.objects.create_user('patient', password='motdepasse', email='patient@example.com', first_name='Alice')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_confirmation_then_reminder(self):
+        start = timezone.now() + datetime.timedelta(days=3)
+        appointment = Appointment.objects.create(user=self.patient, doctor=self.doctor, start=start, objet='Bilan')
+        self.assertEqual(mail.outbox, [])
+
+        worker.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['patient@example.com'])
+        self.assertIn('Bilan', mail.outbox[0].body)
+        reminder = Task.objects.get()
+        self.assertEqual(reminder.run_at, start - datetime.timedelta(hours=24))
+
+        appointment.start = start + datetime.timedelta(hours=1)
+        appointment.save()
+        Task.objects.update(run_at=timezone.now())
+        worker.run_pending()
+        subjects = [message.subject for message in mail.outbox]
+        self.assertEqual(len(subjects), 3)
+        self.assertEqual(sum(subject.startswith('Rappel') for subject in subjects), 1)
+        self.assertFalse(Task.objects.exists())
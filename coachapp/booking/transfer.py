@@ -0,0 +1,272 @@
+"""Import et export en masse des rendez-vous et des notes, aux formats CSV et JSONL (un objet JSON par ligne).
+
+Les deux sens travaillent en flux, à mémoire constante quel que soit le nombre de lignes :
+- l'export lit la base par paquets de chunk_size lignes (QuerySet.iterator) et écrit chaque ligne dès qu'elle est lue ;
+- l'import lit le fichier par lots de batch_size lignes et insère chaque lot avec bulk_create, après avoir écarté les lignes dont le créneau chevauche un rendez-vous déjà enregistré ou une ligne précédente du fichier.
+
+Les utilisateurs sont désignés par leur nom d'utilisateur, les dates au format ISO 8601 avec leur décalage horaire et les durées au format 'HH:MM:SS'. bulk_create n'envoyant aucun signal, l'import invalide lui-même l'index de disponibilité et les fragments HTML concernés par chaque lot, et indexe les objets insérés pour la recherche plein texte.
+
+Ce module est utilisé par les commandes export_appointments et import_appointments.
+"""
+import bisect
+import csv
+import datetime
+import json
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+from django.utils.duration import duration_string
+from .models import Appointment, Note, SLOT_DURATION
+from .reservations import MAX_DURATION
+from . import availability, fragments, search
+
+User = get_user_model()
+
+FORMATS = ('csv', 'jsonl')
+
+APPOINTMENT_FIELDS = ('start', 'duration', 'doctor', 'user', 'client', 'objet', 'time_ordered')
+NOTE_FIELDS = ('user', 'created_date', 'text')
+
+
+class ImportReport:
+    """Bilan d'un import.
+
+    Attributs:
+    - created: nombre de lignes insérées.
+    - conflicts: nombre de lignes écartées parce que le créneau chevauchait un rendez-vous déjà pris.
+    - errors: nombre de lignes invalides.
+    - on_skip: fonction appelée avec le numéro de ligne et le motif de chaque ligne écartée. Seuls les compteurs sont conservés, afin que la mémoire reste constante même si toutes les lignes sont écartées.
+    """
+
+    def __init__(self, on_skip=None):
+        self.created = 0
+        self.conflicts = 0
+        self.errors = 0
+        self.on_skip = on_skip
+
+    def skip(self, line_num, reason, conflict=False):
+        if conflict:
+            self.conflicts += 1
+        else:
+            self.errors += 1
+        if self.on_skip:
+            self.on_skip(line_num, reason)
+
+
+def guess_format(path, default='csv'):
+    """Déduit le format ('csv' ou 'jsonl') de l'extension du fichier."""
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv' if extension == 'csv' else default
+
+
+def _format_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return duration_string(value)
+    return value
+
+
+def _export_rows(model):
+    if model is Appointment:
+        queryset = Appointment.objects.order_by('start', 'id').values_list(
+            'start', 'duration', 'doctor__username', 'user__username', 'client', 'objet', 'time_ordered')
+        return APPOINTMENT_FIELDS, queryset
+    queryset = Note.objects.order_by('created_date', 'id').values_list('user__username', 'created_date', 'text')
+    return NOTE_FIELDS, queryset
+
+
+def export_objects(model, stream, fmt, chunk_size=2000):
+    """Écrit tous les objets du modèle (Appointment ou Note) dans le flux texte stream, et renvoie le nombre de lignes écrites."""
+    fields, queryset = _export_rows(model)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream, lineterminator='\n')
+        writer.writerow(fields)
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + '\n')
+    for row in queryset.iterator(chunk_size=chunk_size):
+        write([_format_value(value) for value in row])
+        count += 1
+    return count
+
+
+def _read_rows(stream, fmt):
+    """Renvoie un itérateur de couples (numéro de ligne, dictionnaire des valeurs) lus dans le flux. Une ligne JSONL qui n'est pas un objet JSON donne None à la place du dictionnaire."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_num, row if isinstance(row, dict) else None
+
+
+def _text(row, field):
+    """Renvoie la valeur du champ, ou None s'il est absent ou vide. Une valeur JSON qui n'est pas une chaîne (nombre, liste, objet) rend la ligne invalide."""
+    value = row.get(field)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError('{} invalide : {}'.format(field, json.dumps(value, ensure_ascii=False)))
+    return value
+
+
+def _parse_datetime(row, field, required=True):
+    value = _text(row, field)
+    if not value:
+        if required:
+            raise ValueError('date manquante')
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError('date invalide : {}'.format(value))
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _resolve_users(rows, *fields):
+    names = {row[field] for line_num, row in rows for field in fields if row and isinstance(row.get(field), str)}
+    return dict(User.objects.filter(username__in=names).values_list('username', 'id'))
+
+
+def _user_id(users, row, field):
+    name = _text(row, field)
+    if not name:
+        return None
+    if name not in users:
+        raise ValueError('utilisateur inconnu : {}'.format(name))
+    return users[name]
+
+
+def _build_appointment(row, users):
+    value = _text(row, 'duration')
+    duration = parse_duration(value) if value else SLOT_DURATION
+    if duration is None or not datetime.timedelta(0) < duration <= MAX_DURATION:
+        raise ValueError('durée invalide : {}'.format(value))
+    return Appointment(
+        start=_parse_datetime(row, 'start'),
+        duration=duration,
+        doctor_id=_user_id(users, row, 'doctor'),
+        user_id=_user_id(users, row, 'user'),
+        client=_text(row, 'client'),
+        objet=_text(row, 'objet'),
+        time_ordered=_parse_datetime(row, 'time_ordered', required=False),
+    )
+
+
+def _build_note(row, users):
+    return Note(
+        user_id=_user_id(users, row, 'user'),
+        created_date=_parse_datetime(row, 'created_date', required=False),
+        text=_text(row, 'text'),
+    )
+
+
+def _taken_intervals(appointments):
+    """Renvoie, pour chaque médecin des rendez-vous donnés, la liste triée des intervalles (début, fin) déjà enregistrés qui peuvent les chevaucher, en une requête.
+
+    Comme reservations.overlapping(), la requête parcourt l'index (doctor, start), entre le premier début du lot moins MAX_DURATION et la dernière fin : un export trié par date donne des lots resserrés dans le temps.
+    """
+    doctor_ids = {appointment.doctor_id for appointment in appointments}
+    condition = Q(doctor_id__in=doctor_ids - {None})
+    if None in doctor_ids:
+        condition |= Q(doctor__isnull=True)
+    first = min(appointment.start for appointment in appointments)
+    last = max(appointment.start + appointment.duration for appointment in appointments)
+    queryset = Appointment.objects.filter(
+        condition, start__lt=last, start__gt=first - MAX_DURATION,
+    ).annotate(
+        end=ExpressionWrapper(F('start') + F('duration'), output_field=DateTimeField()),
+    ).filter(end__gt=first).order_by('start')
+    intervals = {}
+    for doctor_id, start, end in queryset.values_list('doctor_id', 'start', 'end'):
+        intervals.setdefault(doctor_id, []).append((start, end))
+    return intervals
+
+
+def _overlaps(intervals, start, end):
+    """Indique si l'intervalle [start, end) chevauche l'un des intervalles de la liste triée, dont aucun ne dure plus de MAX_DURATION."""
+    low = bisect.bisect_right(intervals, (start - MAX_DURATION,))
+    high = bisect.bisect_left(intervals, (end,))
+    return any(other_end > start for other_start, other_end in intervals[low:high])
+
+
+def _import_batch(model, rows, report):
+    users = _resolve_users(rows, 'user', 'doctor')
+    build = _build_appointment if model is Appointment else _build_note
+    objects = []
+    for line_num, row in rows:
+        try:
+            if row is None:
+                raise ValueError('ligne JSON invalide')
+            objects.append((line_num, build(row, users)))
+        except ValueError as error:
+            report.skip(line_num, str(error))
+    if model is Appointment and objects:
+        # Les lots précédents sont déjà en base ; les rendez-vous acceptés du lot courant sont ajoutés aux intervalles au fur et à mesure.
+        taken = _taken_intervals([appointment for line_num, appointment in objects])
+        accepted = []
+        for line_num, appointment in objects:
+            intervals = taken.setdefault(appointment.doctor_id, [])
+            start, end = appointment.start, appointment.start + appointment.duration
+            if _overlaps(intervals, start, end):
+                report.skip(line_num, 'créneau déjà pris', conflict=True)
+            else:
+                bisect.insort(intervals, (start, end))
+                accepted.append((line_num, appointment))
+        objects = accepted
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([obj for line_num, obj in objects])
+    except IntegrityError as error:
+        # Un rendez-vous enregistré pendant l'import sur l'un des créneaux : le lot entier est annulé.
+        for line_num, obj in objects:
+            report.skip(line_num, 'lot annulé, créneau pris pendant l\'import ({})'.format(error), conflict=True)
+        return
+    objects = [obj for line_num, obj in objects]
+    report.created += len(objects)
+    _invalidate(model, objects)
+
+
+def _invalidate(model, objects):
+    """Fait le travail des signaux post_save, que bulk_create n'envoie pas."""
+    search.index(*objects)
+    scopes = {fragments.user_scope(obj.user_id) for obj in objects}
+    if model is Appointment:
+        days = {}
+        for appointment in objects:
+            days.setdefault(appointment.doctor_id, set()).add(appointment.date)
+            scopes.add(fragments.manage_scope(appointment.doctor_id))
+        for doctor_id, doctor_days in days.items():
+            availability.forget(doctor_id, *doctor_days)
+    fragments.bump_version(*scopes)
+
+
+def import_objects(model, stream, fmt, batch_size=1000, on_skip=None):
+    """Insère dans la base les objets du modèle (Appointment ou Note) lus dans le flux texte stream, par lots de batch_size lignes.
+
+    Les lignes invalides ou en conflit sont écartées et signalées à la fonction on_skip(numéro de ligne, motif). Chaque lot est inséré dans sa propre transaction : un import interrompu conserve les lots déjà traités. Les chevauchements avec les rendez-vous enregistrés et entre les lignes du fichier sont détectés avant l'insertion ; si un rendez-vous est enregistré entre-temps sur l'un des créneaux, la contrainte d'unicité (ou d'exclusion sous PostgreSQL) fait échouer l'insertion, et toutes les lignes du lot sont alors signalées en conflit sans interrompre l'import.
+
+    Returns:
+        ImportReport: le bilan de l'import.
+    """
+    report = ImportReport(on_skip)
+    rows = _read_rows(stream, fmt)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _import_batch(model, batch, report)
+    return report
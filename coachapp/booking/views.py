@@ -1,46 +1,138 @@
+import datetime
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, urlencode
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from .forms import AppointmentForm, NoteForm
 from django.contrib.auth.decorators import login_required
-from .models import Appointment, Note
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from .models import Appointment
+from .reservations import reserve, SlotUnavailable
+from .pagination import get_page_size, keyset_page, page_query
+from . import availability, exports, feeds, fragments, history, search
+from .calendar_provider import get_day_choices
 
 @login_required
 def create_appointment(request):
     """
-    Permet à un utilisateur connecté de créer un nouveau rendez-vous. Si la méthode de la requête est POST, vérifie la validité des données du formulaire de rendez-vous. Si le formulaire est valide, crée un nouvel objet Appointment avec les données du formulaire et les informations de l'utilisateur connecté, puis redirige vers la page de consultation des rendez-vous. Si le formulaire n'est pas valide, l'affiche à nouveau. Si la méthode de la requête est GET, affiche un formulaire vide de rendez-vous. Si l'utilisateur connecté n'est pas un médecin, supprime le champ "client" du formulaire. 
+    Permet à un utilisateur connecté de créer un nouveau rendez-vous. Si la méthode de la requête est POST, vérifie la validité des données du formulaire de rendez-vous. Si le formulaire est valide, crée un nouvel objet Appointment avec les données du formulaire et les informations de l'utilisateur connecté grâce à reserve(), puis redirige vers la page de consultation des rendez-vous. Si le créneau a été pris entre-temps par une autre requête, le formulaire est affiché à nouveau avec le prochain créneau libre. Si le formulaire n'est pas valide, l'affiche à nouveau. Si la méthode de la requête est GET, affiche un formulaire vide de rendez-vous. Si l'utilisateur connecté n'est pas un médecin, supprime le champ "client" du formulaire ; le patient choisit le médecin (paramètre 'doctor' de l'URL pour afficher ses disponibilités). Si l'utilisateur connecté est un médecin, le rendez-vous est pris dans son propre agenda. 
         
     Retour:
         - Un objet HttpResponse avec le modèle de rendu pour la page de création de rendez-vous, contenant le formulaire de rendez-vous. Si le formulaire n'est pas valide, affiche également les erreurs de validation du formulaire.
     """
+    doctor = request.user if request.user.role == 'MEDECIN' else None
     if request.method == 'POST':
-        form = AppointmentForm(request.POST)
+        form = AppointmentForm(request.POST, doctor=doctor)
+        if doctor:
+            del form.fields['doctor']
         if form.is_valid():
             appointment = form.save(commit=False)
             appointment.user = request.user
-            appointment.full_clean()
-            appointment.save()
-            return redirect('consult')
+            try:
+                reserve(appointment)
+            except SlotUnavailable as error:
+                form.add_error(None, str(error))
+            else:
+                return redirect('consult')
     else:
-        form = AppointmentForm()
+        form = AppointmentForm(doctor=doctor, initial={'doctor': request.GET.get('doctor')})
+        if doctor:
+            del form.fields['doctor']
         if request.user.role != 'MEDECIN':
             del form.fields['client']
     return render(request, 'booking/create_appointment.html', {'form': form})
 
 
+def _feed_url(request):
+    return request.build_absolute_uri(reverse('appointment-feed', args=[feeds.make_token(request.user)]))
+
+
+def _availability_query(request):
+    """Lit (une seule fois par requête) le médecin et les jours demandés à l'API de disponibilité. Renvoie None si les paramètres sont invalides."""
+    if not hasattr(request, 'availability_query'):
+        query = None
+        try:
+            if request.user.role == 'MEDECIN' and not request.GET.get('doctor'):
+                doctor_id = request.user.pk
+            else:
+                doctor_id = int(request.GET['doctor'])
+            first, last = request.GET.get('from', ''), request.GET.get('to', '')
+            for value in filter(None, (first, last)):
+                datetime.date.fromisoformat(value)
+            query = doctor_id, [(value, label) for value, label in get_day_choices() if first <= value and (not last or value <= last)]
+        except (KeyError, ValueError):
+            pass
+        request.availability_query = query
+    return request.availability_query
+
+
+def _availability_etag(request):
+    query = _availability_query(request)
+    return query and availability.get_etag(query[0], [value for value, label in query[1]])
+
+
+@login_required
+@condition(etag_func=_availability_etag)
+def availability_api(request):
+    """
+    API JSON des créneaux libres, utilisée par la page de prise de rendez-vous pour mettre à jour les horaires proposés sans recharger la page.
+
+    Les créneaux sont lus dans l'index de disponibilité et la grille de créneaux, tous deux en cache : la vue ne fait aucune requête sur les rendez-vous tant que l'index est à jour. L'ETag est calculé à partir de ces mêmes données (availability.get_etag), de sorte qu'une requête If-None-Match dont les créneaux n'ont pas changé reçoit une réponse 304 sans corps.
+
+    Args:
+        request: objet HttpRequest représentant la requête HTTP reçue. Les paramètres de l'URL sont 'doctor' (identifiant du médecin, facultatif pour un médecin qui consulte son propre agenda), 'from' et 'to' (dates 'AAAA-MM-JJ' incluses, limitées aux jours proposés à la réservation).
+
+    Returns:
+        JsonResponse de la forme {"doctor": ..., "days": [{"date": ..., "label": ..., "slots": [{"value": ..., "label": ...}]}]}, où seuls les jours ayant au moins un créneau libre sont listés.
+        HttpResponseBadRequest si les paramètres sont invalides.
+    """
+    query = _availability_query(request)
+    if not query:
+        return HttpResponseBadRequest("Paramètres invalides.")
+    doctor_id, day_choices = query
+    free = availability.free_slots_by_day(doctor_id, [value for value, label in day_choices])
+    response = JsonResponse({
+        'doctor': doctor_id,
+        'days': [
+            {'date': value, 'label': label, 'slots': [{'value': slot, 'label': slot_label} for slot, slot_label in free[value]]}
+            for value, label in day_choices if free[value]
+        ],
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
 def consult_appointment(request):
     """
     Vue qui gère l'affichage des rendez-vous d'un client connecté.
 
-    Cette vue affiche les rendez-vous de l'utilisateur connecté en filtrant les rendez-vous stockés en base de données avec le champ 'user' égal à l'utilisateur connecté.
+    Cette vue affiche les rendez-vous de l'utilisateur connecté en filtrant les rendez-vous stockés en base de données avec le champ 'user' égal à l'utilisateur connecté. Les rendez-vous à venir et les rendez-vous passés sont séparés en SQL, grâce à l'index (user, start).
+    Les deux listes sont mises en cache par utilisateur (voir booking/fragments.py) : tant qu'aucun rendez-vous ni aucune note de l'utilisateur n'a changé, la page est servie sans requête sur les rendez-vous.
 
     Args:
         request: objet HttpRequest représentant la requête HTTP reçue.
 
     Returns:
         HttpResponse représentant la page HTML affichant la liste des rendez-vous de l'utilisateur connecté.
-        Les rendez-vous sont passés à la page via le dictionnaire de contexte 'appointments'.
+        Les fragments HTML des rendez-vous sont passés à la page via les clés 'upcoming' et 'past' du dictionnaire de contexte, et l'adresse du flux d'abonnement iCalendar de l'utilisateur via la clé 'feed_url'.
     """
-    appointments = Appointment.objects.filter(user=request.user)
-    return render(request, 'booking/consult_appointment.html', {'appointments': appointments})
+    appointments = Appointment.objects.for_listing().filter(user=request.user)
+    scope = fragments.user_scope(request.user.pk)
+    return render(request, 'booking/consult_appointment.html', {
+        'upcoming': fragments.render_fragment(
+            scope, 'upcoming', 'booking/fragments/consult_upcoming.html',
+            lambda: {'appointments': appointments.upcoming()}),
+        'past': fragments.render_fragment(
+            scope, 'past', 'booking/fragments/consult_past.html',
+            lambda: {'appointments': appointments.past()}),
+        'feed_url': _feed_url(request),
+    })
 
 
 @login_required
@@ -48,15 +140,137 @@ def manage_appointment(request):
     """
     Vue qui gère l'affichage des rendez-vous pour le médecin.
 
+    Seuls les rendez-vous de l'agenda du médecin connecté sont affichés (index (doctor, start)). Les rendez-vous à venir et les rendez-vous passés sont lus par deux requêtes distinctes et paginés par curseur (voir booking/pagination.py) : les paramètres 'upcoming' et 'past' de l'URL indiquent où reprendre chaque liste, et 'size' le nombre de rendez-vous par page (BOOKING_PAGE_SIZE par défaut).
+
+    Args:
+        request: objet HttpRequest représentant la requête HTTP reçue.
+
+    Returns:
+        HttpResponse représentant la page HTML affichant une page des rendez-vous à venir et une page des rendez-vous passés de l'agenda du médecin connecté.
+        Le fragment HTML des deux listes, mis en cache par page (voir booking/fragments.py), est passé à la page via la clé 'appointments' du dictionnaire de contexte, et l'adresse du flux d'abonnement iCalendar via la clé 'feed_url'.
+    """
+    def get_context():
+        page_size = get_page_size(request)
+        appointments = Appointment.objects.for_listing().for_doctor(request.user)
+        upcoming = keyset_page(appointments.upcoming(), request.GET.get('upcoming'), page_size)
+        past = keyset_page(appointments.past(), request.GET.get('past'), page_size, descending=True)
+        return {
+            'upcoming': upcoming,
+            'past': past,
+            'next_upcoming': upcoming.next_cursor and page_query(request, 'upcoming', upcoming.next_cursor),
+            'next_past': past.next_cursor and page_query(request, 'past', past.next_cursor),
+            'paginated': bool(request.GET.get('upcoming') or request.GET.get('past')),
+        }
+
+    variant = '{}:{}:{}'.format(get_page_size(request), request.GET.get('upcoming', ''), request.GET.get('past', ''))
+    return render(request, 'booking/manage_appointment.html', {
+        'appointments': fragments.render_fragment(
+            fragments.manage_scope(request.user.pk), 'list', 'booking/fragments/manage_list.html', get_context, variant),
+        'feed_url': _feed_url(request),
+    })
+
+@login_required
+def export_agenda(request):
+    """
+    Vue qui exporte l'agenda du médecin connecté, au format CSV ou iCalendar.
+
+    La réponse est envoyée en flux (StreamingHttpResponse) : les rendez-vous sont lus par paquets et chaque ligne est transmise dès qu'elle est produite, sans jamais charger tout l'export en mémoire (voir booking/exports.py).
+
+    Args:
+        request: objet HttpRequest représentant la requête HTTP reçue. Les paramètres de l'URL sont 'format' ('csv' par défaut, ou 'ics'), 'from' et 'to' (dates 'AAAA-MM-JJ' incluses ; par défaut, du jour même à 30 jours).
+
+    Returns:
+        StreamingHttpResponse contenant le fichier à télécharger.
+        HttpResponseForbidden si l'utilisateur connecté n'est pas un médecin, HttpResponseBadRequest si les paramètres sont invalides.
+    """
+    if request.user.role != 'MEDECIN':
+        return HttpResponseForbidden()
+    today = timezone.localdate()
+    try:
+        first_day = datetime.date.fromisoformat(request.GET.get('from') or today.isoformat())
+        last_day = datetime.date.fromisoformat(request.GET.get('to') or (first_day + datetime.timedelta(days=30)).isoformat())
+    except ValueError:
+        return HttpResponseBadRequest("Dates invalides.")
+    if last_day < first_day:
+        return HttpResponseBadRequest("La date de fin précède la date de début.")
+    export_format = request.GET.get('format', 'csv')
+    rows = exports.agenda_rows(request.user, first_day, last_day)
+    filename = 'agenda-{}-{}'.format(first_day, last_day)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(exports.csv_lines(rows), content_type='text/csv; charset=utf-8')
+    elif export_format == 'ics':
+        response = StreamingHttpResponse(exports.ics_lines(rows, 'Agenda'), content_type='text/calendar; charset=utf-8')
+    else:
+        return HttpResponseBadRequest("Format inconnu.")
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(filename, export_format)
+    return response
+
+@login_required
+def search_history(request):
+    """
+    Vue de recherche plein texte dans les notes et les objets des rendez-vous, réservée aux médecins.
+
+    Les résultats sont classés par pertinence (voir booking/search.py). Chacun renvoie vers l'historique du patient : celui du rendez-vous trouvé ou, pour une note, celui du dernier rendez-vous du patient.
+
+    Args:
+        request: objet HttpRequest représentant la requête HTTP reçue. Le paramètre 'q' de l'URL contient les mots recherchés.
+
+    Returns:
+        HttpResponse représentant la page de recherche et ses résultats.
+        HttpResponseForbidden si l'utilisateur connecté n'est pas un médecin.
+    """
+    if request.user.role != 'MEDECIN':
+        return HttpResponseForbidden()
+    query = request.GET.get('q', '').strip()
+    results = search.search(query, settings.BOOKING_SEARCH_LIMIT) if query else []
+    note_users = {result.user.pk for result in results if result.kind == 'note' and result.user}
+    last_appointments = dict(
+        Appointment.objects.filter(user_id__in=note_users).values('user_id').annotate(last=Max('id')).values_list('user_id', 'last')
+    ) if note_users else {}
+    for result in results:
+        result.detail_id = result.obj.pk if result.kind == 'appointment' else last_appointments.get(result.obj.user_id)
+    return render(request, 'booking/search.html', {'query': query, 'results': results})
+
+
+def _feed_etag(request, token):
+    if not hasattr(request, 'feed_etag'):
+        user_id = feeds.read_token(token)
+        request.feed_etag = user_id and feeds.get_etag(user_id)
+    return request.feed_etag
+
+
+def _feed_last_modified(request, token):
+    etag = _feed_etag(request, token)
+    entry = etag and feeds.get_cached(feeds.read_token(token), etag)
+    return entry[0] if entry else None
+
+
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def appointment_feed(request, token):
+    """
+    Vue qui sert le flux d'abonnement iCalendar des rendez-vous d'un utilisateur (rendez-vous pris comme patient et, pour un médecin, ceux de son agenda).
+
+    L'utilisateur est identifié par le jeton signé de l'URL, et non par sa session, afin que les applications d'agenda puissent s'abonner. Les en-têtes ETag et Last-Modified sont calculés à partir du cache seul (voir booking/feeds.py) : une requête conditionnelle reçoit une réponse 304 sans requête en base de données, et le corps du flux est mis en cache jusqu'à la prochaine modification des rendez-vous de l'utilisateur.
+
     Args:
         request: objet HttpRequest représentant la requête HTTP reçue.
+        token: jeton du flux, produit par feeds.make_token.
 
     Returns:
-        HttpResponse représentant la page HTML affichant la liste de tous les rendez-vous pris par les clients.
-        Les rendez-vous sont passés à la page via le dictionnaire de contexte 'appointments'.
+        HttpResponse contenant le calendrier, ou une réponse 304 si le client en a déjà la version courante.
+
+    Raises:
+        Http404: si le jeton est invalide.
     """
-    appointments = Appointment.objects.all()
-    return render(request, 'booking/manage_appointment.html', {'appointments': appointments})
+    etag = _feed_etag(request, token)
+    if not etag:
+        raise Http404
+    user_id = feeds.read_token(token)
+    generated, body = feeds.get_cached(user_id, etag) or feeds.build(user_id, etag)
+    response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['Last-Modified'] = http_date(generated.timestamp())
+    return response
+
 
 @login_required
 def appointment_change(request, id):
@@ -71,25 +285,34 @@ def appointment_change(request, id):
         HttpResponse représentant la page HTML pour la modification d'un rendez-vous.
         Si le formulaire est valide et a été enregistré avec succès, l'utilisateur sera redirigé soit vers la page de gestion de rendez-vous (pour les médecins), soit vers la page de consultation de rendez-vous (pour les patients).
         Si le formulaire n'est pas valide, l'utilisateur verra le formulaire de modification de rendez-vous avec les erreurs correspondantes.
+        Le rendez-vous est verrouillé (select_for_update) pendant sa modification, ce qui sérialise les modifications concurrentes d'un même rendez-vous sans bloquer les autres réservations.
 
     Raises:
         Appointment.DoesNotExist: si le rendez-vous avec l'identifiant spécifié n'existe pas en base de données.
     """
-    appointment = Appointment.objects.get(id=id)
     if request.method == 'POST':
-        form = AppointmentForm(request.POST, instance=appointment)
+        with transaction.atomic():
+            appointment = Appointment.objects.select_for_update().get(id=id)
+            form = AppointmentForm(request.POST, instance=appointment)
+            if request.user.role == 'MEDECIN':
+                del form.fields['doctor']
+            if form.is_valid():
+                try:
+                    reserve(form.save(commit=False))
+                except SlotUnavailable as error:
+                    form.add_error(None, str(error))
         if form.is_valid():
-            form.save()
             if request.user.role == 'MEDECIN':
                     return redirect('manage') 
             else:
                 return redirect('consult') 
-        elif not form.is_valid():
-            form = AppointmentForm(instance=appointment)
-            del form.fields['client']
+        del form.fields['client']
     else:
+        appointment = Appointment.objects.get(id=id)
         form = AppointmentForm(instance=appointment)
         del form.fields['client']
+        if request.user.role == 'MEDECIN':
+            del form.fields['doctor']
     return render(request,
                     'booking/appointment_change.html',
                     {'form': form})
@@ -133,14 +356,16 @@ def appointment_detail(request, id):
 
     Returns:
         HttpResponse représentant la page HTML pour l'affichage de l'historique du client du rendez-vous et des notes qui lui sont associées.
-        Les informations du rendez-vous, les notes associées, ainsi que le formulaire de création de notes sont passés à la page via le dictionnaire de contexte.
+        L'historique (rendez-vous passés et notes, du plus récent au plus ancien, voir booking/history.py) est paginé : seule la première page est passée à la page, avec l'adresse de la suivante, que le bouton "Voir plus" charge depuis appointment_history. Le formulaire de création de notes est également passé via le dictionnaire de contexte.
+        HttpResponseForbidden si l'utilisateur connecté n'est pas un médecin : l'historique contient les notes écrites au sujet du patient.
 
     Raises:
-        Appointment.DoesNotExist: si le rendez-vous avec l'identifiant spécifié n'existe pas en base de données.
+        Http404: si le rendez-vous avec l'identifiant spécifié n'existe pas en base de données.
     """
-    appointment = get_object_or_404(Appointment, id=id)
+    if request.user.role != 'MEDECIN':
+        return HttpResponseForbidden()
+    appointment = get_object_or_404(Appointment.objects.for_listing(), id=id)
     user = appointment.user
-    notes = Note.objects.filter(user=user)
 
     if request.method == 'POST':
         note_form = NoteForm(request.POST)
@@ -153,4 +378,38 @@ def appointment_detail(request, id):
     else:
         note_form = NoteForm()
 
-    return render(request, 'booking/appointment_detail.html', {'user': user, 'notes': notes, 'note_form': note_form})
\ No newline at end of file
+    # Le fil n'est lu que pour la page affichée (pas avant la redirection d'une note enregistrée), et seulement si le rendez-vous a un patient.
+    entries = history.timeline(user, page_size=get_page_size(request)) if appointment.user_id else None
+    return render(request, 'booking/appointment_detail.html', {
+        'user': user,
+        'entries': entries,
+        'next_url': entries and entries.next_cursor and _history_url(appointment.id, entries.next_cursor),
+        'note_form': note_form,
+    })
+
+
+def _history_url(id, cursor):
+    return '{}?{}'.format(reverse('appointment-history', args=[id]), urlencode({'cursor': cursor}))
+
+
+@login_required
+def appointment_history(request, id):
+    """
+    API JSON de l'historique du patient d'un rendez-vous, utilisée par le bouton "Voir plus" de la page appointment_detail.
+
+    Args:
+        request: objet HttpRequest représentant la requête HTTP reçue. Les paramètres de l'URL sont 'cursor' (curseur de la page, renvoyé par la page précédente) et 'size' (nombre d'entrées).
+        id: identifiant du rendez-vous dont le patient est concerné.
+
+    Returns:
+        JsonResponse de la forme {"entries": [{"kind": "appointment" ou "note", "id": ..., "at": ..., "label": ..., "text": ...}], "next": adresse de la page suivante ou null}.
+        HttpResponseForbidden si l'utilisateur connecté n'est pas un médecin, comme pour appointment_detail.
+    """
+    if request.user.role != 'MEDECIN':
+        return HttpResponseForbidden()
+    appointment = get_object_or_404(Appointment.objects.only('user_id'), id=id)
+    entries = history.timeline(appointment.user_id, request.GET.get('cursor'), get_page_size(request))
+    return JsonResponse({
+        'entries': [entry.as_json() for entry in entries],
+        'next': entries.next_cursor and _history_url(id, entries.next_cursor),
+    })
\ No newline at end of file
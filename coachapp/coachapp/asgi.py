@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coachapp.settings')
+# Sous ASGI, les pages de lecture des rendez-vous sont servies par leurs versions asynchrones (booking/async_views.py).
+os.environ.setdefault('BOOKING_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,31 @@
+"""Moteur SQLite réglé pour la production.
+
+Il se déclare dans DATABASES comme le moteur de Django ('ENGINE': 'coachapp.backends.sqlite3'), et accepte deux options supplémentaires dans OPTIONS :
+- pragmas : dictionnaire des PRAGMA exécutés à l'ouverture de chaque connexion, par exemple {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}. En mode WAL, les lectures ne bloquent plus les écritures ni ne sont bloquées par elles ; une seule écriture reste possible à la fois, les autres attendent jusqu'à busy_timeout millisecondes ;
+- transaction_mode : 'DEFERRED' (par défaut), 'IMMEDIATE' ou 'EXCLUSIVE', le mode des transactions ouvertes par transaction.atomic(). Une transaction DEFERRED qui lit avant d'écrire ne demande le verrou d'écriture qu'à sa première écriture : si une autre connexion écrit entre-temps, SQLite renvoie immédiatement « database is locked », sans attendre busy_timeout. En mode IMMEDIATE, le verrou est demandé dès le début de la transaction, et l'attente de busy_timeout s'applique.
+
+Le mode s'applique à tous les blocs transaction.atomic(), y compris ceux qui ne font que lire : en mode IMMEDIATE, un tel bloc prend lui aussi le verrou d'écriture et attend, derrière les écritures en cours, alors qu'une lecture hors transaction (mode autocommit, le cas des pages de lecture) n'attend jamais en mode WAL. Les lectures qui n'ont pas besoin d'un instantané cohérent de plusieurs requêtes ne doivent donc pas être placées dans un bloc atomic ; ATOMIC_REQUESTS, qui ouvrirait une transaction pour chaque requête HTTP, est à proscrire avec ce mode.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured("OPTIONS['transaction_mode'] doit valoir {}.".format(', '.join(TRANSACTION_MODES)))
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute('PRAGMA {} = {}'.format(name, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN {}'.format(self.transaction_mode))
@@ -0,0 +1,53 @@
+"""Lecture de la configuration de la base de données depuis une URL (variable d'environnement DATABASE_URL).
+
+Formes reconnues :
+- postgres://utilisateur:motdepasse@hôte:port/base?sslmode=require : PostgreSQL ; les paramètres de la requête sont transmis au pilote (OPTIONS), sauf pooler ;
+- sqlite:////chemin/absolu/base.sqlite3 (ou sqlite:///chemin/relatif.sqlite3) : SQLite, avec le moteur réglé de coachapp/backends/sqlite3.
+
+Les connexions sont persistantes (CONN_MAX_AGE, 600 secondes par défaut, réglable par DATABASE_CONN_MAX_AGE) et vérifiées avant d'être réutilisées (CONN_HEALTH_CHECKS).
+
+Derrière un gestionnaire de connexions en mode transaction (PgBouncer, pooler=transaction dans l'URL), une même connexion du serveur sert plusieurs clients d'une transaction à l'autre : les curseurs côté serveur, qui survivent à la transaction, sont désactivés (DISABLE_SERVER_SIDE_CURSORS) ; QuerySet.iterator() lit alors les résultats par blocs côté client.
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+from django.core.exceptions import ImproperlyConfigured
+
+ENGINES = {
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'coachapp.backends.sqlite3',
+}
+POOLER_MODES = ('session', 'transaction')
+
+
+def parse(url, conn_max_age=600, sqlite_options=None):
+    """Renvoie l'entrée de DATABASES décrite par l'URL.
+
+    sqlite_options est le dictionnaire OPTIONS d'une base SQLite (pragmas et mode des transactions, voir coachapp/backends/sqlite3/base.py).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ENGINES:
+        raise ImproperlyConfigured("DATABASE_URL : moteur « {} » non pris en charge ({}).".format(parts.scheme, ', '.join(ENGINES)))
+    database = {
+        'ENGINE': ENGINES[parts.scheme],
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+    }
+    options = dict(parse_qsl(parts.query))
+    if parts.scheme == 'sqlite':
+        database['NAME'] = unquote(parts.path[1:])
+        database['OPTIONS'] = dict(sqlite_options or {}, **options)
+        return database
+
+    pooler = options.pop('pooler', None)
+    if pooler is not None and pooler not in POOLER_MODES:
+        raise ImproperlyConfigured("DATABASE_URL : pooler doit valoir {}.".format(' ou '.join(POOLER_MODES)))
+    database.update({
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'OPTIONS': options,
+        'DISABLE_SERVER_SIDE_CURSORS': pooler == 'transaction',
+    })
+    return database
@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 from pathlib import Path
+import datetime
 import os
+from . import database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,9 +43,13 @@ INSTALLED_APPS = [
     'authentification',
     'blog',
     'booking',
+    'monitoring',
+    'tasks',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.PerformanceMiddleware',
+    'coachapp.throttling.ThrottleMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,7 +63,7 @@ ROOT_URLCONF = 'coachapp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'monitoring.templates.InstrumentedDjangoTemplates',
         'DIRS': [
             BASE_DIR.joinpath('templates'),],
         'APP_DIRS': True,
@@ -78,10 +84,44 @@ WSGI_APPLICATION = 'coachapp.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Moteur SQLite réglé pour la production (coachapp/backends/sqlite3/base.py) :
+# - journal WAL : les lectures ne sont plus bloquées par une écriture en cours ;
+# - synchronous=NORMAL : en mode WAL, la base reste cohérente après un arrêt brutal, seule la dernière transaction peut être perdue en cas de coupure de courant ;
+# - busy_timeout (en premier : le passage en mode WAL peut lui-même attendre un verrou) : une écriture attend jusqu'à 5 secondes que la précédente se termine, au lieu d'échouer ;
+# - mmap_size et cache_size (négatif : en Kio) : lectures servies par la mémoire ;
+# - transactions IMMEDIATE : le verrou d'écriture est demandé dès l'ouverture de la transaction, et l'attente de busy_timeout s'applique.
+# Les connexions sont réutilisées pendant CONN_MAX_AGE secondes (DATABASE_CONN_MAX_AGE) au lieu d'être rouvertes à chaque requête.
+# Avec plusieurs processus serveurs, la base est de préférence PostgreSQL : DATABASE_URL=postgres://utilisateur:motdepasse@hôte:5432/coachapp, avec ?pooler=transaction derrière PgBouncer (voir coachapp/database_url.py).
+SQLITE_OPTIONS = {
+    'transaction_mode': 'IMMEDIATE',
+    'pragmas': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 128 * 1024 * 1024,
+        'cache_size': -20000,
+        'temp_store': 'MEMORY',
+    },
+}
+
 DATABASES = {
+    'default': database_url.parse(
+        os.environ.get('DATABASE_URL', 'sqlite:///{}'.format(BASE_DIR / 'db.sqlite3')),
+        conn_max_age=int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+        sqlite_options=SQLITE_OPTIONS,
+    ),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Pour partager le cache entre plusieurs processus sans serveur dédié, utiliser par exemple
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache' avec 'LOCATION': BASE_DIR / 'cache'.
+# Avec plusieurs processus serveurs, un cache partagé est nécessaire : l'index de disponibilité (booking/availability.py) d'un cache propre à chaque processus n'est mis à jour que dans le processus qui a enregistré le rendez-vous, et chaque processus tient ses propres compteurs de limitation du débit (coachapp/throttling.py), ce qui multiplie chaque limite par le nombre de processus.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -136,4 +176,100 @@ AUTH_USER_MODEL = 'authentification.User'
 LOGIN_URL = 'login'
 
 
-LOGIN_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGIN_REDIRECT_URL = 'home'
+
+
+# Booking
+
+# Nombre de rendez-vous par page du tableau de bord du médecin (paramètre ?size=), et taille maximale autorisée.
+BOOKING_PAGE_SIZE = 20
+
+BOOKING_MAX_PAGE_SIZE = 100
+
+# Nombre maximal de résultats de la recherche dans les notes et les objets des rendez-vous (booking/search.py).
+BOOKING_SEARCH_LIMIT = 50
+
+# Délai entre l'envoi du courriel de rappel et le rendez-vous (booking/notifications.py).
+BOOKING_REMINDER_DELAY = datetime.timedelta(hours=24)
+
+# Cache utilisé pour les fragments HTML des listes de rendez-vous, et durée de vie d'un fragment en secondes.
+BOOKING_FRAGMENT_CACHE = 'default'
+
+BOOKING_FRAGMENT_TIMEOUT = 300
+
+# Durée de vie en secondes de l'index de disponibilité d'un jour (booking/availability.py) : délai maximal avant qu'un créneau libéré dans un autre processus soit proposé à nouveau, lorsque le cache n'est pas partagé.
+BOOKING_AVAILABILITY_TIMEOUT = 300
+
+# Nombre de jours proposés à la réservation, à partir du lendemain. Les jours sans créneau (week-end, congés) sont écartés d'après les horaires de travail des médecins.
+BOOKING_DAYS_AHEAD = 12
+
+# Vues asynchrones des pages de lecture des rendez-vous (booking/async_views.py), activées par coachapp/asgi.py lorsque le site est servi par un serveur ASGI.
+BOOKING_ASYNC_VIEWS = os.environ.get('BOOKING_ASYNC_VIEWS') == '1'
+
+# Monitoring
+
+# Adresses autorisées à lire les mesures des requêtes au format Prometheus (/metrics/) et les formes de requêtes SQL (/metrics/queries/), en plus des comptes is_staff.
+# L'adresse est celle du client (coachapp/throttling.py, client_ip) : derrière un serveur mandataire sur la même machine, toutes les requêtes arrivent de 127.0.0.1, et THROTTLE_IP_HEADER doit alors être renseigné ; sinon, vider cette liste et réserver ces pages aux comptes is_staff.
+MONITORING_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Journal des requêtes SQL lentes (monitoring/queries.py) : seuil en millisecondes, capture du plan d'exécution, et nombre d'exécutions d'une même requête pendant une requête HTTP à partir duquel un N+1 est signalé.
+MONITORING_SLOW_QUERY_MS = 100
+
+MONITORING_EXPLAIN_SLOW_QUERIES = True
+
+MONITORING_REPEATED_QUERY_THRESHOLD = 10
+
+
+# Tâches de fond (application tasks, exécutées par la commande run_tasks) : nombre de tâches prises à la fois, délai avant le premier nouvel essai d'une tâche en échec (doublé à chaque essai), et durée au-delà de laquelle une tâche prise par un processus arrêté est remise en attente, en secondes.
+TASKS_BATCH_SIZE = 50
+
+TASKS_RETRY_DELAY = 60
+
+TASKS_LOCK_TIMEOUT = 600
+
+
+# Courriels : en développement, ils sont affichés dans la console ; en production, EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend et les réglages EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD et EMAIL_USE_TLS sont lus dans l'environnement.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS') == '1'
+
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Coach&moi <ne-pas-repondre@coachetmoi.fr>')
+
+
+# Page de contact (blog) : destinataires des messages, délai avant leur remise (les messages arrivés entre-temps partent ensemble), durée de validité de la marque de remise programmée, et limites du nombre de messages (nombre, fenêtre en secondes) par adresse IP et par adresse électronique.
+CONTACT_RECIPIENTS = [address for address in os.environ.get('CONTACT_RECIPIENTS', 'contact@coachetmoi.fr').split(',') if address]
+
+CONTACT_DELIVERY_DELAY = 10
+
+CONTACT_DELIVERY_TIMEOUT = 3600
+
+CONTACT_RATE_LIMITS = {
+    'ip': (5, 3600),
+    'email': (3, 3600),
+}
+
+
+# Limitation du débit des adresses coûteuses (coachapp/throttling.py) : pour chaque nom d'adresse, liste des limites (portée, nombre de requêtes, fenêtre glissante en secondes), appliquées aux méthodes de THROTTLE_METHODS.
+# Portées : 'ip' (adresse du client), 'user' (session du client connecté, à défaut son adresse ; indicative, voir coachapp/throttling.py), 'username' (compte visé par le formulaire de connexion).
+# Derrière un serveur mandataire, THROTTLE_IP_HEADER donne l'en-tête qui porte l'adresse du client (par exemple 'HTTP_X_FORWARDED_FOR', dont la dernière valeur est retenue).
+# Les compteurs sont tenus dans le cache : avec plusieurs processus serveurs, il doit être partagé (voir CACHES), sans quoi chaque limite est multipliée par le nombre de processus.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1') == '1'
+
+THROTTLE_METHODS = ['POST']
+
+THROTTLE_IP_HEADER = os.environ.get('THROTTLE_IP_HEADER') or None
+
+THROTTLE_RULES = {
+    'login': [('ip', 10, 60), ('username', 5, 300)],
+    'signup': [('ip', 5, 3600)],
+    'booking': [('user', 10, 60), ('ip', 30, 60)],
+    'appointment-change': [('user', 10, 60)],
+}
@@ -0,0 +1,136 @@
+"""Limitation du débit des requêtes coûteuses (connexion, inscription, prise de rendez-vous), par fenêtre glissante dans le cache.
+
+Chaque limite est un triplet (clé, nombre maximal de requêtes, fenêtre en secondes). Le nombre de requêtes des dernières secondes est estimé à partir de deux compteurs du cache, celui de la fenêtre fixe en cours et celui de la précédente, pondéré par la part de la fenêtre précédente encore couverte par la fenêtre glissante : l'estimation est précise à quelques pourcents, pour deux entrées de cache par clé et sans liste des dates de chaque requête. Une requête refusée n'est pas comptée : un client qui insiste obtient toujours son quota, au rythme de la limite.
+
+ThrottleMiddleware applique les limites de THROTTLE_RULES aux adresses nommées qui y figurent, pour les méthodes de THROTTLE_METHODS : il résout lui-même l'adresse de ces seules requêtes, avant la session et la vue. Une requête refusée reçoit une réponse 429 (avec l'en-tête Retry-After) sans hachage de mot de passe ni requête en base de données, la session et l'utilisateur n'étant jamais chargés. Les limites d'une adresse sont données par portée :
+- 'ip' : adresse IP du client (REMOTE_ADDR, ou l'en-tête THROTTLE_IP_HEADER derrière un serveur mandataire) ;
+- 'user' : session du client, lue dans son cookie, sans requête, ou à défaut de cookie l'adresse IP du client. Cette portée est indicative : le cookie n'est pas vérifié, et un client qui en change à chaque requête obtient à chaque fois un nouveau quota. Seules les limites 'ip' tiennent face à un client malveillant ; les adresses limitées par 'user' exigent de toute façon une session valide, qu'un faux cookie n'ouvre pas ;
+- 'username' : champ username du formulaire envoyé (tentatives sur un même compte depuis plusieurs adresses).
+
+Les compteurs doivent être tenus dans un cache partagé par tous les processus serveurs : avec un cache propre à chaque processus (LocMemCache), chaque limite est multipliée par le nombre de processus.
+"""
+import asyncio
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+KEY_PREFIX = 'throttle'
+
+
+def _window_keys(key, window, now):
+    """Renvoie les clés des compteurs des fenêtres fixes en cours et précédente, et le temps écoulé depuis le début de la fenêtre en cours."""
+    index = int(now // window)
+    return '{}:{}'.format(key, index), '{}:{}'.format(key, index - 1), now - index * window
+
+
+def _retry_after(limit, window, elapsed, current, previous):
+    """Renvoie le nombre de secondes avant que l'estimation laisse passer une requête."""
+    if current + 1 <= limit and previous:
+        # Dans la fenêtre en cours, dès que le poids de la fenêtre précédente a assez diminué.
+        return math.ceil(window * (1 - (limit - 1 - current) / previous) - elapsed)
+    # Dans la fenêtre suivante, où la fenêtre en cours devient la précédente.
+    return math.ceil(window - elapsed + window * max(0.0, 1 - (limit - 1) / current))
+
+
+def hit(limits, now=None):
+    """Compte une requête pour chacune des limites (clé, nombre maximal, fenêtre en secondes), si aucune n'est atteinte.
+
+    Returns:
+        None si la requête est acceptée ; sinon, le nombre de secondes à attendre avant de réessayer (la requête n'est alors pas comptée).
+    """
+    now = now or time.time()
+    windows = [(_window_keys(key, window, now), limit, window) for key, limit, window in limits]
+    counts = cache.get_many([key for (current_key, previous_key, elapsed), limit, window in windows
+                             for key in (current_key, previous_key)])
+    retry_after = 0
+    for (current_key, previous_key, elapsed), limit, window in windows:
+        current, previous = counts.get(current_key, 0), counts.get(previous_key, 0)
+        if previous * (1 - elapsed / window) + current + 1 > limit:
+            retry_after = max(retry_after, _retry_after(limit, window, elapsed, current, previous), 1)
+    if retry_after:
+        return retry_after
+    for (current_key, previous_key, elapsed), limit, window in windows:
+        cache.add(current_key, 0, 2 * window)
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, 2 * window)
+    return None
+
+
+def make_key(*parts):
+    """Renvoie une clé de cache sûre (longueur fixe, sans caractères spéciaux) pour les valeurs données."""
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return '{}:{}'.format(KEY_PREFIX, digest)
+
+
+def client_ip(request):
+    if settings.THROTTLE_IP_HEADER and request.META.get(settings.THROTTLE_IP_HEADER):
+        return request.META[settings.THROTTLE_IP_HEADER].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _scope_value(request, scope):
+    if scope == 'ip':
+        return client_ip(request)
+    if scope == 'user':
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        return 'session:' + session if session else 'ip:' + client_ip(request)
+    if scope == 'username':
+        return request.POST.get('username', '').strip().lower() or None
+    raise ValueError("Portée de limitation inconnue : {}".format(scope))
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse("Trop de requêtes. Merci de réessayer dans quelques instants.", status=429,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def check(request):
+    """Compte la requête pour les limites de son adresse, et renvoie la réponse 429 si l'une d'elles est atteinte, sinon None."""
+    if not settings.THROTTLE_ENABLED or request.method not in settings.THROTTLE_METHODS:
+        return None
+    try:
+        name = resolve(request.path_info, getattr(request, 'urlconf', None)).url_name
+    except Resolver404:
+        return None
+    rules = settings.THROTTLE_RULES.get(name)
+    if not rules:
+        return None
+    limits = []
+    for scope, limit, window in rules:
+        value = _scope_value(request, scope)
+        if value:
+            limits.append((make_key(name, scope, value), limit, window))
+    retry_after = hit(limits)
+    return too_many_requests(retry_after) if retry_after else None
+
+
+@sync_and_async_middleware
+class ThrottleMiddleware:
+    """Middleware qui refuse, avec une réponse 429, les requêtes au-delà des limites de THROTTLE_RULES.
+
+    Il doit être placé avant SessionMiddleware et AuthenticationMiddleware, dont il n'utilise pas les résultats. Comme PerformanceMiddleware, il fonctionne en mode synchrone et asynchrone ; en mode asynchrone, les compteurs sont lus et écrits directement, sans passage par un fil d'exécution : seules les requêtes soumises à une limite font des appels au cache, deux ou trois par requête.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Comme MiddlewareMixin de Django 4.1 : l'instance est alors reconnue comme une fonction asynchrone par le gestionnaire.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return check(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return check(request) or await self.get_response(request)
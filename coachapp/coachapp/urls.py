@@ -13,12 +13,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
-import authentification.views, blog.views, booking.views
+import authentification.views, blog.views, booking.async_views, booking.views, monitoring.views
 from django.contrib.auth.views import LoginView
 
+# Vues de lecture des rendez-vous : asynchrones sous ASGI, synchrones sous WSGI (voir booking/async_views.py).
+read_views = booking.async_views if settings.BOOKING_ASYNC_VIEWS else booking.views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', blog.views.accueil, name='accueil'),
@@ -30,12 +34,19 @@ urlpatterns = [
     path('home/', blog.views.home, name='home'),
     path('signup/', authentification.views.signup_page, name='signup'),
     path('booking/', booking.views.create_appointment, name='booking'),
-    path('consult/', booking.views.consult_appointment, name='consult'),
-    path('manage/', booking.views.manage_appointment, name='manage'),
+    path('booking/availability/', read_views.availability_api, name='booking-availability'),
+    path('consult/', read_views.consult_appointment, name='consult'),
+    path('manage/', read_views.manage_appointment, name='manage'),
+    path('manage/export/', booking.views.export_agenda, name='manage-export'),
+    path('manage/search/', booking.views.search_history, name='manage-search'),
+    path('feed/<str:token>.ics', booking.views.appointment_feed, name='appointment-feed'),
     path('contact-us/',blog.views.contact, name='contact'),
     path('about-us/', blog.views.about, name='about'),
     path('booking/', booking.views.create_appointment, name='booking'),
     path('<int:id>/change/', booking.views.appointment_change, name='appointment-change'),
     path('<int:id>/delete/', booking.views.appointment_delete, name='appointment-delete'),
     path('<int:id>/details/', booking.views.appointment_detail, name='appointment-detail'),
+    path('<int:id>/details/history/', booking.views.appointment_history, name='appointment-history'),
+    path('metrics/', monitoring.views.metrics, name='metrics'),
+    path('metrics/queries/', monitoring.views.query_shapes, name='metrics-queries'),
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""Mesures de la requête en cours.
+
+Le middleware (monitoring/middleware.py) ouvre un RequestStats au début de chaque requête et le rend accessible par une variable de contexte : le chronométrage des requêtes SQL (monitoring/db.py) et celui du rendu des gabarits (monitoring/templates.py) y ajoutent leurs mesures, quel que soit le fil d'exécution qui les fait (les variables de contexte suivent sync_to_async sous ASGI).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('monitoring_request_stats', default=None)
+
+
+class RequestStats:
+    """Mesures d'une requête : nombre et durée des requêtes SQL, nombre d'exécutions de chaque forme de requête SQL (monitoring/queries.py), durée du rendu des gabarits (en secondes)."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.shapes = {}
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def start(request=None):
+    """Ouvre les mesures d'une nouvelle requête et renvoie le couple (mesures, jeton à passer à stop)."""
+    stats = RequestStats(request)
+    return stats, _current.set(stats)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    """Renvoie les mesures de la requête en cours, ou None hors d'une requête (commande, tâche de fond)."""
+    return _current.get()
+
+
+@contextmanager
+def timing_template():
+    """Chronomètre le rendu d'un gabarit. Les rendus imbriqués ne sont comptés qu'une fois."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_time += time.perf_counter() - started
@@ -0,0 +1,33 @@
+"""Chronométrage des requêtes SQL.
+
+QueryTimer est ajouté aux execute_wrappers de chaque connexion à la base de données dès sa création (signal connection_created) : il mesure toutes les requêtes, y compris celles des connexions persistantes ou ouvertes dans un autre fil d'exécution, les impute à la requête HTTP en cours et les transmet au journal des requêtes lentes (monitoring/queries.py). Les requêtes EXPLAIN émises par ce journal lui-même ne sont ni comptées ni chronométrées.
+"""
+import time
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from . import collector, queries
+
+
+class QueryTimer:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        if queries.explaining():
+            return execute(sql, params, many, context)
+        stats = collector.current()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += duration
+            queries.observe(self.connection, sql, params, many, duration, stats)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if not any(isinstance(wrapper, QueryTimer) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(QueryTimer(connection))
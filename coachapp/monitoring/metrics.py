@@ -0,0 +1,84 @@
+"""Agrégats des mesures par vue, au format texte de Prometheus.
+
+Les compteurs sont conservés en mémoire, par processus : chaque processus du serveur expose ses propres valeurs, et Prometheus additionne les séries de toutes les cibles qu'il interroge.
+"""
+import threading
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = (
+    ('db_queries', 'coachapp_db_queries_total', 'Nombre de requêtes SQL.'),
+    ('db_time', 'coachapp_db_duration_seconds_total', 'Durée cumulée des requêtes SQL.'),
+    ('template_time', 'coachapp_template_duration_seconds_total', 'Durée cumulée du rendu des gabarits.'),
+    ('response_bytes', 'coachapp_response_bytes_total', 'Taille cumulée des réponses.'),
+)
+
+_lock = threading.Lock()
+_views = {}
+_requests = {}
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.response_bytes = 0
+
+
+def record(view, method, status, duration, stats, response_bytes):
+    """Ajoute les mesures d'une requête aux agrégats de sa vue."""
+    with _lock:
+        key = (view, method, status)
+        _requests[key] = _requests.get(key, 0) + 1
+        metrics = _views.setdefault(view, ViewMetrics())
+        metrics.count += 1
+        metrics.duration += duration
+        for index, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                metrics.buckets[index] += 1
+        metrics.db_queries += stats.queries
+        metrics.db_time += stats.db_time
+        metrics.template_time += stats.template_time
+        metrics.response_bytes += response_bytes
+
+
+def reset():
+    with _lock:
+        _views.clear()
+        _requests.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render():
+    """Renvoie toutes les métriques au format texte de Prometheus (version 0.0.4)."""
+    with _lock:
+        requests = sorted(_requests.items())
+        views = sorted((view, vars(metrics).copy()) for view, metrics in _views.items())
+    lines = [
+        '# HELP coachapp_requests_total Nombre de requêtes traitées.',
+        '# TYPE coachapp_requests_total counter',
+    ]
+    for (view, method, status), count in requests:
+        lines.append('coachapp_requests_total{{view="{}",method="{}",status="{}"}} {}'.format(_label(view), method, status, count))
+    lines += [
+        '# HELP coachapp_request_duration_seconds Durée de traitement des requêtes.',
+        '# TYPE coachapp_request_duration_seconds histogram',
+    ]
+    for view, metrics in views:
+        for bound, count in zip(BUCKETS, metrics['buckets']):
+            lines.append('coachapp_request_duration_seconds_bucket{{view="{}",le="{}"}} {}'.format(_label(view), bound, count))
+        lines.append('coachapp_request_duration_seconds_bucket{{view="{}",le="+Inf"}} {}'.format(_label(view), metrics['count']))
+        lines.append('coachapp_request_duration_seconds_sum{{view="{}"}} {}'.format(_label(view), metrics['duration']))
+        lines.append('coachapp_request_duration_seconds_count{{view="{}"}} {}'.format(_label(view), metrics['count']))
+    for attribute, name, description in COUNTERS:
+        lines += ['# HELP {} {}'.format(name, description), '# TYPE {} counter'.format(name)]
+        for view, metrics in views:
+            lines.append('{}{{view="{}"}} {}'.format(name, _label(view), metrics[attribute]))
+    return '\n'.join(lines) + '\n'
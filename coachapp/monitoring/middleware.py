@@ -0,0 +1,57 @@
+import asyncio
+import time
+from django.utils.decorators import sync_and_async_middleware
+from . import collector, metrics, queries
+
+
+@sync_and_async_middleware
+class PerformanceMiddleware:
+    """Middleware qui mesure chaque requête : durée totale, nombre et durée des requêtes SQL, durée du rendu des gabarits et taille de la réponse.
+
+    Les mesures sont agrégées par vue (nom de l'adresse, par exemple 'booking', 'consult' ou 'appointment-detail') et exposées au format Prometheus par la vue monitoring.views.metrics. Elles sont aussi renvoyées au navigateur dans l'en-tête Server-Timing, lisible dans les outils de développement.
+
+    Les formes de requête SQL répétées pendant la requête (N+1 probable) sont signalées dans le journal 'monitoring.queries'.
+
+    Il doit être placé en tête de MIDDLEWARE, afin que la durée mesurée comprenne celle des autres middlewares. Il fonctionne en mode synchrone (WSGI) comme en mode asynchrone (ASGI) : sous ASGI, la requête reste dans la boucle d'événements jusqu'aux vues asynchrones (booking/async_views.py), sans passage par un fil d'exécution. Les mesures sont transmises par une variable de contexte, qui suit les deux modes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Comme MiddlewareMixin de Django 4.1 : l'instance est alors reconnue comme une fonction asynchrone par le gestionnaire.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token = collector.start(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            collector.stop(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats, token = collector.start(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            collector.stop(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, duration):
+        """Enregistre les mesures de la requête et ajoute l'en-tête Server-Timing à la réponse."""
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        if response.streaming:
+            size = int(response.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+        metrics.record(view, request.method, response.status_code, duration, stats, size)
+        queries.report_repeated(stats)
+        response['Server-Timing'] = 'db;dur={:.1f};desc="{} SQL", tpl;dur={:.1f}, total;dur={:.1f}'.format(
+            stats.db_time * 1000, stats.queries, stats.template_time * 1000, duration * 1000)
+        return response
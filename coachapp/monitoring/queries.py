@@ -0,0 +1,125 @@
+"""Journal des requêtes SQL lentes et agrégats par forme de requête.
+
+Chaque requête SQL passe par monitoring.db.QueryTimer, qui la transmet à observe() :
+- sa forme (le texte SQL avec ses paramètres %s, les listes IN (%s, %s, ...) étant ramenées à une seule valeur) est comptée, par processus et pour la requête HTTP en cours ;
+- si elle dure plus de MONITORING_SLOW_QUERY_MS millisecondes, elle est journalisée (journal 'monitoring.queries') avec la vue qui l'a provoquée et, si MONITORING_EXPLAIN_SLOW_QUERIES est actif, son plan d'exécution (EXPLAIN QUERY PLAN sous SQLite). Le plan est conservé avec la forme : une forme dont le plan parcourt toute une table (SCAN) est signalée ;
+- à la fin de la requête HTTP, le middleware signale les formes exécutées au moins MONITORING_REPEATED_QUERY_THRESHOLD fois (probable N+1, voir report_repeated).
+
+Les agrégats sont consultables sur /metrics/queries/ (réservé aux adresses de MONITORING_ALLOWED_IPS et aux comptes is_staff, voir monitoring/views.py).
+"""
+import contextvars
+import logging
+import re
+import threading
+from django.conf import settings
+
+logger = logging.getLogger('monitoring.queries')
+
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+MAX_VIEWS = 10
+
+_lock = threading.Lock()
+_shapes = {}
+_explaining = contextvars.ContextVar('monitoring_explaining', default=False)
+
+
+class QueryShape:
+    """Agrégats d'une forme de requête : nombre d'exécutions, durées totale et maximale (en secondes), vues qui l'exécutent et dernier plan d'exécution connu."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.views = set()
+        self.plan = None
+
+    @property
+    def scans(self):
+        return bool(self.plan) and any(line.lstrip().startswith('SCAN') for line in self.plan.splitlines())
+
+
+def shape_of(sql):
+    return IN_LIST.sub('(%s...)', sql)
+
+
+def _view_name(stats):
+    match = getattr(stats.request, 'resolver_match', None) if stats else None
+    return match.view_name if match else None
+
+
+def explaining():
+    """Indique si la requête SQL en cours d'exécution est la capture d'un plan par explain() : QueryTimer ne la compte pas dans les mesures de la requête HTTP."""
+    return _explaining.get()
+
+
+def explain(connection, sql, params):
+    """Renvoie le plan d'exécution de la requête, ou None si le moteur ne sait pas l'expliquer."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except Exception:
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def observe(connection, sql, params, many, duration, stats):
+    """Enregistre une exécution de requête : agrégats de sa forme et, si elle est lente, entrée dans le journal."""
+    shape = shape_of(sql)
+    view = _view_name(stats)
+    if stats is not None:
+        stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+    with _lock:
+        aggregate = _shapes.get(shape)
+        if aggregate is None:
+            aggregate = _shapes[shape] = QueryShape()
+        aggregate.count += 1
+        aggregate.total += duration
+        aggregate.max = max(aggregate.max, duration)
+        if view and len(aggregate.views) < MAX_VIEWS:
+            aggregate.views.add(view)
+    if duration * 1000 < settings.MONITORING_SLOW_QUERY_MS:
+        return
+    plan = None
+    if settings.MONITORING_EXPLAIN_SLOW_QUERIES and not many and sql.lstrip().upper().startswith('SELECT'):
+        plan = explain(connection, sql, params)
+        with _lock:
+            aggregate.plan = plan
+    logger.warning('Requête lente (%.1f ms) dans la vue %s : %s\n%s', duration * 1000, view or '-', sql,
+                   plan or '(plan non disponible)')
+
+
+def report_repeated(stats):
+    """Signale les formes de requête exécutées au moins MONITORING_REPEATED_QUERY_THRESHOLD fois pendant la requête HTTP."""
+    threshold = settings.MONITORING_REPEATED_QUERY_THRESHOLD
+    for shape, count in stats.shapes.items():
+        if count >= threshold:
+            logger.warning('Requête répétée %d fois dans la vue %s (N+1 probable) : %s', count, _view_name(stats) or '-', shape)
+
+
+def get_shapes():
+    """Renvoie la liste des couples (forme, agrégats), de la plus coûteuse (durée totale) à la moins coûteuse."""
+    with _lock:
+        return sorted(_shapes.items(), key=lambda item: item[1].total, reverse=True)
+
+
+def reset():
+    with _lock:
+        _shapes.clear()
+
+
+def render(limit=50):
+    """Renvoie un rapport texte des formes de requête les plus coûteuses."""
+    lines = []
+    for shape, aggregate in get_shapes()[:limit]:
+        lines.append('{} exécution(s), {:.1f} ms au total, {:.1f} ms au plus{} ; vues : {}'.format(
+            aggregate.count, aggregate.total * 1000, aggregate.max * 1000,
+            ', PARCOURS COMPLET' if aggregate.scans else '', ', '.join(sorted(aggregate.views)) or '-'))
+        lines.append('    ' + shape)
+        if aggregate.plan:
+            lines.extend('    | ' + line for line in aggregate.plan.splitlines())
+        lines.append('')
+    return '\n'.join(lines)
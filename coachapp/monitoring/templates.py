@@ -0,0 +1,27 @@
+"""Moteur de gabarits Django chronométré.
+
+InstrumentedDjangoTemplates se déclare dans TEMPLATES à la place de DjangoTemplates : chaque gabarit qu'il renvoie mesure la durée de son rendu et l'impute à la requête en cours (monitoring/collector.py). Les inclusions ({% include %}) font partie du rendu de leur gabarit parent.
+"""
+from django.template.backends.django import DjangoTemplates
+from . import collector
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        with collector.timing_template():
+            return self.template.render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from authentification.models import User
+from booking.models import Appointment
+from .middleware import PerformanceMiddleware
+from . import metrics, queries
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Vérifie les mesures par vue, l'en-tête Server-Timing et l'accès restreint à /metrics/."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+        Appointment.objects.create(user=cls.patient, start=timezone.now() + datetime.timedelta(days=1))
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_server_timing_and_metrics(self):
+        self.client.force_login(self.patient)
+        response = self.client.get(reverse('consult'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ SQL", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+        content = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('coachapp_requests_total{view="consult",method="GET",status="200"} 1', content)
+        self.assertIn('coachapp_request_duration_seconds_count{view="consult"} 1', content)
+        self.assertIn('coachapp_response_bytes_total{{view="consult"}} {}'.format(len(response.content)), content)
+        self.assertRegex(content, r'coachapp_db_queries_total\{view="consult"\} [1-9]')
+        self.assertNotRegex(content, r'coachapp_template_duration_seconds_total\{view="consult"\} 0\.0\n')
+
+    def test_async_mode(self):
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = PerformanceMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertFalse(asyncio.iscoroutinefunction(PerformanceMiddleware(lambda request: HttpResponse('ok'))))
+
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse('login'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'total;dur=[\d.]+$')
+
+    def test_metrics_are_local_only(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 404)
+
+    @override_settings(THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_metrics_behind_proxy(self):
+        for name in ('metrics', 'metrics-queries'):
+            self.assertEqual(self.client.get(reverse(name), REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code, 404)
+            self.assertEqual(self.client.get(reverse(name), REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    def test_metrics_for_staff(self):
+        self.client.force_login(User.objects.create_user('equipe', password='motdepasse', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 200)
+
+
+class SlowQueryLogTests(TestCase):
+    """Vérifie le journal des requêtes lentes, la capture du plan d'exécution et la détection des requêtes répétées."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user('patient', password='motdepasse')
+
+    def setUp(self):
+        queries.reset()
+        cache.clear()
+
+    def test_shape_of_collapses_in_lists(self):
+        self.assertEqual(queries.shape_of('SELECT 1 WHERE id IN (%s, %s, %s)'), queries.shape_of('SELECT 1 WHERE id IN (%s, %s)'))
+
+    def test_slow_query_logged_with_plan_and_view(self):
+        self.client.force_login(self.patient)
+        with self.settings(MONITORING_SLOW_QUERY_MS=0), self.assertLogs('monitoring.queries', 'WARNING') as logs:
+            self.client.get(reverse('consult'))
+        self.assertTrue(any('dans la vue consult' in line and 'booking_appointment' in line for line in logs.output))
+        shapes = dict(queries.get_shapes())
+        plans = [shape.plan for sql, shape in shapes.items() if 'booking_appointment' in sql and shape.plan]
+        self.assertTrue(plans)
+        self.assertIn('consult', ''.join(queries.render().splitlines()))
+
+    def test_explain_is_not_counted(self):
+        from . import collector
+        stats, token = collector.start()
+        try:
+            with self.settings(MONITORING_SLOW_QUERY_MS=0), self.assertLogs('monitoring.queries', 'WARNING') as logs:
+                User.objects.filter(username='patient').exists()
+        finally:
+            collector.stop(token)
+        self.assertNotIn('(plan non disponible)', logs.output[0])
+        self.assertEqual(stats.queries, 1)
+        self.assertFalse(any(shape.startswith('EXPLAIN') for shape, aggregate in queries.get_shapes()))
+
+    @override_settings(MONITORING_REPEATED_QUERY_THRESHOLD=3)
+    def test_repeated_queries_reported(self):
+        from . import collector
+        stats, token = collector.start()
+        try:
+            for i in range(3):
+                User.objects.filter(pk=i).exists()
+        finally:
+            collector.stop(token)
+        with self.assertLogs('monitoring.queries', 'WARNING') as logs:
+            queries.report_repeated(stats)
+        self.assertIn('3 fois', logs.output[0])
+
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from coachapp import throttling
+from . import metrics as registry, queries as query_registry
+
+
+def metrics(request):
+    """Vue qui expose les mesures des requêtes au format texte de Prometheus.
+
+    Elle n'est accessible qu'aux membres de l'équipe (is_staff) et aux clients dont l'adresse figure dans MONITORING_ALLOWED_IPS (la machine locale par défaut). L'adresse est celle du client, lue comme pour la limitation du débit (throttling.client_ip) : derrière un serveur mandataire, elle est prise dans l'en-tête THROTTLE_IP_HEADER, sans quoi toutes les requêtes sembleraient venir du serveur mandataire. Pour tout autre client, la vue répond 404, comme si elle n'existait pas.
+    """
+    _check_local(request)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def query_shapes(request):
+    """Vue qui affiche les formes de requête SQL les plus coûteuses, avec leur plan d'exécution lorsqu'une exécution a été lente (voir monitoring/queries.py). Mêmes restrictions d'accès que metrics."""
+    _check_local(request)
+    return HttpResponse(query_registry.render(), content_type='text/plain; charset=utf-8')
+
+
+def _check_local(request):
+    if throttling.client_ip(request) in settings.MONITORING_ALLOWED_IPS:
+        return
+    if not getattr(request, 'user', None) or not request.user.is_staff:
+        raise Http404
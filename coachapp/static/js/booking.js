@@ -0,0 +1,91 @@
+// Mise à jour des créneaux libres de la page de prise de rendez-vous, sans recharger la page.
+//
+// Les créneaux du médecin choisi sont demandés à l'API de disponibilité (data-availability-url du formulaire)
+// au changement de médecin ou de jour, puis toutes les 30 secondes. L'ETag de la dernière réponse est renvoyé
+// dans If-None-Match : tant que les créneaux n'ont pas changé, le serveur répond 304 sans corps.
+(function () {
+    var REFRESH_INTERVAL = 30000;
+
+    var form = document.querySelector('form[data-availability-url]');
+    if (!form) {
+        return;
+    }
+    var url = form.getAttribute('data-availability-url');
+    var doctorSelect = form.querySelector('select[name="doctor"]');
+    var dateSelect = form.querySelector('select[name="date"]');
+    var heureSelect = form.querySelector('select[name="heure"]');
+    var list = document.getElementById('free-slots');
+    var etag = null;
+    var days = null;
+
+    function replaceOptions(select, options, selected) {
+        select.innerHTML = '';
+        options.forEach(function (option) {
+            var element = document.createElement('option');
+            element.value = option.value;
+            element.textContent = option.label;
+            element.selected = option.value === selected;
+            select.appendChild(element);
+        });
+    }
+
+    function render() {
+        var selectedDate = dateSelect.value;
+        replaceOptions(dateSelect, days.map(function (day) {
+            return {value: day.date, label: day.label};
+        }), selectedDate);
+        var day = days.filter(function (day) { return day.date === dateSelect.value; })[0];
+        replaceOptions(heureSelect, day ? day.slots : [], heureSelect.value);
+
+        if (list) {
+            list.innerHTML = '';
+            days.forEach(function (day) {
+                var paragraph = document.createElement('p');
+                paragraph.textContent = day.label + ' : ' + day.slots.map(function (slot) { return slot.label; }).join(', ');
+                list.appendChild(paragraph);
+            });
+            if (!days.length) {
+                var empty = document.createElement('p');
+                empty.textContent = "Aucun créneau n'est disponible pour le moment.";
+                list.appendChild(empty);
+            }
+        }
+    }
+
+    function refresh() {
+        var query = doctorSelect && doctorSelect.value ? '?doctor=' + encodeURIComponent(doctorSelect.value) : '';
+        var headers = {'Accept': 'application/json'};
+        if (etag) {
+            headers['If-None-Match'] = etag;
+        }
+        fetch(url + query, {headers: headers, credentials: 'same-origin', cache: 'no-store'})
+            .then(function (response) {
+                if (response.status === 304 || !response.ok) {
+                    return null;
+                }
+                etag = response.headers.get('ETag');
+                return response.json();
+            })
+            .then(function (data) {
+                if (data) {
+                    days = data.days;
+                    render();
+                }
+            })
+            .catch(function () {});
+    }
+
+    if (doctorSelect) {
+        doctorSelect.addEventListener('change', function () {
+            etag = null;
+            refresh();
+        });
+    }
+    dateSelect.addEventListener('change', function () {
+        if (days) {
+            render();
+        }
+    });
+    refresh();
+    window.setInterval(refresh, REFRESH_INTERVAL);
+})();
@@ -0,0 +1,42 @@
+// Chargement des entrées suivantes de l'historique d'un patient (page appointment_detail), sans recharger la page.
+//
+// Le bouton "Voir plus" porte l'adresse de la page suivante (data-url), fournie par l'API appointment_history ;
+// chaque réponse ajoute ses entrées à la liste et donne l'adresse de la page d'après, ou null s'il n'y en a plus.
+(function () {
+    var button = document.getElementById('history-more');
+    var list = document.getElementById('history');
+    if (!button || !list) {
+        return;
+    }
+
+    function append(entry) {
+        var item = document.createElement('li');
+        var text = entry.kind === 'note' ? entry.text : 'Séance : ' + (entry.text || 'sans objet');
+        item.textContent = text + ' (' + entry.label + ')';
+        list.appendChild(item);
+        list.appendChild(document.createElement('br'));
+    }
+
+    button.addEventListener('click', function () {
+        button.disabled = true;
+        fetch(button.getAttribute('data-url'), {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(function (data) {
+                data.entries.forEach(append);
+                if (data.next) {
+                    button.setAttribute('data-url', data.next);
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(function () {
+                button.disabled = false;
+            });
+    });
+})();
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'run_at', 'attempts', 'max_attempts', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'locked_by', 'locked_at', 'created_at')
+    actions = ['retry']
+
+    @admin.action(description="Remettre en attente les tâches sélectionnées")
+    def retry(self, request, queryset):
+        queryset.update(status=Task.PENDING, attempts=0, locked_by='', locked_at=None)
@@ -0,0 +1,24 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from tasks import worker
+
+
+class Command(BaseCommand):
+    help = ("Exécute les tâches de fond en file (courriels de confirmation et de rappel des rendez-vous, par exemple), "
+            "par lots, puis attend les suivantes. Plusieurs processus peuvent tourner en parallèle.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Nombre maximal de tâches prises à la fois (réglage TASKS_BATCH_SIZE par défaut).")
+        parser.add_argument('--sleep', type=float, default=5, help="Attente, en secondes, quand aucune tâche n'est échue.")
+        parser.add_argument('--once', action='store_true', help="Exécute les tâches échues puis s'arrête.")
+
+    def handle(self, *args, **options):
+        worker_id = uuid.uuid4().hex
+        while True:
+            count = worker.run_pending(options['batch_size'], worker_id)
+            if count:
+                self.stdout.write('{} tâche(s) traitée(s).'.format(count))
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Une tâche de fond en attente d'exécution, enregistrée par tasks.registry.enqueue et exécutée par la commande run_tasks (voir tasks/worker.py).
+
+    Attributs:
+    - name: nom de la fonction de tâche, déclarée avec le décorateur tasks.registry.task.
+    - payload: arguments de la tâche, sous forme d'un objet JSON.
+    - run_at: date et heure à partir de laquelle la tâche peut être exécutée ; une tâche programmée (un rappel la veille d'un rendez-vous) ou en attente d'un nouvel essai a une date future.
+    - status: PENDING (en attente), RUNNING (prise par un processus d'exécution depuis locked_at, par locked_by) ou FAILED (abandonnée après max_attempts essais). Une tâche réussie est supprimée.
+    - attempts: nombre d'essais déjà faits ; last_error: message de la dernière erreur.
+
+    Meta.indexes: un index (status, run_at), parcouru par les processus d'exécution pour trouver les tâches échues.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = (
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (FAILED, 'Échouée'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='tasks_task_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return '{} ({})'.format(self.name, self.get_status_display())
@@ -0,0 +1,58 @@
+"""Déclaration et mise en file des tâches de fond.
+
+Une tâche est une fonction déclarée avec le décorateur task, sous un nom unique. La mettre en file (enqueue, enqueue_many) ne fait qu'insérer une ligne de la table tasks_task, dans la transaction en cours : si la transaction est annulée, la tâche l'est aussi, et un processus d'exécution ne la voit qu'une fois la transaction validée. Le travail lui-même (envoi d'un courriel, par exemple) est fait par la commande run_tasks, hors du cycle des requêtes HTTP.
+
+Une tâche déclarée avec batch=True reçoit la liste des arguments (payload) de toutes les tâches de même nom prises ensemble par le processus d'exécution, au lieu d'un seul : les courriels d'un même lot partent ainsi par une seule connexion SMTP.
+
+Les arguments sont enregistrés en JSON : ils doivent se limiter à des identifiants et à des valeurs simples, les objets étant relus au moment de l'exécution.
+"""
+from django.utils import timezone
+from .models import Task
+
+_tasks = {}
+
+
+class TaskDefinition:
+    def __init__(self, func, name, max_attempts, batch):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.batch = batch
+
+
+def task(name=None, max_attempts=5, batch=False):
+    """Décorateur qui déclare une fonction de tâche, sous le nom donné (par défaut 'module.fonction').
+
+    max_attempts est le nombre d'essais avant abandon : une tâche qui lève une exception est réessayée plus tard (voir tasks/worker.py).
+    """
+    def decorator(func):
+        task_name = name or '{}.{}'.format(func.__module__, func.__name__)
+        _tasks[task_name] = TaskDefinition(func, task_name, max_attempts, batch)
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def get(name):
+    """Renvoie la déclaration (TaskDefinition) de la tâche, ou None si aucune tâche ne porte ce nom."""
+    return _tasks.get(name)
+
+
+def _build(func_or_name, payload=None, run_at=None):
+    name = getattr(func_or_name, 'task_name', func_or_name)
+    definition = _tasks.get(name)
+    if definition is None:
+        raise LookupError("Tâche inconnue : {}".format(name))
+    return Task(name=name, payload=payload or {}, run_at=run_at or timezone.now(), max_attempts=definition.max_attempts)
+
+
+def enqueue(func_or_name, payload=None, run_at=None):
+    """Met en file une tâche (fonction déclarée ou nom), à exécuter dès que possible ou à partir de run_at, en une seule requête."""
+    task = _build(func_or_name, payload, run_at)
+    task.save()
+    return task
+
+
+def enqueue_many(calls):
+    """Met en file plusieurs tâches, données par des triplets (fonction ou nom, payload, run_at), en une seule requête."""
+    return Task.objects.bulk_create([_build(*call) for call in calls])
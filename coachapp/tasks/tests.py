@@ -0,0 +1,68 @@
+import datetime
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Task
+from .registry import enqueue, enqueue_many, task
+from . import worker
+
+calls = []
+
+
+@task(name='tests.record')
+def record(payload):
+    calls.append(payload['value'])
+
+
+@task(name='tests.record_batch', batch=True)
+def record_batch(payloads):
+    calls.append([payload['value'] for payload in payloads])
+
+
+@task(name='tests.fail', max_attempts=2)
+def fail(payload):
+    raise RuntimeError('serveur indisponible')
+
+
+@override_settings(TASKS_RETRY_DELAY=60)
+class WorkerTests(TestCase):
+    """Vérifie la file de tâches : mise en file, exécution par lots, programmation, nouveaux essais et reprise des tâches abandonnées."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_is_a_single_insert(self):
+        with self.assertNumQueries(1):
+            enqueue_many([(record, {'value': 1}, None), ('tests.record', {'value': 2}, None)])
+        with self.assertNumQueries(1):
+            enqueue(record, {'value': 3})
+
+    def test_batch_and_scheduled_tasks(self):
+        enqueue_many([(record_batch, {'value': i}, None) for i in range(3)])
+        enqueue(record, {'value': 'plus tard'}, run_at=timezone.now() + datetime.timedelta(hours=1))
+        self.assertEqual(worker.run_pending(), 3)
+        self.assertEqual(calls, [[0, 1, 2]])
+        self.assertEqual(Task.objects.get().payload, {'value': 'plus tard'})
+
+    def test_retries_then_fails(self):
+        failing = enqueue(fail)
+        with self.assertLogs('tasks', 'ERROR'):
+            self.assertEqual(worker.run_pending(), 1)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.PENDING, 1))
+        self.assertGreater(failing.run_at, timezone.now() + datetime.timedelta(seconds=50))
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('tasks', 'ERROR'):
+            worker.run_pending()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.FAILED, 2))
+        self.assertIn('serveur indisponible', failing.last_error)
+
+    def test_claim_is_exclusive_and_stale_tasks_are_released(self):
+        enqueue(record, {'value': 1})
+        self.assertEqual(len(worker.claim('premier', 10)), 1)
+        self.assertEqual(worker.claim('second', 10), [])
+        with self.settings(TASKS_LOCK_TIMEOUT=0):
+            self.assertEqual(worker.release_stale(timezone.now() + datetime.timedelta(seconds=1)), 1)
+        self.assertEqual(worker.run_pending(), 1)
+        self.assertEqual(calls, [1])
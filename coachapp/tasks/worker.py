@@ -0,0 +1,96 @@
+"""Exécution des tâches de fond en file (voir tasks/registry.py), par la commande run_tasks.
+
+Chaque tour d'un processus d'exécution :
+- remet en attente les tâches prises par un processus qui n'a pas terminé depuis TASKS_LOCK_TIMEOUT secondes (processus arrêté en cours d'exécution) ;
+- prend au plus TASKS_BATCH_SIZE tâches échues, les plus anciennes d'abord. La prise est une mise à jour conditionnelle (status=PENDING) marquée de l'identifiant du processus : deux processus qui lisent les mêmes tâches ne peuvent pas les prendre tous les deux, sans verrou de table ;
+- exécute les tâches prises, regroupées par nom (une tâche déclarée avec batch=True est appelée une fois pour tout le groupe) ;
+- supprime les tâches réussies, en une requête, et reprogramme les autres : l'essai suivant a lieu après TASKS_RETRY_DELAY secondes, délai doublé à chaque essai, jusqu'à max_attempts essais, après quoi la tâche reste en base avec le statut FAILED.
+"""
+import datetime
+import logging
+import uuid
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .models import Task
+from . import registry
+
+logger = logging.getLogger('tasks')
+
+
+def release_stale(now=None):
+    """Remet en attente les tâches prises depuis plus de TASKS_LOCK_TIMEOUT secondes, et renvoie leur nombre."""
+    now = now or timezone.now()
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=now - datetime.timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    ).update(status=Task.PENDING, locked_by='', locked_at=None)
+
+
+def claim(worker_id, batch_size, now=None):
+    """Prend au plus batch_size tâches échues pour le processus worker_id, et les renvoie."""
+    now = now or timezone.now()
+    ids = list(Task.objects.filter(status=Task.PENDING, run_at__lte=now).order_by('run_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    Task.objects.filter(id__in=ids, status=Task.PENDING).update(status=Task.RUNNING, locked_by=worker_id, locked_at=now)
+    return list(Task.objects.filter(id__in=ids, status=Task.RUNNING, locked_by=worker_id).order_by('run_at', 'id'))
+
+
+def execute(tasks):
+    """Exécute les tâches prises et enregistre leur résultat. Renvoie le couple (nombre de réussites, nombre d'échecs)."""
+    groups = {}
+    for task in tasks:
+        groups.setdefault(task.name, []).append(task)
+    done, failed = [], []
+    for name, group in groups.items():
+        definition = registry.get(name)
+        try:
+            if definition is None:
+                raise LookupError("Tâche inconnue : {}".format(name))
+            if definition.batch:
+                definition.func([task.payload for task in group])
+            else:
+                for task in group:
+                    try:
+                        definition.func(task.payload)
+                    except Exception as error:
+                        failed.append((task, error))
+                    else:
+                        done.append(task)
+                continue
+        except Exception as error:
+            failed += [(task, error) for task in group]
+        else:
+            done += group
+    if done:
+        Task.objects.filter(id__in=[task.id for task in done]).delete()
+    for task, error in failed:
+        _retry(task, error)
+    return len(done), len(failed)
+
+
+def _retry(task, error):
+    logger.exception('Tâche %s (%s) en échec, essai %d sur %d', task.id, task.name, task.attempts + 1, task.max_attempts, exc_info=error)
+    task.attempts += 1
+    task.last_error = '{}: {}'.format(type(error).__name__, error)
+    task.locked_by, task.locked_at = '', None
+    if task.attempts >= task.max_attempts:
+        task.status = Task.FAILED
+    else:
+        task.status = Task.PENDING
+        task.run_at = timezone.now() + datetime.timedelta(seconds=settings.TASKS_RETRY_DELAY * 2 ** (task.attempts - 1))
+    task.save(update_fields=['attempts', 'last_error', 'locked_by', 'locked_at', 'status', 'run_at'])
+
+
+def run_pending(batch_size=None, worker_id=None):
+    """Exécute les tâches échues, lot après lot, jusqu'à ce qu'il n'en reste plus. Renvoie le nombre de tâches traitées."""
+    batch_size = batch_size or settings.TASKS_BATCH_SIZE
+    worker_id = worker_id or uuid.uuid4().hex
+    release_stale()
+    count = 0
+    while True:
+        tasks = claim(worker_id, batch_size)
+        if not tasks:
+            return count
+        count += sum(execute(tasks))
+        close_old_connections()